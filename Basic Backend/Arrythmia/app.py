@@ -1,17 +1,134 @@
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import os
+import sys
 import tempfile
 import numpy as np
-from tensorflow.keras.models import load_model
-import wfdb
+
+# Basic Backend/ holds the helpers shared by the services (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from batching import MicroBatcher
+from shared.metrics import CONTENT_TYPE, MetricsRegistry, instrument_flask
+from shared.model_loader import ModelLoader, ModelNotReady
+from shared.prediction_cache import PredictionCache
+from wfdb_memory import UnsupportedRecord, read_beat_annotations, read_signal
+from windowing import (
+    DEFAULT_STRIDE,
+    WINDOW_BATCH_SIZE,
+    WINDOW_LEN,
+    detect_rpeaks,
+    record_verdict,
+    rpeak_starts,
+    score_windows,
+    stride_starts,
+    summarize_burden,
+)
+
+# Micro-batching settings: concurrent requests are coalesced into one forward
+# pass of up to MAX_BATCH_SIZE segments, waiting at most MAX_BATCH_WAIT_MS.
+MAX_BATCH_SIZE = int(os.environ.get('ARRHYTHMIA_MAX_BATCH_SIZE', 32))
+MAX_BATCH_WAIT_MS = float(os.environ.get('ARRHYTHMIA_MAX_BATCH_WAIT_MS', 5))
+
+# Runtime backend: "keras" serves arrhythmia_cnn.h5 through TensorFlow, "tflite"
+# serves the arrhythmia_cnn.tflite written by export_tflite.py
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'keras')
+if MODEL_BACKEND not in ('keras', 'tflite'):
+    raise ValueError("MODEL_BACKEND must be 'keras' or 'tflite'")
+MODEL_PATH = 'arrhythmia_cnn.tflite' if MODEL_BACKEND == 'tflite' else 'arrhythmia_cnn.h5'
+
+# Prediction cache: repeat uploads of the same record skip the CNN entirely.
+# Set PREDICTION_CACHE_SIZE=0 to disable, PREDICTION_CACHE_DIR to persist entries on disk.
+CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))
+CACHE_TTL_SECONDS = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+CACHE_DIR = os.environ.get('PREDICTION_CACHE_DIR')
+
+# Seconds a request waits for the model while the service is still starting up
+MODEL_WAIT_SECONDS = float(os.environ.get('MODEL_WAIT_SECONDS', 30))
+
+# Whole-record verdict: high risk once this share of windows is abnormal, or one
+# abnormal run lasts this long; isolated abnormal windows alone do not flag a record
+RECORD_MIN_BURDEN = float(os.environ.get('RECORD_MIN_BURDEN', 0.1))
+RECORD_MIN_RUN_SECONDS = float(os.environ.get('RECORD_MIN_RUN_SECONDS', 3.0))
 
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:8080"])  # 👈 allow only frontend
+CORS(app, origins=["http://localhost:8080"], expose_headers=["Server-Timing", "X-Request-ID"])  # 👈 allow only frontend
+
+def warm_up(model):
+    # Trace the graph at every batch shape we serve: single segments, full
+    # micro-batches and whole-record window batches
+    for batch_size in sorted({1, MAX_BATCH_SIZE, WINDOW_BATCH_SIZE}):
+        model.predict_on_batch(np.zeros((batch_size, WINDOW_LEN, 1), dtype=np.float32))
+
+# Keys include the served model file's hash, so a new model never serves old results.
+# The loader thread hashes the file and binds the cache once the model is loaded.
+cache = PredictionCache(CACHE_SIZE, CACHE_TTL_SECONDS, CACHE_DIR, namespace=MODEL_PATH)
+
+# TensorFlow is imported and the model loaded + warmed on a background thread;
+# GET /health reports 503 until it is ready
+loader = ModelLoader(MODEL_PATH, warmup=warm_up, name="arrhythmia-model-loader", on_ready=cache.bind).start()
+
+# predict_on_batch skips the per-call dataset setup that model.predict does
+batcher = MicroBatcher(lambda batch: loader.get().predict_on_batch(batch),
+                       MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS, name="arrhythmia-batcher")
 
-# Load model once at startup
-model = load_model('arrhythmia_cnn.h5')
-print("✅ Model loaded!")
+# Request/stage latency histograms and counters, served at GET /metrics in the
+# Prometheus text format. "X-Trace: 1" on a request (or METRICS_TRACE_HEADERS=1)
+# returns its per-stage Server-Timing and X-Request-ID headers.
+metrics = MetricsRegistry('arrhythmia')
+instrument_flask(app, metrics)
+metrics.callback('model_ready', '1 once the model is loaded and warmed.', lambda: int(loader.ready))
+metrics.callback('prediction_cache_lookups_total', 'Prediction cache lookups by result.',
+                 lambda: [((event,), cache.stats()[key]) for event, key in
+                          (('hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'))],
+                 kind='counter', labelnames=('result',))
+metrics.callback('prediction_cache_entries', 'Entries held in the in-memory prediction cache.',
+                 lambda: cache.stats()['entries'])
+metrics.callback('batcher_batches_total', 'Forward passes run by the micro-batcher.',
+                 lambda: batcher.metrics()['batches'], kind='counter')
+metrics.callback('batcher_items_total', 'Segments scored through the micro-batcher.',
+                 lambda: batcher.metrics()['items'], kind='counter')
+metrics.callback('batcher_queue_depth', 'Segments waiting for the next micro-batch.',
+                 lambda: batcher.metrics()['queue_depth'])
+
+startup_seconds = time.perf_counter() - _import_started
+
+def load_uploaded_signal(dat_file, hea_file, base_name, dat_bytes, hea_bytes):
+    """
+    Decodes channel 0 of the uploaded record straight from the request bytes.
+    Formats the in-memory decoder does not handle fall back to wfdb.rdrecord
+    on a private temporary directory. Returns (signal, fs).
+    """
+    try:
+        return read_signal(hea_bytes, dat_bytes, dat_file.filename)
+    except UnsupportedRecord:
+        pass
+
+    import wfdb  # only needed for formats the in-memory decoder skips
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, dat_file.filename), 'wb') as f:
+            f.write(dat_bytes)
+        with open(os.path.join(tmpdir, hea_file.filename), 'wb') as f:
+            f.write(hea_bytes)
+        record = wfdb.rdrecord(os.path.join(tmpdir, base_name), channels=[0])
+        return record.p_signal[:, 0], float(record.fs)
+
+def cached_response(payload, status):
+    response = jsonify(payload)
+    response.headers['X-Prediction-Cache'] = status
+    return response
+
+def not_ready_response(error):
+    response = jsonify({"error": str(error), "status": loader.status()})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
 
 @app.route('/')
 def home():
@@ -33,32 +150,176 @@ def predict():
         if base_name != hea_file.filename.rsplit('.', 1)[0]:
             return jsonify({"error": "File names must match (e.g., 107.dat and 107.hea)"}), 400
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            dat_path = os.path.join(tmpdir, dat_file.filename)
-            hea_path = os.path.join(tmpdir, hea_file.filename)
-            dat_file.save(dat_path)
-            hea_file.save(hea_path)
+        with metrics.stage('read_upload'):
+            dat_bytes = dat_file.read()
+            hea_bytes = hea_file.read()
+        with metrics.stage('cache'):
+            cache_key = cache.key(dat_bytes, hea_bytes, params='first-window')
+            cached = cache.get(cache_key)
+        if cached is not None:
+            return cached_response(dict(cached, record_id=base_name), 'hit')
+
+        with metrics.stage('decode'):
+            signal, _ = load_uploaded_signal(dat_file, hea_file, base_name, dat_bytes, hea_bytes)
+
+        if len(signal) < 360:
+            return jsonify({"error": "ECG signal too short (< 1 second)"}), 400
+
+        with metrics.stage('model_wait'):
+            loader.get(MODEL_WAIT_SECONDS)
+        ecg_segment = signal[:360].reshape(360, 1)
+        with metrics.stage('model'):  # includes the micro-batch queue wait
+            prob = batcher.predict(ecg_segment)[0]
+        risk = "High risk of dangerous arrhythmia" if prob > 0.5 else "Normal rhythm"
+
+        payload = {
+            "prediction": risk,
+            "probability": float(prob),
+            "record_id": base_name,
+            "message": "⚠️ High risk: Consult cardiologist immediately." if prob > 0.5 else "✅ Low risk: Normal rhythm detected."
+        }
+        cache.put(cache_key, payload)
+        return cached_response(payload, 'miss')
+
+    except ModelNotReady as e:
+        metrics.record_error(e)
+        return not_ready_response(e)
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+
+# 🔹 Whole-record analysis: slide the CNN over the entire record
+@app.route('/predict/arrythmia/record', methods=['POST'])
+def predict_record():
+    """
+    Scans the whole record instead of only the first second.
+
+    Form fields (all optional):
+      mode      - "stride" (default): a window every `stride` samples
+                  "rpeak": windows centred on R-peaks, like prepare_data.py
+      stride    - samples between windows in stride mode (default 180)
+      threshold - probability above which a window counts as abnormal (default 0.5)
+      min_burden      - share of abnormal windows that flags the record (default 0.1)
+      min_run_seconds - abnormal run length that flags the record (default 3.0)
+    The verdict reports which of the two triggered it, next to the figures.
+    An optional 'atr' upload supplies R-peak annotations for rpeak mode;
+    without it peaks are detected from the signal.
+    """
+    try:
+        if 'dat' not in request.files or 'hea' not in request.files:
+            return jsonify({"error": "Please upload both .dat and .hea files"}), 400
+
+        dat_file = request.files['dat']
+        hea_file = request.files['hea']
+        atr_file = request.files.get('atr')
+
+        if not (dat_file.filename.endswith('.dat') and hea_file.filename.endswith('.hea')):
+            return jsonify({"error": "Files must have .dat and .hea extensions"}), 400
+
+        base_name = dat_file.filename.rsplit('.', 1)[0]
+        if base_name != hea_file.filename.rsplit('.', 1)[0]:
+            return jsonify({"error": "File names must match (e.g., 107.dat and 107.hea)"}), 400
+
+        mode = request.form.get('mode', 'stride')
+        if mode not in ('stride', 'rpeak'):
+            return jsonify({"error": "mode must be 'stride' or 'rpeak'"}), 400
+        try:
+            stride = int(request.form.get('stride', DEFAULT_STRIDE))
+            threshold = float(request.form.get('threshold', 0.5))
+            min_burden = float(request.form.get('min_burden', RECORD_MIN_BURDEN))
+            min_run_seconds = float(request.form.get('min_run_seconds', RECORD_MIN_RUN_SECONDS))
+        except ValueError:
+            return jsonify({"error": "stride must be an integer; threshold, min_burden and min_run_seconds numbers"}), 400
+        if stride < 1:
+            return jsonify({"error": "stride must be at least 1 sample"}), 400
 
-            record = wfdb.rdrecord(os.path.join(tmpdir, base_name), channels=[0])
-            signal = record.p_signal.flatten()
+        with metrics.stage('read_upload'):
+            dat_bytes = dat_file.read()
+            hea_bytes = hea_file.read()
+            atr_bytes = atr_file.read() if mode == 'rpeak' and atr_file is not None and atr_file.filename else None
+        with metrics.stage('cache'):
+            cache_key = cache.key(dat_bytes, hea_bytes, atr_bytes or b'',
+                                  params=f"record:{mode}:{stride if mode == 'stride' else ''}:{threshold!r}:{atr_bytes is not None}"
+                                         f":{min_burden!r}:{min_run_seconds!r}")
+            cached = cache.get(cache_key)
+        if cached is not None:
+            return cached_response(dict(cached, record_id=base_name), 'hit')
 
-            if len(signal) < 360:
-                return jsonify({"error": "ECG signal too short (< 1 second)"}), 400
+        with metrics.stage('decode'):
+            signal, fs = load_uploaded_signal(dat_file, hea_file, base_name, dat_bytes, hea_bytes)
 
-            ecg_segment = signal[:360].reshape(1, 360, 1)
-            prob = model.predict(ecg_segment, verbose=0)[0][0]
-            risk = "High risk of dangerous arrhythmia" if prob > 0.5 else "Normal rhythm"
+        peak_source = None
+        with metrics.stage('preprocess'):
+            if mode == 'rpeak':
+                if atr_bytes is not None:
+                    peaks = read_beat_annotations(atr_bytes)
+                    peak_source = "annotations"
+                else:
+                    peaks = detect_rpeaks(signal, fs)
+                    peak_source = "detected"
+                starts = rpeak_starts(len(signal), peaks)
+            else:
+                starts = stride_starts(len(signal), stride)
 
-            return jsonify({
-                "prediction": risk,
-                "probability": float(prob),
-                "record_id": base_name,
-                "message": "⚠️ High risk: Consult cardiologist immediately." if prob > 0.5 else "✅ Low risk: Normal rhythm detected."
-            })
+        if len(starts) == 0:
+            return jsonify({"error": "ECG signal too short (< 1 second) or no usable beats found"}), 400
 
+        # Windows go straight to the model in large batches (no micro-batcher needed)
+        with metrics.stage('model_wait'):
+            model = loader.get(MODEL_WAIT_SECONDS)
+        with metrics.stage('model'):
+            probs = score_windows(model.predict_on_batch, signal, starts)
+        summary = summarize_burden(starts, probs, fs, threshold, n_samples=len(signal))
+        verdict = record_verdict(summary, min_burden, min_run_seconds)
+        abnormal = verdict["abnormal"]
+        figures = (f"{summary['burden']:.0%} of windows abnormal, "
+                   f"longest abnormal run {summary['longest_abnormal_run_seconds']:.1f}s")
+
+        payload = {
+            "prediction": "High risk of dangerous arrhythmia" if abnormal else "Normal rhythm",
+            "verdict": verdict,
+            "record_id": base_name,
+            "mode": mode,
+            "stride": stride if mode == 'stride' else None,
+            "peak_source": peak_source,
+            "sampling_rate": fs,
+            "window_length": WINDOW_LEN,
+            "threshold": threshold,
+            "summary": summary,
+            "timeline": {
+                "start_samples": starts.tolist(),
+                "probabilities": np.round(probs.astype(np.float64), 4).tolist(),
+            },
+            "message": (f"⚠️ High risk ({figures}): Consult cardiologist immediately." if abnormal
+                        else f"✅ Low risk ({figures}): Normal rhythm detected.")
+        }
+        cache.put(cache_key, payload)
+        return cached_response(payload, 'miss')
+
+    except ModelNotReady as e:
+        metrics.record_error(e)
+        return not_ready_response(e)
     except Exception as e:
+        metrics.record_error(e)
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+@app.route('/health')
+def health():
+    status = dict(loader.status(), app_import_seconds=round(startup_seconds, 4))
+    return jsonify(status), (200 if status["ready"] else 503)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/metrics/batching')
+def batching_metrics():
+    return jsonify(batcher.metrics())
+
+@app.route('/metrics/cache')
+def cache_metrics():
+    return jsonify(cache.stats())
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-sample predictions into one forward pass.
+
+    Request threads call `predict(x)`; a background thread takes the first
+    queued sample, waits up to `max_wait_ms` for more (or until `max_batch_size`
+    are queued), stacks them and runs `predict_fn` once. Each caller's Future is
+    resolved with its own row of the output.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, name: str = "micro-batcher"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._items = 0
+        self._batches = 0
+        self._errors = 0
+        self._queue_wait_seconds = 0.0
+        self._inference_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, x: np.ndarray) -> Future:
+        """Queues one sample (without a batch axis) and returns a Future for its output row."""
+        future: Future = Future()
+        self._queue.put((x, future, time.perf_counter()))
+        return future
+
+    def predict(self, x: np.ndarray, timeout: float = 30.0) -> np.ndarray:
+        return self.submit(x).result(timeout=timeout)
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            items = [first]
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(items) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                items.append(item)
+
+            self._run_batch(items)
+            if stop:
+                return
+
+    def _run_batch(self, items) -> None:
+        started = time.perf_counter()
+        try:
+            outputs = self.predict_fn(np.stack([x for x, _, _ in items]))
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            with self._lock:
+                self._errors += 1
+            return
+        finished = time.perf_counter()
+
+        for i, (_, future, _) in enumerate(items):
+            future.set_result(outputs[i])
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(items)
+            self._batch_sizes[len(items)] += 1
+            self._queue_wait_seconds += sum(started - queued for _, _, queued in items)
+            self._inference_seconds += finished - started
+
+    def metrics(self) -> Dict[str, Any]:
+        """Achieved batch sizes and timing since startup."""
+        with self._lock:
+            batches = self._batches
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": batches,
+                "items": self._items,
+                "errors": self._errors,
+                "queue_depth": self._queue.qsize(),
+                "mean_batch_size": self._items / batches if batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "mean_queue_wait_ms": 1000.0 * self._queue_wait_seconds / self._items if self._items else 0.0,
+                "mean_inference_ms": 1000.0 * self._inference_seconds / batches if batches else 0.0,
+            }
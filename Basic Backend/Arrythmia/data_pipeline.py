@@ -0,0 +1,87 @@
+"""
+Streaming access to the X.npy / y.npy beat-window dataset.
+
+The arrays are opened with mmap_mode, so only the rows of the current batch are
+ever read into RAM. The stratified train/test split is stored as index arrays
+in split.npz next to the data; training, testing and export all read that file
+and so see the same split. The indices match the original in-memory
+train_test_split(X, y, test_size=0.2, stratify=y, random_state=42).
+"""
+import hashlib
+import itertools
+import os
+
+import numpy as np
+
+SPLIT_FILE = 'split.npz'
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+
+def open_arrays(data_dir='.'):
+    """Memory-mapped X (n, 360) and y (n,); nothing is read until it is indexed."""
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    return X, y
+
+
+def split_indices(y, data_dir='.', test_size=TEST_SIZE, seed=SPLIT_SEED):
+    """
+    Returns (train_idx, test_idx). The split is loaded from split.npz when it
+    was made for these labels and settings, otherwise it is recomputed and saved.
+    """
+    y = np.asarray(y)
+    path = os.path.join(data_dir, SPLIT_FILE)
+    fingerprint = hashlib.sha256(np.ascontiguousarray(y).tobytes()).hexdigest()
+
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            if (str(saved['fingerprint']) == fingerprint and float(saved['test_size']) == test_size
+                    and int(saved['seed']) == seed):
+                return saved['train'], saved['test']
+
+    from sklearn.model_selection import train_test_split
+
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=test_size, stratify=y, random_state=seed)
+    np.savez(path, train=train_idx, test=test_idx, fingerprint=fingerprint, test_size=test_size, seed=seed)
+    return train_idx, test_idx
+
+
+def iter_batches(X, y, indices, batch_size=64, shuffle=False, seed=SPLIT_SEED):
+    """
+    Yields (x, y) batches with x shaped (batch, 360, 1) float32. Rows within a
+    batch are read in ascending order so the memmap is scanned forwards.
+    """
+    order = np.random.default_rng(seed).permutation(indices) if shuffle else np.asarray(indices)
+    for i in range(0, len(order), batch_size):
+        idx = np.sort(order[i:i + batch_size]) if shuffle else order[i:i + batch_size]
+        yield np.asarray(X[idx], dtype=np.float32)[..., np.newaxis], np.asarray(y[idx])
+
+
+def make_dataset(X, y, indices, batch_size=64, shuffle=False, seed=SPLIT_SEED):
+    """
+    Batched, prefetching tf.data pipeline over the memmapped arrays for
+    model.fit. With shuffle=True every epoch gets a fresh permutation.
+    """
+    import tensorflow as tf
+
+    epochs = itertools.count()
+
+    def generator():
+        yield from iter_batches(X, y, indices, batch_size, shuffle, seed + next(epochs))
+
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=(
+        tf.TensorSpec(shape=(None, X.shape[1], 1), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(y.dtype)),
+    ))
+    n_batches = (len(indices) + batch_size - 1) // batch_size
+    return dataset.apply(tf.data.experimental.assert_cardinality(n_batches)).prefetch(tf.data.AUTOTUNE)
+
+
+def predict_indices(predict_fn, X, indices, batch_size=1024):
+    """Model probabilities for X[indices], in `indices` order, one batch in memory at a time."""
+    probs = np.empty(len(indices), dtype=np.float32)
+    for i in range(0, len(indices), batch_size):
+        batch = np.asarray(X[indices[i:i + batch_size]], dtype=np.float32)[..., np.newaxis]
+        probs[i:i + len(batch)] = np.asarray(predict_fn(batch)).reshape(-1)
+    return probs
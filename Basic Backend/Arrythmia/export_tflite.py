@@ -0,0 +1,122 @@
+"""
+Exports arrhythmia_cnn.h5 to TFLite for the lightweight serving backend
+(MODEL_BACKEND=tflite in app.py), then reports accuracy parity against the
+Keras model on the test split from train_model.py / test_model.py.
+
+    python export_tflite.py                    # float32
+    python export_tflite.py --quantize float16 # half-size weights
+    python export_tflite.py --quantize int8    # calibrated on the X.npy training split
+    python export_tflite.py --report-only      # re-check an existing export
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Basic Backend/ holds the helpers shared by the services (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from data_pipeline import open_arrays, predict_indices, split_indices
+from shared.model_loader import TFLiteModel
+from test_model import evaluate
+
+# --- Export ---
+
+def convert(keras_model, quantize, calibration=None):
+    """Converts a Keras model to a TFLite flatbuffer, optionally quantized."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        # Full-integer kernels; inputs and outputs stay float32 so the app's
+        # preprocessing and 0.5 threshold are unchanged
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+# --- Parity report ---
+
+def single_sample_latency_ms(predict_fn, sample, repeats=200):
+    """Median latency of one (1, 360, 1) forward pass after a few warm-up calls."""
+    x = np.asarray(sample, dtype=np.float32).reshape(1, -1, 1)
+    for _ in range(10):
+        predict_fn(x)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict_fn(x)
+        timings.append(time.perf_counter() - started)
+    return 1000.0 * float(np.median(timings))
+
+
+def parity_report(keras_model, lite_model, X, test_idx, y_test):
+    """Compares both models on X[test_idx], streamed from the memmap one batch at a time."""
+    keras_probs = predict_indices(keras_model.predict_on_batch, X, test_idx)
+    lite_probs = predict_indices(lite_model.predict_on_batch, X, test_idx)
+    keras_metrics = evaluate(y_test, (keras_probs > 0.5).astype('int32'))
+    lite_metrics = evaluate(y_test, (lite_probs > 0.5).astype('int32'))
+    diff = np.abs(keras_probs - lite_probs)
+
+    print(f"\n📊 Parity on {len(y_test)} test windows")
+    print(f"Keras  accuracy: {keras_metrics['accuracy']:.4f}")
+    print(f"TFLite accuracy: {lite_metrics['accuracy']:.4f} "
+          f"({lite_metrics['accuracy'] - keras_metrics['accuracy']:+.4f})")
+    print(f"Label agreement: {np.mean((keras_probs > 0.5) == (lite_probs > 0.5)):.4%}")
+    print(f"Probability |diff|: max {diff.max():.5f}, mean {diff.mean():.5f}")
+    sample = X[test_idx[0]]
+    print(f"Single-sample latency: Keras {single_sample_latency_ms(keras_model.predict_on_batch, sample):.3f} ms, "
+          f"TFLite {single_sample_latency_ms(lite_model.predict_on_batch, sample):.3f} ms")
+    print("\n📋 TFLite confusion matrix:")
+    print(lite_metrics['confusion_matrix'])
+    print("\nTFLite classification report:")
+    print(lite_metrics['report'])
+    return keras_metrics, lite_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export arrhythmia_cnn.h5 to TFLite and check accuracy parity")
+    parser.add_argument('--model', default='arrhythmia_cnn.h5')
+    parser.add_argument('--output', default='arrhythmia_cnn.tflite')
+    parser.add_argument('--quantize', choices=['none', 'float16', 'int8'], default='none')
+    parser.add_argument('--calibration-samples', type=int, default=500,
+                        help="training windows used to calibrate int8 ranges")
+    parser.add_argument('--report-only', action='store_true', help="skip the export, only compare")
+    parser.add_argument('--no-report', action='store_true', help="skip the parity report")
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(args.model)
+    # Memory-mapped: only the calibration rows and the test rows are ever read
+    X, y = open_arrays()
+    train_idx, test_idx = split_indices(y)
+
+    if not args.report_only:
+        calibration = None
+        if args.quantize == 'int8':
+            rng = np.random.default_rng(42)
+            picks = rng.choice(len(train_idx), size=min(args.calibration_samples, len(train_idx)), replace=False)
+            calibration = np.asarray(X[train_idx[picks]])[..., np.newaxis]
+        with open(args.output, 'wb') as f:
+            f.write(convert(keras_model, args.quantize, calibration))
+        print(f"✅ Wrote {args.output} ({args.quantize}): {os.path.getsize(args.output) / 1024:.1f} KB "
+              f"vs {os.path.getsize(args.model) / 1024:.1f} KB for {args.model}")
+
+    if not args.no_report:
+        parity_report(keras_model, TFLiteModel(args.output), X, test_idx, np.asarray(y[test_idx]))
+
+
+if __name__ == '__main__':
+    main()
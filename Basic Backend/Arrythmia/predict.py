@@ -1,18 +1,21 @@
 import numpy as np
-from tensorflow.keras.models import load_model
 import wfdb
 
-model = load_model('arrhythmia_cnn.h5')
-
 # Example: load record 200, take first 1-sec window
 record = wfdb.rdrecord('mitdb/107', channels=[0])
 ecg_segment = record.p_signal[:360].flatten()  # First second
 
 # Preprocess
-ecg_segment = ecg_segment.reshape(1, 360, 1)
+ecg_segment = ecg_segment.reshape(1, 360, 1).astype(np.float32)
+
+# TensorFlow is only imported once there is something to predict, so a bad
+# record path fails fast instead of after several seconds of imports
+from tensorflow.keras.models import load_model
+
+model = load_model('arrhythmia_cnn.h5')
 
-# Predict
-prob = model.predict(ecg_segment)[0][0]
+# Predict (predict_on_batch skips model.predict's per-call dataset setup)
+prob = np.asarray(model.predict_on_batch(ecg_segment))[0][0]
 risk = "High risk of dangerous arrhythmia" if prob > 0.5 else "Normal rhythm"
 
-print(f"Prediction: {risk} (Probability: {prob:.2f})")
\ No newline at end of file
+print(f"Prediction: {risk} (Probability: {prob:.2f})")
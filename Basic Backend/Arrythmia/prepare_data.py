@@ -1,6 +1,10 @@
-import wfdb
-import numpy as np
+import argparse
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 # Define label mapping (binary: 0=normal, 1=abnormal)
 label_map = {
@@ -9,39 +13,176 @@ label_map = {
     '/': 2, 'Q': 2, 'f': 2   # Ignore noise/unknown
 }
 
-# Get all record names (from RECORDS file or list)
-record_names = [f.replace('.dat', '') for f in os.listdir('mitdb') if f.endswith('.dat')]
+WIN_LEN = 360  # 1 sec at 360 Hz
+
+# --- Record discovery and parse cache ---
+
+def list_records(db_dir):
+    """Record names from the database's RECORDS file, else every .dat file (sorted)."""
+    records_file = os.path.join(db_dir, 'RECORDS')
+    if os.path.exists(records_file):
+        with open(records_file) as f:
+            return [line.strip() for line in f if line.strip()]
+    return sorted(f.replace('.dat', '') for f in os.listdir(db_dir) if f.endswith('.dat'))
+
+
+def _source_stamp(db_dir, rec, annotator, channel):
+    """Size + mtime of every file the record is parsed from; a change invalidates the cache."""
+    stamp = {'channel': channel, 'annotator': annotator}
+    for ext in ('hea', 'dat', annotator):
+        st = os.stat(os.path.join(db_dir, f'{rec}.{ext}'))
+        stamp[ext] = [st.st_size, st.st_mtime_ns]
+    return stamp
+
+
+def _cache_paths(cache_dir, rec):
+    base = os.path.join(cache_dir, rec.replace('/', '__'))
+    return base + '.json', base + '.signal.npy', base + '.samples.npy', base + '.symbols.npy'
+
+
+def parse_record(db_dir, rec, cache_dir, annotator='atr', channel=0):
+    """
+    Parses one record (signal + beat annotations) with wfdb, or reuses the cached
+    parse if its source files are unchanged. Returns the record name, or raises.
+    """
+    meta_path, signal_path, samples_path, symbols_path = _cache_paths(cache_dir, rec)
+    stamp = _source_stamp(db_dir, rec, annotator, channel)
+    try:
+        with open(meta_path) as f:
+            if json.load(f) == stamp:
+                return rec
+    except (OSError, ValueError):
+        pass
+
+    import wfdb
+
+    # Load signal (use MLII = channel 0 if available)
+    record = wfdb.rdrecord(os.path.join(db_dir, rec), channels=[channel])
+    ann = wfdb.rdann(os.path.join(db_dir, rec), annotator)
+    np.save(signal_path, record.p_signal[:, 0])
+    np.save(samples_path, np.asarray(ann.sample, dtype=np.int64))
+    np.save(symbols_path, np.asarray(ann.symbol, dtype='U2'))
+    with open(meta_path, 'w') as f:
+        json.dump(stamp, f)  # written last, so a crash mid-parse never leaves a "valid" entry
+    return rec
+
+# --- Window extraction ---
+
+def window_starts(rec, cache_dir, win_len=WIN_LEN):
+    """
+    Start sample and label of every usable window in a parsed record: windows
+    centred on annotated beats whose symbol maps to 0/1, fully inside the signal
+    (same rule as the original per-annotation loop, but vectorized).
+    """
+    _, signal_path, samples_path, symbols_path = _cache_paths(cache_dir, rec)
+    n_samples = np.load(signal_path, mmap_mode='r').shape[0]
+    samples = np.load(samples_path)
+    symbols = np.load(symbols_path)
+
+    unique_symbols, inverse = np.unique(symbols, return_inverse=True)
+    labels = np.array([label_map.get(str(s), 2) for s in unique_symbols], dtype=np.int64)[inverse]
+
+    starts = samples - win_len // 2
+    ends = samples + win_len // 2
+    keep = (labels != 2) & (starts >= 0) & (ends < n_samples)
+    return starts[keep], labels[keep]
+
 
-X, y = [], []
+def count_windows(rec, cache_dir, win_len=WIN_LEN):
+    return len(window_starts(rec, cache_dir, win_len)[0])
 
-for rec in record_names:
+
+def write_windows(rec, cache_dir, x_path, y_path, offset, win_len=WIN_LEN):
+    """Copies one record's windows straight into rows offset.. of the memory-mapped X/y."""
+    starts, labels = window_starts(rec, cache_dir, win_len)
+    if len(starts) == 0:
+        return 0
+    _, signal_path, _, _ = _cache_paths(cache_dir, rec)
+    signal = np.load(signal_path, mmap_mode='r')
+
+    X = np.load(x_path, mmap_mode='r+')
+    y = np.load(y_path, mmap_mode='r+')
+    X[offset:offset + len(starts)] = sliding_window_view(signal, win_len)[starts]
+    y[offset:offset + len(starts)] = labels
+    X.flush()
+    y.flush()
+    return len(starts)
+
+# --- Build ---
+
+def _parse_job(args):
+    db_dir, rec, cache_dir, annotator, channel = args
     try:
-        # Load signal (use MLII = channel 0 if available)
-        record = wfdb.rdrecord(f'mitdb/{rec}', channels=[0])
-        ann = wfdb.rdann(f'mitdb/{rec}', 'atr')
-        signal = record.p_signal.flatten()
-        
-        for i, sample in enumerate(ann.sample):
-            sym = ann.symbol[i]
-            if sym not in label_map or label_map[sym] == 2:
-                continue  # Skip unknown/noise
-            
-            # Extract 1-second window centered on R-peak
-            win_len = 360  # 1 sec at 360 Hz
-            start = sample - win_len // 2
-            end = sample + win_len // 2
-            
-            if start >= 0 and end < len(signal):
-                X.append(signal[start:end])
-                y.append(label_map[sym])
-                
+        return parse_record(db_dir, rec, cache_dir, annotator, channel), None
     except Exception as e:
-        print(f"Skipped {rec}: {e}")
+        return rec, str(e)
+
+
+def _count_job(args):
+    rec, cache_dir, win_len = args
+    return count_windows(rec, cache_dir, win_len)
+
+
+def _write_job(args):
+    return write_windows(*args)
+
+
+def build_dataset(db_dir='mitdb', out_dir='.', cache_dir=None, workers=None, annotator='atr',
+                  channel=0, dtype='float64', win_len=WIN_LEN):
+    """
+    Builds X.npy / y.npy from every record in `db_dir`.
+
+    Records are parsed in a process pool (and cached, so only new or changed
+    records are re-read), then every record's windows are written by the pool
+    directly into preallocated memory-mapped .npy files, so peak memory is one
+    record rather than the whole dataset twice over.
+    """
+    cache_dir = cache_dir or os.path.join(db_dir, '.prepare_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    records = list_records(db_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = []
+        for rec, error in pool.map(_parse_job, [(db_dir, r, cache_dir, annotator, channel) for r in records]):
+            if error is None:
+                parsed.append(rec)
+            else:
+                print(f"Skipped {rec}: {error}")
+
+        counts = list(pool.map(_count_job, [(rec, cache_dir, win_len) for rec in parsed]))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        total = int(offsets[-1])
+
+        x_path = os.path.join(out_dir, 'X.npy')
+        y_path = os.path.join(out_dir, 'y.npy')
+        np.lib.format.open_memmap(x_path, mode='w+', dtype=dtype, shape=(total, win_len)).flush()
+        np.lib.format.open_memmap(y_path, mode='w+', dtype=np.int64, shape=(total,)).flush()
+
+        jobs = [(rec, cache_dir, x_path, y_path, int(offset), win_len)
+                for rec, offset, count in zip(parsed, offsets, counts) if count]
+        list(pool.map(_write_job, jobs))
+
+    y = np.load(y_path, mmap_mode='r')
+    print(f"Dataset shape: {(total, win_len)}, Labels: {np.bincount(y, minlength=2)}")
+    return x_path, y_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build X.npy / y.npy beat windows from a PhysioNet database")
+    parser.add_argument('--db', default='mitdb', help="directory containing the .dat/.hea/annotation files")
+    parser.add_argument('--out-dir', default='.')
+    parser.add_argument('--cache-dir', help="parsed-record cache (default: <db>/.prepare_cache)")
+    parser.add_argument('--workers', type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument('--annotator', default='atr')
+    parser.add_argument('--channel', type=int, default=0)
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help="float32 halves X.npy; training casts to float32 anyway")
+    args = parser.parse_args()
+
+    # Save for reuse
+    build_dataset(args.db, args.out_dir, args.cache_dir, args.workers, args.annotator, args.channel, args.dtype)
 
-X = np.array(X)
-y = np.array(y)
 
-print(f"Dataset shape: {X.shape}, Labels: {np.bincount(y)}")
-# Save for reuse
-np.save('X.npy', X)
-np.save('y.npy', y)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
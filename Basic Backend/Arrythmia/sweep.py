@@ -0,0 +1,215 @@
+"""
+Hyperparameter / architecture sweep for the arrhythmia CNN.
+
+Candidates from a grid or random search over train_model.py's settings are
+trained in parallel worker processes, each capped to a few TensorFlow
+threads so workers do not fight over cores. Every finished candidate is
+appended to a CSV results table (throughput, wall time, model size and
+classification_report metrics on the shared split.npz test split), and the
+best one is copied to <out-dir>/best_model.h5.
+
+    python sweep.py --workers 4 --threads-per-worker 2
+    python sweep.py --mode random --trials 20 --space space.json --metric abnormal_recall
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from train_model import DEFAULT_CONFIG
+
+# Values tried for each setting; any setting left out keeps its DEFAULT_CONFIG value
+DEFAULT_SPACE = {
+    'conv_filters': [[32, 64, 64], [16, 32, 32], [32, 64, 128]],
+    'kernel_sizes': [[7, 5, 3]],
+    'dense_units': [32, 64],
+    'dropout': [0.3, 0.5],
+    'learning_rate': [0.001],
+    'epochs': [15],
+    'batch_size': [64, 128],
+}
+
+METRICS = ['accuracy', 'macro_f1', 'abnormal_precision', 'abnormal_recall', 'abnormal_f1']
+
+# --- Search space ---
+
+def grid_candidates(space):
+    keys = sorted(space)
+    for values in itertools.product(*(space[key] for key in keys)):
+        yield dict(DEFAULT_CONFIG, **dict(zip(keys, values)))
+
+
+def random_candidates(space, trials, seed):
+    rng = random.Random(seed)
+    keys = sorted(space)
+    seen = set()
+    for _ in range(trials * 20):  # bounded retries when the space has fewer distinct points
+        config = dict(DEFAULT_CONFIG, **{key: rng.choice(space[key]) for key in keys})
+        fingerprint = json.dumps(config, sort_keys=True)
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            yield config
+            if len(seen) == trials:
+                return
+
+# --- Worker ---
+
+def _init_worker(threads):
+    # Must run before TensorFlow creates its thread pools
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_trial(trial_id, config, data_dir, out_dir, stream, seed):
+    """Trains and evaluates one candidate; returns a flat result row."""
+    import numpy as np
+    import tensorflow as tf
+    from sklearn.metrics import classification_report
+
+    from data_pipeline import open_arrays, predict_indices, split_indices
+    from train_model import build_model, compile_model, fit_model
+
+    started = time.perf_counter()
+    row = {'trial': trial_id, 'config': json.dumps(config, sort_keys=True)}
+    try:
+        tf.keras.utils.set_random_seed(seed + trial_id)
+        X, y = open_arrays(data_dir)
+        train_idx, test_idx = split_indices(y, data_dir)
+
+        model = build_model(config['conv_filters'], config['kernel_sizes'], config['dense_units'], config['dropout'])
+        compile_model(model, config['learning_rate'])
+        _, fit_seconds = fit_model(model, X, y, train_idx, test_idx, config['epochs'], config['batch_size'],
+                                   stream=stream, verbose=0)
+
+        y_pred = (predict_indices(model.predict_on_batch, X, test_idx) > 0.5).astype('int32')
+        report = classification_report(np.asarray(y[test_idx]), y_pred, labels=[0, 1], output_dict=True,
+                                       zero_division=0)
+
+        model_path = os.path.join(out_dir, f'trial_{trial_id:03d}.h5')
+        model.save(model_path)
+
+        row.update({
+            'status': 'ok',
+            'accuracy': report['accuracy'],
+            'macro_f1': report['macro avg']['f1-score'],
+            'abnormal_precision': report['1']['precision'],
+            'abnormal_recall': report['1']['recall'],
+            'abnormal_f1': report['1']['f1-score'],
+            'train_samples_per_sec': len(train_idx) * config['epochs'] / fit_seconds,
+            'fit_seconds': fit_seconds,
+            'params': model.count_params(),
+            'model_bytes': os.path.getsize(model_path),
+            'model_path': model_path,
+        })
+    except Exception as e:
+        row.update({'status': f'failed: {type(e).__name__}: {e}'})
+    row['wall_seconds'] = time.perf_counter() - started
+    return row
+
+# --- Driver ---
+
+COLUMNS = ['trial', 'status', *METRICS, 'train_samples_per_sec', 'fit_seconds', 'wall_seconds',
+           'params', 'model_bytes', 'model_path', 'config']
+
+
+def sweep(candidates, data_dir='.', out_dir='sweep', workers=2, threads_per_worker=None, stream=False,
+          metric='macro_f1', seed=42):
+    os.makedirs(out_dir, exist_ok=True)
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    results_path = os.path.join(out_dir, 'results.csv')
+
+    # Make sure split.npz exists before workers race to create it
+    from data_pipeline import open_arrays, split_indices
+    split_indices(open_arrays(data_dir)[1], data_dir)
+
+    rows = []
+    # spawn, not fork: TensorFlow's runtime is not fork-safe
+    context = multiprocessing.get_context('spawn')
+    with open(results_path, 'w', newline='') as f, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                initializer=_init_worker, initargs=(threads,)) as pool:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        futures = [pool.submit(run_trial, i, config, data_dir, out_dir, stream, seed)
+                   for i, config in enumerate(candidates)]
+        print(f"🚀 {len(futures)} candidates on {workers} workers x {threads} threads")
+
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            writer.writerow(row)
+            f.flush()
+            if row['status'] == 'ok':
+                print(f"trial {row['trial']:3d}: {metric}={row[metric]:.4f} "
+                      f"{row['train_samples_per_sec']:.0f} samples/s {row['wall_seconds']:.1f}s {row['config']}")
+            else:
+                print(f"trial {row['trial']:3d}: {row['status']}")
+
+    finished = [row for row in rows if row['status'] == 'ok']
+    if not finished:
+        print("❌ No candidate finished")
+        return rows, None
+
+    best = max(finished, key=lambda row: row[metric])
+    shutil.copyfile(best['model_path'], os.path.join(out_dir, 'best_model.h5'))
+    with open(os.path.join(out_dir, 'best.json'), 'w') as f:
+        json.dump(best, f, indent=2)
+    print(f"\n✅ Best: trial {best['trial']} with {metric}={best[metric]:.4f} -> {out_dir}/best_model.h5")
+    print(f"   {best['config']}")
+    print(f"📋 Results table: {results_path}")
+    return rows, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter / architecture sweep for the arrhythmia CNN")
+    parser.add_argument('--space', help="JSON file mapping settings to lists of values (default: DEFAULT_SPACE)")
+    parser.add_argument('--mode', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--trials', type=int, default=10, help="candidates to sample in random mode")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help="TensorFlow intra-op threads per worker (default: CPUs / workers)")
+    parser.add_argument('--metric', choices=METRICS, default='macro_f1', help="metric used to pick the best model")
+    parser.add_argument('--stream', action='store_true', help="train from the memmapped arrays via tf.data")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--out-dir', default='sweep')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    unknown = set(space) - set(DEFAULT_CONFIG)
+    if unknown:
+        parser.error(f"Unknown settings in search space: {sorted(unknown)}")
+
+    if args.mode == 'grid':
+        candidates = list(grid_candidates(space))
+    else:
+        candidates = list(random_candidates(space, args.trials, args.seed))
+
+    # build_model needs one kernel size per conv layer; catch a bad space before any training starts
+    mismatched = {(tuple(c['conv_filters']), tuple(c['kernel_sizes'])) for c in candidates
+                  if len(c['conv_filters']) != len(c['kernel_sizes'])}
+    if mismatched:
+        parser.error("conv_filters and kernel_sizes must have the same length; mismatched pairs: "
+                     + ", ".join(f"{list(f)} / {list(k)}" for f, k in sorted(mismatched)))
+
+    sweep(candidates, args.data_dir, args.out_dir, args.workers, args.threads_per_worker, args.stream,
+          args.metric, args.seed)
+
+
+if __name__ == '__main__':
+    main()
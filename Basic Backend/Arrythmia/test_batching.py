@@ -0,0 +1,90 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+
+
+class RecordingModel:
+    """predict_fn that records every batch it is called with; `gate` holds it until set."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = fail
+
+    def __call__(self, batch):
+        self.gate.wait(5)
+        self.batches.append(batch.copy())
+        if self.fail:
+            raise ValueError("model exploded")
+        return batch.sum(axis=1, keepdims=True)
+
+
+def test_concurrent_samples_share_one_forward_pass():
+    model = RecordingModel()
+    model.gate.clear()  # hold the first batch so the rest queue up behind it
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=50)
+
+    first = batcher.submit(np.full(3, 1.0))
+    time.sleep(0.1)  # the batcher thread is now blocked inside predict_fn with one sample
+    futures = [batcher.submit(np.full(3, float(i))) for i in range(2, 7)]
+    model.gate.set()
+
+    assert first.result(5) == pytest.approx([3.0])
+    assert [f.result(5)[0] for f in futures] == [3.0 * i for i in range(2, 7)]
+    assert [len(b) for b in model.batches] == [1, 4, 1]  # capped at max_batch_size
+    metrics = batcher.metrics()
+    assert metrics['items'] == 6 and metrics['batches'] == 3
+    assert metrics['batch_size_histogram'] == {'1': 2, '4': 1}
+    batcher.close()
+
+
+def test_lone_sample_is_flushed_after_max_wait():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=32, max_wait_ms=30)
+
+    started = time.perf_counter()
+    result = batcher.predict(np.ones(2), timeout=5)
+    elapsed = time.perf_counter() - started
+
+    assert result == pytest.approx([2.0])
+    assert [len(b) for b in model.batches] == [1]
+    assert 0.025 <= elapsed < 1.0  # waited for company, then ran alone
+    batcher.close()
+
+
+def test_error_reaches_every_waiter_in_the_batch():
+    model = RecordingModel(fail=True)
+    model.gate.clear()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=50)
+
+    blocker = batcher.submit(np.zeros(2))
+    time.sleep(0.1)
+    futures = [batcher.submit(np.zeros(2)) for _ in range(3)]
+    model.gate.set()
+
+    for future in [blocker] + futures:
+        with pytest.raises(ValueError, match="model exploded"):
+            future.result(5)
+    assert [len(b) for b in model.batches] == [1, 3]
+    assert batcher.metrics()['errors'] == 2
+    batcher.close()
+
+
+def test_close_flushes_queued_samples_then_stops_the_thread():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=2000)
+
+    futures = [batcher.submit(np.ones(2)) for _ in range(3)]
+    started = time.perf_counter()
+    batcher.close()
+
+    # The stop marker ends the batch early instead of waiting out max_wait_ms
+    assert time.perf_counter() - started < 1.0
+    assert not batcher._thread.is_alive()
+    assert [f.result(0)[0] for f in futures] == [2.0, 2.0, 2.0]
+    assert [len(b) for b in model.batches] == [3]
@@ -1,24 +1,34 @@
 import numpy as np
-from tensorflow.keras.models import load_model
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 
-# Step 1: Load test data (you must have X_test, y_test saved or re-created)
-# Option A: Re-split the data (same as in training)
-X = np.load('X.npy')
-y = np.load('y.npy')
-X = X.reshape(X.shape[0], X.shape[1], 1)
+from data_pipeline import open_arrays, predict_indices, split_indices
 
-from sklearn.model_selection import train_test_split
-_, X_test, _, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
 
-# Step 2: Load the saved model
-model = load_model('arrhythmia_cnn.h5')
+def evaluate(y_test, y_pred):
+    """Test accuracy and per-class report for thresholded predictions."""
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'confusion_matrix': confusion_matrix(y_test, y_pred),
+        'report': classification_report(y_test, y_pred, target_names=['Normal', 'Abnormal']),
+    }
 
-# Step 3: Predict on test set
-y_pred = (model.predict(X_test) > 0.5).astype("int32")
 
-# Step 4: Evaluate
-test_acc = accuracy_score(y_test, y_pred)
-print(f"Test Accuracy: {test_acc:.4f}")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred, target_names=['Normal', 'Abnormal']))
\ No newline at end of file
+if __name__ == '__main__':
+    from tensorflow.keras.models import load_model
+
+    # Step 1: Open the data memory-mapped and load the saved train/test split
+    X, y = open_arrays()
+    _, test_idx = split_indices(y)
+    y_test = np.asarray(y[test_idx])
+
+    # Step 2: Load the saved model
+    model = load_model('arrhythmia_cnn.h5')
+
+    # Step 3: Predict on the test set, streaming batches from the memmap
+    y_pred = (predict_indices(model.predict_on_batch, X, test_idx) > 0.5).astype("int32")
+
+    # Step 4: Evaluate
+    metrics = evaluate(y_test, y_pred)
+    print(f"Test Accuracy: {metrics['accuracy']:.4f}")
+    print("\nClassification Report:")
+    print(metrics['report'])
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+import wfdb
+from wfdb.io.annotation import ann_label_table
+
+from wfdb_memory import _BEAT_CODES, read_beat_annotations, read_signal
+
+FS = 360
+
+
+def write_record(directory, name, fmt, n_samples):
+    """A two-channel record written by wfdb itself, like bench_arrhythmia.synthetic_record, with a few gaps."""
+    rng = np.random.default_rng(0)
+    t = np.arange(n_samples) / FS
+    beats = np.sin(2 * np.pi * 1.2 * t) ** 63
+    signal = np.column_stack([beats + 0.05 * rng.standard_normal(t.size),
+                              -0.5 * beats + 0.05 * rng.standard_normal(t.size)])
+    signal[[3, 100], 0] = np.nan  # invalid samples
+    signal[7, 1] = np.nan
+    wfdb.wrsamp(name, fs=FS, units=['mV', 'mV'], sig_name=['MLII', 'V5'], p_signal=signal,
+                fmt=[fmt, fmt], write_dir=str(directory))
+    return os.path.join(str(directory), name)
+
+
+@pytest.mark.parametrize('fmt', ['212', '16', '80'])
+@pytest.mark.parametrize('n_samples', [FS * 10, FS * 10 + 1])  # odd length leaves a half-filled 212 triple
+@pytest.mark.parametrize('channel', [0, 1])
+def test_read_signal_matches_rdrecord(tmp_path, fmt, n_samples, channel):
+    path = write_record(tmp_path, f'rec{fmt}', fmt, n_samples)
+    with open(path + '.hea', 'rb') as f:
+        hea = f.read()
+    with open(path + '.dat', 'rb') as f:
+        dat = f.read()
+
+    signal, fs = read_signal(hea, dat, f'rec{fmt}.dat', channel=channel)
+    record = wfdb.rdrecord(path, channels=[channel])
+
+    assert fs == record.fs
+    assert signal.dtype == record.p_signal.dtype
+    np.testing.assert_array_equal(signal, record.p_signal[:, 0])  # NaNs compare equal
+    assert np.isnan(signal).sum() == (2 if channel == 0 else 1)
+
+
+def test_read_beat_annotations_matches_rdann(tmp_path):
+    rng = np.random.default_rng(1)
+    # Gaps over 1023 samples need SKIP entries; rhythm and noise labels carry aux notes
+    # or are not beats, and two annotations share a sample
+    samples = np.cumsum(rng.integers(1, 400, size=300))
+    samples[150:] += 5000
+    samples[200:] += 70000
+    samples = np.sort(np.append(samples, samples[10]))
+    symbols = rng.choice(['N', 'V', 'A', 'L', '/', 'f', '+', '~', '|', 'Q', 'x'], size=len(samples)).tolist()
+    aux_note = ['(AFIB' if s == '+' else '' for s in symbols]
+    wfdb.wrann('rec', 'atr', samples, symbol=symbols, aux_note=aux_note, fs=FS, write_dir=str(tmp_path))
+
+    with open(tmp_path / 'rec.atr', 'rb') as f:
+        beats = read_beat_annotations(f.read())
+
+    annotation = wfdb.rdann(str(tmp_path / 'rec'), 'atr')
+    beat_symbols = set(ann_label_table.loc[ann_label_table['label_store'].isin(_BEAT_CODES), 'symbol'])
+    expected = annotation.sample[np.isin(annotation.symbol, list(beat_symbols))]
+    assert len(expected) > 0 and len(expected) < len(annotation.sample)
+    np.testing.assert_array_equal(beats, expected)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from windowing import WINDOW_LEN, iter_window_batches, record_verdict, stride_starts, summarize_burden
+
+FS = 360.0
+
+
+@pytest.mark.parametrize('n_samples, expected_last', [
+    (WINDOW_LEN - 1, None),              # too short for a single window
+    (WINDOW_LEN, 0),                     # exactly one window
+    (WINDOW_LEN + 179, 0),               # tail shorter than a stride is not windowed
+    (WINDOW_LEN + 180, 180),             # last window ends on the final sample
+    (10 * WINDOW_LEN + 7, 9 * WINDOW_LEN),
+])
+def test_stride_starts_keep_every_window_inside_the_record(n_samples, expected_last):
+    starts = stride_starts(n_samples)
+    if expected_last is None:
+        assert starts.size == 0
+        return
+    assert starts[0] == 0 and starts[-1] == expected_last
+    assert np.all(np.diff(starts) == 180)
+    assert starts[-1] + WINDOW_LEN <= n_samples
+
+
+def test_window_batches_match_slices_up_to_the_record_tail():
+    signal = np.arange(WINDOW_LEN * 3 + 50, dtype=np.float64)
+    starts = stride_starts(len(signal))
+    batches = list(iter_window_batches(signal, starts, batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 2, 1]
+    windows = np.concatenate(batches)
+    assert windows.shape == (len(starts), WINDOW_LEN, 1) and windows.dtype == np.float32
+    for start, window in zip(starts, windows):
+        np.testing.assert_array_equal(window[:, 0], signal[start:start + WINDOW_LEN].astype(np.float32))
+    assert windows[-1, -1, 0] == signal[starts[-1] + WINDOW_LEN - 1]
+
+
+def test_summarize_burden_counts_overlapping_runs_once():
+    starts = stride_starts(WINDOW_LEN * 6)  # 11 half-overlapping windows
+    probs = np.array([0.9, 0.8, 0.1, 0.1, 0.1, 0.7, 0.6, 0.9, 0.2, 0.1, 0.95], dtype=np.float32)
+    summary = summarize_burden(starts, probs, FS, n_samples=WINDOW_LEN * 6)
+
+    assert summary['windows'] == 11
+    assert summary['abnormal_windows'] == 6
+    assert summary['burden'] == pytest.approx(6 / 11)
+    # Runs: windows 0-1 (1.5 s), 5-7 (2.0 s), 10 (1.0 s)
+    assert summary['longest_abnormal_run_seconds'] == pytest.approx(2.0)
+    assert summary['abnormal_seconds'] == pytest.approx(4.5)
+    assert summary['max_probability'] == pytest.approx(0.95)
+    assert summary['record_seconds'] == pytest.approx(6.0)
+
+
+def test_summarize_burden_of_a_clean_or_empty_record():
+    starts = stride_starts(WINDOW_LEN * 3)
+    clean = summarize_burden(starts, np.full(len(starts), 0.5, dtype=np.float32), FS)  # threshold is exclusive
+    assert clean['abnormal_windows'] == 0 and clean['abnormal_seconds'] == 0.0
+    assert clean['longest_abnormal_run_seconds'] == 0.0
+
+    empty = summarize_burden(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), FS)
+    assert empty['windows'] == 0 and empty['burden'] == 0.0
+
+
+def summary(burden, longest_run, windows=100):
+    return {'windows': windows, 'burden': burden, 'longest_abnormal_run_seconds': longest_run}
+
+
+@pytest.mark.parametrize('burden, longest_run, triggered_by', [
+    (0.02, 1.0, []),                                         # isolated abnormal windows
+    (0.1, 1.0, ['burden']),                                  # burden threshold is inclusive
+    (0.099, 3.0, ['longest_abnormal_run']),                  # run threshold is inclusive
+    (0.099, 2.99, []),
+    (0.5, 10.0, ['burden', 'longest_abnormal_run']),
+])
+def test_record_verdict_thresholds(burden, longest_run, triggered_by):
+    verdict = record_verdict(summary(burden, longest_run), min_burden=0.1, min_run_seconds=3.0)
+    assert verdict['triggered_by'] == triggered_by
+    assert verdict['abnormal'] is bool(triggered_by)
+    assert (verdict['min_burden'], verdict['min_run_seconds']) == (0.1, 3.0)
+
+
+def test_record_verdict_without_windows_is_never_abnormal():
+    verdict = record_verdict(summary(0.0, 0.0, windows=0), min_burden=0.0, min_run_seconds=0.0)
+    assert not verdict['abnormal']
+
+
+def test_record_verdict_from_a_real_summary():
+    starts = stride_starts(WINDOW_LEN * 6)
+    probs = np.zeros(len(starts), dtype=np.float32)
+    probs[[2, 8]] = 0.9  # two isolated windows: 2/11 burden, 1 s runs
+    verdict = record_verdict(summarize_burden(starts, probs, FS), min_burden=0.25, min_run_seconds=3.0)
+    assert not verdict['abnormal']
+
+    probs[2:7] = 0.9  # one 3 s run
+    verdict = record_verdict(summarize_burden(starts, probs, FS), min_burden=0.75, min_run_seconds=3.0)
+    assert verdict['triggered_by'] == ['longest_abnormal_run']
@@ -1,90 +1,164 @@
+import argparse
+import time
+
 import numpy as np
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv1D, MaxPooling1D, Dense, Flatten, Dropout
-from sklearn.model_selection import train_test_split
 from sklearn.utils import class_weight
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import matplotlib.pyplot as plt
-
-# Load data
-X = np.load('X.npy')
-y = np.load('y.npy')
-
-# Reshape for CNN: (samples, timesteps, features)
-X = X.reshape(X.shape[0], X.shape[1], 1)
-
-# Split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
-
-# Handle class imbalance
-class_weights = dict(enumerate(
-    class_weight.compute_class_weight('balanced', classes=np.unique(y_train), y=y_train)
-))
-
-# Build model
-model = Sequential([
-    Conv1D(32, 7, activation='relu', input_shape=(360, 1)),
-    MaxPooling1D(2),
-    Conv1D(64, 5, activation='relu'),
-    MaxPooling1D(2),
-    Conv1D(64, 3, activation='relu'),
-    Flatten(),
-    Dense(64, activation='relu'),
-    Dropout(0.5),
-    Dense(1, activation='sigmoid')
-])
-
-model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
-model.summary()
-
-# Train
-history = model.fit(
-    X_train, y_train,
-    epochs=15,
-    batch_size=64,
-    validation_data=(X_test, y_test),
-    class_weight=class_weights
-)
-
-# Save model
-model.save('arrhythmia_cnn.h5')
-
-# -----------------------------
-# 🔍 EVALUATION ON TEST SET
-# -----------------------------
-# Get predictions
-y_pred_prob = model.predict(X_test)
-y_pred = (y_pred_prob > 0.5).astype("int32")
-
-# Compute accuracy
-test_accuracy = accuracy_score(y_test, y_pred)
-print(f"\n✅ Test Accuracy: {test_accuracy:.4f} ({test_accuracy * 100:.2f}%)")
-
-# Confusion Matrix
-print("\n📋 Confusion Matrix:")
-cm = confusion_matrix(y_test, y_pred)
-print(cm)
-
-# Classification Report
-print("\n📊 Classification Report:")
-print(classification_report(y_test, y_pred, target_names=['Normal (0)', 'Abnormal (1)']))
-
-# Optional: Plot training history
-plt.figure(figsize=(12, 4))
-plt.subplot(1, 2, 1)
-plt.plot(history.history['accuracy'], label='Train Accuracy')
-plt.plot(history.history['val_accuracy'], label='Val Accuracy')
-plt.title('Model Accuracy')
-plt.xlabel('Epoch')
-plt.ylabel('Accuracy')
-plt.legend()
-
-plt.subplot(1, 2, 2)
-plt.plot(history.history['loss'], label='Train Loss')
-plt.plot(history.history['val_loss'], label='Val Loss')
-plt.title('Model Loss')
-plt.xlabel('Epoch')
-plt.ylabel('Loss')
-plt.legend()
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+
+from data_pipeline import make_dataset, open_arrays, predict_indices, split_indices
+
+# The architecture and training settings this script has always used; sweep.py varies them
+DEFAULT_CONFIG = {
+    'conv_filters': (32, 64, 64),
+    'kernel_sizes': (7, 5, 3),
+    'dense_units': 64,
+    'dropout': 0.5,
+    'learning_rate': 0.001,
+    'epochs': 15,
+    'batch_size': 64,
+}
+
+
+def build_model(conv_filters=(32, 64, 64), kernel_sizes=(7, 5, 3), dense_units=64, dropout=0.5):
+    """Conv1D stack with 2x max-pooling between convolutions, then a dense sigmoid head."""
+    if len(conv_filters) != len(kernel_sizes):
+        raise ValueError(f"conv_filters and kernel_sizes need one entry per Conv1D layer; "
+                         f"got {len(conv_filters)} and {len(kernel_sizes)}")
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Conv1D, MaxPooling1D, Dense, Flatten, Dropout, Input
+
+    layers = [Input(shape=(360, 1))]
+    for i, (filters, kernel_size) in enumerate(zip(conv_filters, kernel_sizes)):
+        if i > 0:
+            layers.append(MaxPooling1D(2))
+        layers.append(Conv1D(filters, kernel_size, activation='relu'))
+    layers += [
+        Flatten(),
+        Dense(dense_units, activation='relu'),
+        Dropout(dropout),
+        Dense(1, activation='sigmoid')
+    ]
+    return Sequential(layers)
+
+
+def compile_model(model, learning_rate=0.001):
+    from tensorflow.keras.optimizers import Adam
+
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='binary_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def fit_model(model, X, y, train_idx, test_idx, epochs, batch_size, stream=False, verbose=1):
+    """Trains on the split with balanced class weights. Returns (history, fit_seconds)."""
+    y_train, y_test = np.asarray(y[train_idx]), np.asarray(y[test_idx])
+
+    # Handle class imbalance
+    class_weights = dict(enumerate(
+        class_weight.compute_class_weight('balanced', classes=np.unique(y_train), y=y_train)
+    ))
+
+    started = time.perf_counter()
+    if stream:
+        history = model.fit(
+            make_dataset(X, y, train_idx, batch_size, shuffle=True),
+            epochs=epochs,
+            validation_data=make_dataset(X, y, test_idx, batch_size),
+            class_weight=class_weights,
+            verbose=verbose
+        )
+    else:
+        # Reshape for CNN: (samples, timesteps, features)
+        X_train = np.asarray(X[train_idx])[..., np.newaxis]
+        X_test = np.asarray(X[test_idx])[..., np.newaxis]
+        history = model.fit(
+            X_train, y_train,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_data=(X_test, y_test),
+            class_weight=class_weights,
+            verbose=verbose
+        )
+    return history, time.perf_counter() - started
+
+
+def plot_history(history, path='training_history.png', show=False):
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')  # headless: only write the PNG
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(12, 4))
+    plt.subplot(1, 2, 1)
+    plt.plot(history.history['accuracy'], label='Train Accuracy')
+    plt.plot(history.history['val_accuracy'], label='Val Accuracy')
+    plt.title('Model Accuracy')
+    plt.xlabel('Epoch')
+    plt.ylabel('Accuracy')
+    plt.legend()
+
+    plt.subplot(1, 2, 2)
+    plt.plot(history.history['loss'], label='Train Loss')
+    plt.plot(history.history['val_loss'], label='Val Loss')
+    plt.title('Model Loss')
+    plt.xlabel('Epoch')
+    plt.ylabel('Loss')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(path)
+    if show:
+        plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the arrhythmia CNN on X.npy / y.npy")
+    parser.add_argument('--stream', action='store_true',
+                        help="feed model.fit from the memory-mapped arrays through a prefetching tf.data "
+                             "pipeline instead of loading the training data into RAM")
+    parser.add_argument('--epochs', type=int, default=DEFAULT_CONFIG['epochs'])
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_CONFIG['batch_size'])
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--show', action='store_true', help="open the training plot window (blocks)")
+    args = parser.parse_args()
+
+    # Load data (memory-mapped) and the shared stratified split saved in split.npz
+    X, y = open_arrays(args.data_dir)
+    train_idx, test_idx = split_indices(y, args.data_dir)
+    y_test = np.asarray(y[test_idx])
+
+    # Build model
+    model = build_model()
+    compile_model(model)
+    model.summary()
+
+    # Train
+    history, _ = fit_model(model, X, y, train_idx, test_idx, args.epochs, args.batch_size, args.stream)
+
+    # Save model
+    model.save('arrhythmia_cnn.h5')
+
+    # -----------------------------
+    # 🔍 EVALUATION ON TEST SET
+    # -----------------------------
+    # Get predictions (streamed from the memmap in either mode)
+    y_pred_prob = predict_indices(model.predict_on_batch, X, test_idx)
+    y_pred = (y_pred_prob > 0.5).astype("int32")
+
+    # Compute accuracy
+    test_accuracy = accuracy_score(y_test, y_pred)
+    print(f"\n✅ Test Accuracy: {test_accuracy:.4f} ({test_accuracy * 100:.2f}%)")
+
+    # Confusion Matrix
+    print("\n📋 Confusion Matrix:")
+    cm = confusion_matrix(y_test, y_pred)
+    print(cm)
+
+    # Classification Report
+    print("\n📊 Classification Report:")
+    print(classification_report(y_test, y_pred, target_names=['Normal (0)', 'Abnormal (1)']))
+
+    # Plot training history (saved to training_history.png; --show also opens it)
+    plot_history(history, show=args.show)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+In-memory WFDB decoding for uploaded records.
+
+Parses a .hea header and the matching .dat signal file straight from the
+uploaded bytes, so requests no longer write to a temporary directory and read
+it back through wfdb.rdrecord. Formats 212 (MIT-BIH), 16 and 80 are decoded
+with vectorized NumPy; anything else raises UnsupportedRecord so the caller
+can fall back to wfdb. Physical values match wfdb's p_signal exactly:
+(digital - baseline) / adc_gain in float64, with invalid samples as NaN.
+"""
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Digital value wfdb treats as "no sample" for each format
+_INVALID_SAMPLE = {212: -2048, 16: -32768, 80: -128}
+
+# MIT annotation codes that mark a beat (wfdb's ann_label_table "is QRS")
+_BEAT_CODES = frozenset([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 25, 30, 34, 35, 38, 41])
+
+# Special codes in the MIT annotation stream
+_SKIP, _NUM, _SUB, _CHN, _AUX = 59, 60, 61, 62, 63
+
+_SIGNAL_SPEC = re.compile(
+    r'(?P<fmt>\d+)(?:x(?P<spf>\d+))?(?::(?P<skew>\d+))?(?:\+(?P<offset>\d+))?$'
+)
+_GAIN_SPEC = re.compile(
+    r'(?P<gain>[-+\d.eE]+)(?:\((?P<baseline>-?\d+)\))?(?:/(?P<units>\S+))?$'
+)
+
+
+class UnsupportedRecord(ValueError):
+    """The upload uses a WFDB feature this decoder does not handle."""
+
+
+def parse_header(text: str) -> Dict:
+    """Parses a single-segment WFDB header into the fields needed to decode signals."""
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line and not line.startswith('#')]
+    if not lines:
+        raise ValueError("Empty .hea header")
+
+    record_line = lines[0].split()
+    if '/' in record_line[0]:
+        raise UnsupportedRecord("Multi-segment records are not supported in memory")
+    n_sig = int(record_line[1])
+    fs = float(record_line[2].split('/')[0]) if len(record_line) > 2 else 250.0
+    sig_len = int(record_line[3]) if len(record_line) > 3 else None
+
+    signals: List[Dict] = []
+    for line in lines[1:1 + n_sig]:
+        fields = line.split()
+        spec = _SIGNAL_SPEC.match(fields[1])
+        if spec is None:
+            raise ValueError(f"Bad signal format field: {fields[1]}")
+
+        adc_gain, baseline, adc_zero = 200.0, None, 0
+        if len(fields) > 2:
+            gain = _GAIN_SPEC.match(fields[2])
+            if gain is None:
+                raise ValueError(f"Bad ADC gain field: {fields[2]}")
+            adc_gain = float(gain.group('gain')) or 200.0
+            if gain.group('baseline') is not None:
+                baseline = int(gain.group('baseline'))
+        if len(fields) > 4:
+            adc_zero = int(fields[4])
+
+        signals.append({
+            'file_name': fields[0],
+            'fmt': int(spec.group('fmt')),
+            'samps_per_frame': int(spec.group('spf') or 1),
+            'skew': int(spec.group('skew') or 0),
+            'byte_offset': int(spec.group('offset') or 0),
+            'adc_gain': adc_gain,
+            'baseline': adc_zero if baseline is None else baseline,
+            'description': ' '.join(fields[8:]) if len(fields) > 8 else '',
+        })
+
+    if len(signals) != n_sig:
+        raise ValueError(f"Header declares {n_sig} signals but lists {len(signals)}")
+    return {'record_name': record_line[0], 'n_sig': n_sig, 'fs': fs, 'sig_len': sig_len, 'signals': signals}
+
+
+def _decode_212(raw: np.ndarray) -> np.ndarray:
+    """Two 12-bit two's-complement samples packed into every 3 bytes."""
+    n_full = len(raw) // 3
+    triples = raw[:n_full * 3].reshape(-1, 3).astype(np.int16)
+    n_samples = 2 * n_full + (1 if len(raw) % 3 == 2 else 0)
+    samples = np.empty(n_samples, dtype=np.int16)
+    samples[0:2 * n_full:2] = triples[:, 0] | ((triples[:, 1] & 0x0F) << 8)
+    samples[1:2 * n_full:2] = triples[:, 2] | ((triples[:, 1] & 0xF0) << 4)
+    if len(raw) % 3 == 2:
+        samples[-1] = int(raw[-2]) | ((int(raw[-1]) & 0x0F) << 8)
+    samples[samples > 2047] -= 4096
+    return samples
+
+
+def _decode(fmt: int, data: bytes, byte_offset: int) -> np.ndarray:
+    if fmt == 212:
+        return _decode_212(np.frombuffer(data, dtype=np.uint8, offset=byte_offset))
+    if fmt == 16:
+        usable = (len(data) - byte_offset) // 2 * 2
+        return np.frombuffer(data, dtype='<i2', count=usable // 2, offset=byte_offset)
+    if fmt == 80:
+        return (np.frombuffer(data, dtype=np.uint8, offset=byte_offset).astype(np.int16) - 128)
+    raise UnsupportedRecord(f"Signal format {fmt} is not supported in memory")
+
+
+def read_signal(hea_bytes: bytes, dat_bytes: bytes, dat_name: str, channel: int = 0) -> Tuple[np.ndarray, float]:
+    """
+    Decodes one channel of an uploaded record into physical units.
+    Returns (signal, fs), equivalent to
+    wfdb.rdrecord(name, channels=[channel]).p_signal[:, 0] and record.fs.
+    """
+    header = parse_header(hea_bytes.decode('latin-1'))
+    signals = header['signals']
+    if channel >= len(signals):
+        raise ValueError(f"Record has no channel {channel}")
+
+    target = signals[channel]
+    if target['file_name'] != dat_name:
+        raise UnsupportedRecord(f"Channel {channel} is stored in {target['file_name']}, not {dat_name}")
+
+    # Signals sharing this file are interleaved frame by frame, in header order
+    in_file = [sig for sig in signals if sig['file_name'] == target['file_name']]
+    if any(sig['fmt'] != target['fmt'] or sig['samps_per_frame'] != 1 or sig['skew'] for sig in in_file):
+        raise UnsupportedRecord("Mixed formats, multi-sample frames or skew are not supported in memory")
+    n_in_file = len(in_file)
+    position = in_file.index(target)
+
+    samples = _decode(target['fmt'], dat_bytes, target['byte_offset'])
+    n_frames = len(samples) // n_in_file
+    if header['sig_len'] is not None:
+        n_frames = min(n_frames, header['sig_len'])
+    digital = samples[position:n_frames * n_in_file:n_in_file]
+
+    signal = digital.astype(np.float64)
+    signal -= target['baseline']
+    signal /= target['adc_gain']
+    signal[digital == _INVALID_SAMPLE[target['fmt']]] = np.nan
+    return signal, header['fs']
+
+
+def read_beat_annotations(atr_bytes: bytes) -> np.ndarray:
+    """Sample positions of the beat annotations in an MIT-format (.atr) file."""
+    words = np.frombuffer(atr_bytes, dtype='<u2', count=len(atr_bytes) // 2)
+    codes = (words >> 10).tolist()
+    intervals = (words & 0x3FF).tolist()
+
+    samples: List[int] = []
+    t = 0
+    i = 0
+    while i < len(codes):
+        code, interval = codes[i], intervals[i]
+        if code == 0 and interval == 0:
+            break  # end of file
+        if code == _SKIP:
+            # The skip is a 32-bit PDP-11 long in the next two words (high word first)
+            value = (int(words[i + 1]) << 16) | int(words[i + 2])
+            t += value - (1 << 32) if value >= (1 << 31) else value
+            i += 3
+            continue
+        if code == _AUX:
+            i += 1 + (interval + 1) // 2
+            continue
+        if code in (_NUM, _SUB, _CHN):
+            i += 1
+            continue
+
+        t += interval
+        if code in _BEAT_CODES:
+            samples.append(t)
+        i += 1
+
+    return np.asarray(samples, dtype=np.int64)
@@ -0,0 +1,130 @@
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW_LEN = 360          # 1 second at 360 Hz, same as prepare_data.py
+DEFAULT_STRIDE = 180      # half-window overlap
+WINDOW_BATCH_SIZE = 1024  # windows per forward pass (~1.5 MB of float32 per batch)
+
+
+def stride_starts(n_samples: int, stride: int = DEFAULT_STRIDE, win_len: int = WINDOW_LEN) -> np.ndarray:
+    """Start sample of every full window taken every `stride` samples."""
+    if n_samples < win_len:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(0, n_samples - win_len + 1, max(1, int(stride)), dtype=np.int64)
+
+
+def rpeak_starts(n_samples: int, peaks: np.ndarray, win_len: int = WINDOW_LEN) -> np.ndarray:
+    """
+    Start sample of the window centred on each R-peak, keeping only windows
+    that prepare_data.py would have kept (start >= 0 and end < n_samples).
+    """
+    starts = np.unique(np.asarray(peaks, dtype=np.int64)) - win_len // 2
+    ends = starts + win_len
+    return starts[(starts >= 0) & (ends < n_samples)]
+
+
+def detect_rpeaks(signal: np.ndarray, fs: float) -> np.ndarray:
+    """
+    Lightweight Pan-Tompkins style R-peak detector for records uploaded
+    without an .atr file: 5-15 Hz band-pass, squared slope, 150 ms moving
+    integration, then maxima at least 250 ms apart (max ~240 bpm), each
+    snapped to the largest deflection within 50 ms.
+    """
+    from scipy.signal import butter, filtfilt, find_peaks
+
+    signal = np.nan_to_num(signal)
+    b, a = butter(2, [5.0 / (fs / 2), 15.0 / (fs / 2)], btype='band')
+    filtered = filtfilt(b, a, signal)
+    width = max(1, int(0.15 * fs))
+    energy = np.convolve(np.gradient(filtered) ** 2, np.ones(width) / width, mode='same')
+    candidates, _ = find_peaks(energy, distance=max(1, int(0.25 * fs)), height=0.3 * np.percentile(energy, 99))
+    if candidates.size == 0:
+        return candidates
+
+    radius = max(1, int(0.05 * fs))
+    padded = np.pad(np.abs(filtered), radius, mode='edge')
+    neighbourhoods = sliding_window_view(padded, 2 * radius + 1)[candidates]
+    return candidates - radius + np.argmax(neighbourhoods, axis=1)
+
+
+def iter_window_batches(signal: np.ndarray, starts: np.ndarray, batch_size: int = WINDOW_BATCH_SIZE,
+                        win_len: int = WINDOW_LEN) -> Iterator[np.ndarray]:
+    """
+    Yields (batch, win_len, 1) float32 tensors for the given window starts.
+    Windows are read from a zero-copy strided view, so only one batch is ever
+    materialised at a time.
+    """
+    view = sliding_window_view(signal, win_len)
+    for i in range(0, len(starts), batch_size):
+        batch = np.asarray(view[starts[i:i + batch_size]], dtype=np.float32)
+        yield batch[..., np.newaxis]
+
+
+def score_windows(predict_fn: Callable[[np.ndarray], np.ndarray], signal: np.ndarray, starts: np.ndarray,
+                  batch_size: int = WINDOW_BATCH_SIZE) -> np.ndarray:
+    """Runs every window through the model in large batches; returns one probability per window."""
+    probs = np.empty(len(starts), dtype=np.float32)
+    offset = 0
+    for batch in iter_window_batches(signal, starts, batch_size):
+        out = np.asarray(predict_fn(batch)).reshape(-1)
+        probs[offset:offset + len(out)] = out
+        offset += len(out)
+    return probs
+
+
+def summarize_burden(starts: np.ndarray, probs: np.ndarray, fs: float, threshold: float = 0.5,
+                     win_len: int = WINDOW_LEN, n_samples: Optional[int] = None) -> Dict[str, float]:
+    """Aggregate arrhythmia burden over a record's window timeline."""
+    if len(probs) == 0:
+        return {"windows": 0, "abnormal_windows": 0, "burden": 0.0, "abnormal_seconds": 0.0,
+                "longest_abnormal_run_seconds": 0.0, "mean_probability": 0.0, "max_probability": 0.0}
+
+    abnormal = probs > threshold
+
+    # Seconds covered by at least one abnormal window (overlaps counted once).
+    # Starts are sorted, so a new run begins wherever a window starts after
+    # every earlier abnormal window has ended.
+    run_lengths = np.zeros(1, dtype=np.int64)
+    if abnormal.any():
+        a_starts = starts[abnormal]
+        a_ends = a_starts + win_len
+        new_run = np.ones(len(a_starts), dtype=bool)
+        new_run[1:] = a_starts[1:] > np.maximum.accumulate(a_ends)[:-1]
+        first = np.flatnonzero(new_run)
+        run_lengths = np.maximum.reduceat(a_ends, first) - a_starts[first]
+
+    summary = {
+        "windows": int(len(probs)),
+        "abnormal_windows": int(abnormal.sum()),
+        "burden": float(abnormal.mean()),
+        "abnormal_seconds": float(run_lengths.sum() / fs),
+        "longest_abnormal_run_seconds": float(run_lengths.max() / fs),
+        "mean_probability": float(probs.mean()),
+        "max_probability": float(probs.max()),
+    }
+    if n_samples is not None:
+        summary["record_seconds"] = float(n_samples / fs)
+    return summary
+
+
+def record_verdict(summary: Dict[str, float], min_burden: float, min_run_seconds: float) -> Dict[str, object]:
+    """
+    Record-level call from a summarize_burden summary. A record is abnormal when
+    at least `min_burden` of its windows are, or when one abnormal run lasts
+    `min_run_seconds` or longer; a few isolated abnormal windows are not enough.
+    """
+    triggered_by = []
+    if summary["windows"] and summary["burden"] >= min_burden:
+        triggered_by.append("burden")
+    if summary["windows"] and summary["longest_abnormal_run_seconds"] >= min_run_seconds:
+        triggered_by.append("longest_abnormal_run")
+    return {
+        "abnormal": bool(triggered_by),
+        "triggered_by": triggered_by,
+        "burden": summary["burden"],
+        "longest_abnormal_run_seconds": summary["longest_abnormal_run_seconds"],
+        "min_burden": min_burden,
+        "min_run_seconds": min_run_seconds,
+    }
@@ -1,19 +1,61 @@
-from flask import Flask, request, jsonify
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS  # 👈 added
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import os
+import sys
+
+# Basic Backend/ holds the helpers shared by the services (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from shared.metrics import CONTENT_TYPE, MetricsRegistry, instrument_flask
+from shared.model_loader import ModelLoader, ModelNotReady
+from shared.prediction_cache import PredictionCache
+from preprocessing import IMAGE_SIZE, decode_batch, decode_ecg_image, read_archive_images
 
 # 🔹 Initialize Flask app
 app = Flask(__name__)
 
 # 🔹 Enable CORS only for your frontend
-CORS(app, origins=["http://localhost:8080"])  # 👈 important
+CORS(app, origins=["http://localhost:8080"], expose_headers=["Server-Timing", "X-Request-ID"])  # 👈 important
+
+# 🔹 Batch upload settings (PIL releases the GIL while decoding/resizing, so threads scale)
+MAX_BATCH_IMAGES = int(os.environ.get("ECG_MAX_BATCH_IMAGES", 64))
+DECODE_WORKERS = int(os.environ.get("ECG_DECODE_WORKERS", min(8, os.cpu_count() or 1)))
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="ecg-decode")
+
+# 🔹 Seconds a request waits for the model while the service is still starting up
+MODEL_WAIT_SECONDS = float(os.environ.get("MODEL_WAIT_SECONDS", 30))
+WARMUP_BATCH_SIZE = 12  # one 12-lead series
+
+def warm_up(model):
+    # 🔹 Trace both call paths at the real input shape before traffic arrives
+    single = np.zeros((1,) + IMAGE_SIZE + (3,), dtype=np.float32)
+    model.predict(single, verbose=0)
+    model.predict_on_batch(single)
+    model.predict_on_batch(np.zeros((WARMUP_BATCH_SIZE,) + IMAGE_SIZE + (3,), dtype=np.float32))
 
-# 🔹 Load your trained model once when the server starts
-model_path = 'ecg_image.h5'  # Replace with your actual model path
-model = load_model(model_path)
+# 🔹 Runtime backend: "keras" serves ecg_image.h5, "tflite" the ecg_image.tflite from export_tflite.py
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "keras")
+if MODEL_BACKEND not in ("keras", "tflite"):
+    raise ValueError("MODEL_BACKEND must be 'keras' or 'tflite'")
+
+# 🔹 TensorFlow import, model load and warm-up run in the background; /health reports readiness
+model_path = 'ecg_image.tflite' if MODEL_BACKEND == 'tflite' else 'ecg_image.h5'
+# 🔹 Prediction cache keyed by image bytes + model hash (PREDICTION_CACHE_SIZE=0 disables it);
+#    the loader hashes the model on its thread and binds the cache once loaded
+cache = PredictionCache(
+    max_entries=int(os.environ.get("PREDICTION_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", 3600)),
+    persist_dir=os.environ.get("PREDICTION_CACHE_DIR"),
+    namespace=model_path,  # own subdirectory, so services can share PREDICTION_CACHE_DIR
+)
+loader = ModelLoader(model_path, warmup=warm_up, name="ecg-model-loader", on_ready=cache.bind).start()
 
 # 🔹 Define class labels (must match training)
 classes = [
@@ -23,9 +65,92 @@ classes = [
     'Normal Person ECG Images (284x12=3408)'
 ]
 
+# 🔹 Prometheus-style metrics at GET /metrics; send "X-Trace: 1" (or set
+# METRICS_TRACE_HEADERS=1) for per-stage Server-Timing and X-Request-ID headers
+metrics = MetricsRegistry('ecg_image')
+instrument_flask(app, metrics)
+metrics.callback('model_ready', '1 once the model is loaded and warmed.', lambda: int(loader.ready))
+metrics.callback('prediction_cache_lookups_total', 'Prediction cache lookups by result.',
+                 lambda: [((event,), cache.stats()[key]) for event, key in
+                          (('hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'))],
+                 kind='counter', labelnames=('result',))
+metrics.callback('prediction_cache_entries', 'Entries held in the in-memory prediction cache.',
+                 lambda: cache.stats()['entries'])
+
+startup_seconds = time.perf_counter() - _import_started
+
+
+def to_score_matrix(predictions):
+    """Normalises model output to an (n, len(classes)) array, or None on a shape mismatch."""
+    # 🔹 Handle multi-output models
+    if isinstance(predictions, list):
+        predictions = predictions[0]
+
+    predictions = np.array(predictions)
+    if predictions.size == 0 or predictions.shape[-1] != len(classes):
+        return None
+    return predictions.reshape(-1, len(classes))
+
+
+def prediction_result(scores):
+    return {
+        'predicted_class': classes[int(np.argmax(scores))],
+        'confidence_scores': scores.tolist()
+    }
+
+
+def classify_uploads(named_blobs):
+    """
+    Returns per-image results in upload order. Cached images are answered
+    directly; the rest are decoded in the decode pool into one float32 batch
+    and scored with a single forward pass.
+    """
+    with metrics.stage('cache'):
+        keys = [cache.key(data) for _, data in named_blobs]
+        cached = [cache.get(key) for key in keys]
+    pending = [i for i, hit in enumerate(cached) if hit is None]
+
+    with metrics.stage('decode'):
+        batch, errors = decode_batch([named_blobs[i][1] for i in pending], decode_pool)
+    valid = [j for j in range(len(pending)) if j not in errors]
+
+    scores = None
+    if valid:
+        inputs = batch if len(valid) == len(pending) else batch[valid]
+        with metrics.stage('model_wait'):
+            model = loader.get(MODEL_WAIT_SECONDS)
+        with metrics.stage('model'):
+            scores = to_score_matrix(model.predict_on_batch(inputs))
+        if scores is None:
+            raise ValueError('Prediction shape mismatch')
+
+    computed = {}
+    for row, j in enumerate(valid):
+        i = pending[j]
+        computed[i] = prediction_result(scores[row])
+        cache.put(keys[i], computed[i])
+    failed = {pending[j]: message for j, message in errors.items()}
+
+    results = []
+    for i, (filename, _) in enumerate(named_blobs):
+        if i in failed:
+            results.append({'filename': filename, 'error': failed[i]})
+        else:
+            results.append(dict(cached[i] or computed[i], filename=filename))
+    return results
+
+
+def not_ready_response(error):
+    response = jsonify({'error': str(error), 'status': loader.status()})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
 @app.route('/')
 def home():
-    return "Welcome to ECG Image Classification Backend! Use POST /predict with an ECG image file."
+    return ("Welcome to ECG Image Classification Backend! Use POST /predict with an ECG image file, "
+            "POST /predict/batch with several 'files', or POST /predict/archive with a ZIP/tar of images.")
 
 # 🔹 API endpoint for prediction
 @app.route('/predict', methods=['POST'])
@@ -39,46 +164,109 @@ def predict():
         return jsonify({'error': 'No selected file'}), 400
 
     try:
-        # 🔹 Save the uploaded file temporarily
-        os.makedirs("temp", exist_ok=True)
-        file_path = os.path.join("temp", file.filename)
-        file.save(file_path)
+        with metrics.stage('read_upload'):
+            data = file.read()
+        with metrics.stage('cache'):
+            cache_key = cache.key(data)
+            cached = cache.get(cache_key)
+        if cached is not None:
+            response = jsonify(cached)
+            response.headers['X-Prediction-Cache'] = 'hit'
+            return response
 
-        # 🔹 Load and preprocess the image
-        img = image.load_img(file_path, target_size=(224, 224))  # Adjust if model input differs
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array = img_array / 255.0  # same normalization as during training
+        # 🔹 Decode and preprocess the image straight from the upload (no temp file)
+        with metrics.stage('decode'):
+            img_array = decode_ecg_image(data)  # Adjust IMAGE_SIZE if model input differs
+            img_array = np.expand_dims(img_array, axis=0)
 
         # 🔹 Predict
-        predictions = model.predict(img_array)
-
-        # 🔹 Handle multi-output models
-        if isinstance(predictions, list):
-            predictions = predictions[0]
-
-        predictions = np.array(predictions)
+        with metrics.stage('model_wait'):
+            model = loader.get(MODEL_WAIT_SECONDS)
+        with metrics.stage('model'):
+            predictions = to_score_matrix(model.predict(img_array, verbose=0))
 
         # 🔹 Check prediction shape
-        if predictions.size == 0 or predictions.shape[-1] != len(classes):
-            os.remove(file_path)
+        if predictions is None:
             return jsonify({'error': 'Prediction shape mismatch'}), 500
 
-        predicted_class_index = int(np.argmax(predictions[0]))
-        predicted_class = classes[predicted_class_index]
+        # 🔹 Return JSON response
+        result = prediction_result(predictions[0])
+        cache.put(cache_key, result)
+        response = jsonify(result)
+        response.headers['X-Prediction-Cache'] = 'miss'
+        return response
 
-        # 🔹 Clean up temporary file
-        os.remove(file_path)
+    except ModelNotReady as e:
+        metrics.record_error(e)
+        return not_ready_response(e)
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 500
 
-        # 🔹 Return JSON response
-        return jsonify({
-            'predicted_class': predicted_class,
-            'confidence_scores': predictions[0].tolist()
-        })
+# 🔹 Multi-image endpoint: a whole 12-lead series in one request and one forward pass
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({'error': "No files uploaded (send them as 'files')"}), 400
+    if len(files) > MAX_BATCH_IMAGES:
+        return jsonify({'error': f'At most {MAX_BATCH_IMAGES} images per request'}), 413
 
+    try:
+        with metrics.stage('read_upload'):
+            named_blobs = [(f.filename, f.read()) for f in files]
+        results = classify_uploads(named_blobs)
+        return jsonify({'count': len(results), 'results': results})
+    except ModelNotReady as e:
+        metrics.record_error(e)
+        return not_ready_response(e)
     except Exception as e:
+        metrics.record_error(e)
         return jsonify({'error': str(e)}), 500
 
+
+# 🔹 Same as /predict/batch, but the images arrive in one ZIP or tar(.gz) archive
+@app.route('/predict/archive', methods=['POST'])
+def predict_archive():
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No archive uploaded'}), 400
+
+    archive = request.files['file']
+    try:
+        with metrics.stage('read_upload'):
+            named_blobs = read_archive_images(archive.read(), archive.filename)
+    except ValueError as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 400
+
+    if not named_blobs:
+        return jsonify({'error': 'Archive contains no images'}), 400
+    if len(named_blobs) > MAX_BATCH_IMAGES:
+        return jsonify({'error': f'At most {MAX_BATCH_IMAGES} images per request'}), 413
+
+    try:
+        results = classify_uploads(named_blobs)
+        return jsonify({'count': len(results), 'results': results})
+    except ModelNotReady as e:
+        metrics.record_error(e)
+        return not_ready_response(e)
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/health')
+def health():
+    status = dict(loader.status(), app_import_seconds=round(startup_seconds, 4))
+    return jsonify(status), (200 if status['ready'] else 503)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/metrics/cache')
+def cache_metrics():
+    return jsonify(cache.stats())
+
 # 🔹 Run the Flask app (Render-ready)
 if __name__ == '__main__':
     # Use Render's PORT environment variable, fallback to 10000
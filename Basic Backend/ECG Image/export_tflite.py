@@ -0,0 +1,129 @@
+"""
+Exports ecg_image.h5 to TFLite for the lightweight serving backend
+(MODEL_BACKEND=tflite in app.py), then reports how closely the export
+matches the Keras model on a folder of ECG images.
+
+    python export_tflite.py --images ECG_DATA/test                    # float32
+    python export_tflite.py --images ECG_DATA/test --quantize float16
+    python export_tflite.py --images ECG_DATA/test --quantize int8 --calibration ECG_DATA/train
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Basic Backend/ holds the helpers shared by the services (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from shared.model_loader import TFLiteModel
+from preprocessing import IMAGE_EXTENSIONS, IMAGE_SIZE, decode_ecg_image
+
+# --- Data ---
+
+def load_images(folder, limit=None):
+    """Decodes every image under `folder` (recursively) exactly as the app does."""
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(folder)
+        for name in names if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    batch = np.empty((len(paths),) + IMAGE_SIZE + (3,), dtype=np.float32)
+    for i, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            decode_ecg_image(f.read(), out=batch[i])
+    return paths, batch
+
+# --- Export ---
+
+def convert(keras_model, quantize, calibration=None):
+    """Converts a Keras model to a TFLite flatbuffer, optionally quantized."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        # Full-integer kernels; inputs and outputs stay float32 so decoding is unchanged
+        def representative_dataset():
+            for image in calibration:
+                yield [image[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+# --- Parity report ---
+
+def predict_all(predict_fn, images, batch_size=16):
+    return np.concatenate([
+        np.asarray(predict_fn(images[i:i + batch_size])).reshape(-1, 4)
+        for i in range(0, len(images), batch_size)
+    ])
+
+
+def single_sample_latency_ms(predict_fn, image, repeats=50):
+    """Median latency of one (1, 224, 224, 3) forward pass after a few warm-up calls."""
+    x = image[np.newaxis]
+    for _ in range(5):
+        predict_fn(x)
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict_fn(x)
+        timings.append(time.perf_counter() - started)
+    return 1000.0 * float(np.median(timings))
+
+
+def parity_report(keras_model, lite_model, images):
+    keras_scores = predict_all(keras_model.predict_on_batch, images)
+    lite_scores = predict_all(lite_model.predict_on_batch, images)
+    diff = np.abs(keras_scores - lite_scores)
+
+    print(f"\n📊 Parity on {len(images)} images")
+    print(f"Predicted class agreement: {np.mean(keras_scores.argmax(1) == lite_scores.argmax(1)):.4%}")
+    print(f"Confidence |diff|: max {diff.max():.5f}, mean {diff.mean():.5f}")
+    print(f"Single-image latency: Keras {single_sample_latency_ms(keras_model.predict_on_batch, images[0]):.2f} ms, "
+          f"TFLite {single_sample_latency_ms(lite_model.predict_on_batch, images[0]):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export ecg_image.h5 to TFLite and check parity")
+    parser.add_argument('--model', default='ecg_image.h5')
+    parser.add_argument('--output', default='ecg_image.tflite')
+    parser.add_argument('--quantize', choices=['none', 'float16', 'int8'], default='none')
+    parser.add_argument('--images', required=True, help="folder of ECG images for the parity report")
+    parser.add_argument('--calibration', help="folder of training images for int8 calibration")
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--report-only', action='store_true', help="skip the export, only compare")
+    args = parser.parse_args()
+
+    if args.quantize == 'int8' and not args.report_only and not args.calibration:
+        parser.error("--quantize int8 needs --calibration images")
+
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(args.model)
+
+    if not args.report_only:
+        calibration = None
+        if args.quantize == 'int8':
+            _, calibration = load_images(args.calibration, args.calibration_samples)
+        with open(args.output, 'wb') as f:
+            f.write(convert(keras_model, args.quantize, calibration))
+        print(f"✅ Wrote {args.output} ({args.quantize}): {os.path.getsize(args.output) / 2**20:.1f} MB "
+              f"vs {os.path.getsize(args.model) / 2**20:.1f} MB for {args.model}")
+
+    _, images = load_images(args.images)
+    if len(images) == 0:
+        parser.error(f"No images found under {args.images}")
+    parity_report(keras_model, TFLiteModel(args.output), images)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import io
+import os
+import tarfile
+import zipfile
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)  # (height, width) the model was trained on
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+MAX_ARCHIVE_MEMBERS = 256               # images taken from one ZIP/tar upload
+MAX_ARCHIVE_BYTES = 256 * 1024 * 1024   # total uncompressed image bytes per archive
+
+
+def decode_ecg_image(data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Decodes an uploaded image from memory into a (224, 224, 3) float32 array in [0, 1].
+
+    Mirrors `image.load_img(path, target_size=(224, 224))` + `img_to_array` + `/ 255.0`
+    (RGB conversion, nearest-neighbour resize), without writing the upload to disk.
+    If `out` is given the result is written into it, e.g. one row of a batch tensor.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        width_height = (IMAGE_SIZE[1], IMAGE_SIZE[0])
+        if img.size != width_height:
+            img = img.resize(width_height, Image.NEAREST)
+        pixels = np.asarray(img, dtype=np.float32)
+
+    if out is None:
+        return pixels / 255.0
+    np.divide(pixels, 255.0, out=out)
+    return out
+
+
+def decode_batch(blobs: List[bytes], pool: Executor) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Decodes every upload in parallel into one preallocated (n, 224, 224, 3)
+    float32 tensor. Returns (batch, errors) where errors maps the index of each
+    image that failed to decode to its message; those rows are left unset.
+    """
+    batch = np.empty((len(blobs),) + IMAGE_SIZE + (3,), dtype=np.float32)
+
+    def decode_into(i: int) -> Optional[str]:
+        try:
+            decode_ecg_image(blobs[i], out=batch[i])
+        except Exception as e:
+            return f"Could not decode image: {e}"
+        return None
+
+    errors = {i: msg for i, msg in enumerate(pool.map(decode_into, range(len(blobs)))) if msg is not None}
+    return batch, errors
+
+
+def _is_image_member(name: str) -> bool:
+    base = os.path.basename(name)
+    return (not base.startswith('.') and '__MACOSX' not in name
+            and base.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_archive_images(data: bytes, filename: str = '') -> List[Tuple[str, bytes]]:
+    """
+    Extracts the images from an uploaded ZIP or tar (optionally compressed)
+    archive in memory, in archive order. Raises ValueError for anything that is
+    not a readable archive or exceeds the member/size limits.
+    """
+    images: List[Tuple[str, bytes]] = []
+    total = 0
+
+    def take(name: str, size: int) -> bool:
+        nonlocal total
+        if not _is_image_member(name):
+            return False
+        if len(images) >= MAX_ARCHIVE_MEMBERS:
+            raise ValueError(f"Archive has more than {MAX_ARCHIVE_MEMBERS} images")
+        total += size
+        if total > MAX_ARCHIVE_BYTES:
+            raise ValueError(f"Archive images exceed {MAX_ARCHIVE_BYTES // (1024 * 1024)} MB uncompressed")
+        return True
+
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and take(info.filename, info.file_size):
+                    images.append((info.filename, zf.read(info)))
+        return images
+
+    try:
+        tf = tarfile.open(fileobj=io.BytesIO(data), mode='r:*')
+    except tarfile.TarError:
+        raise ValueError(f"{filename or 'Upload'} is not a ZIP or tar archive")
+    with tf:
+        for member in tf:
+            if member.isfile() and take(member.name, member.size):
+                images.append((member.name, tf.extractfile(member).read()))
+    return images
@@ -0,0 +1,117 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import preprocessing
+from preprocessing import IMAGE_SIZE, decode_ecg_image, read_archive_images
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def encoded(mode, size, fmt):
+    rng = np.random.default_rng(len(mode) + size[0])
+    pixels = rng.integers(0, 256, size=(size[1], size[0], 4), dtype=np.uint8)
+    img = Image.fromarray(pixels, 'RGBA').convert(mode)
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('mode, size, fmt', [
+    ('RGB', (640, 480), 'JPEG'),
+    ('RGB', IMAGE_SIZE[::-1], 'PNG'),   # already the model size, no resize
+    ('RGBA', (300, 500), 'PNG'),
+    ('L', (1000, 200), 'PNG'),
+    ('P', (123, 77), 'GIF'),
+])
+def test_decode_matches_keras_load_img(tmp_path, mode, size, fmt):
+    from tensorflow import keras
+
+    data = encoded(mode, size, fmt)
+    path = tmp_path / f'upload.{fmt.lower()}'
+    path.write_bytes(data)
+    expected = keras.utils.img_to_array(keras.utils.load_img(str(path), target_size=IMAGE_SIZE)) / 255.0
+
+    actual = decode_ecg_image(data)
+    assert actual.dtype == np.float32 and actual.shape == IMAGE_SIZE + (3,)
+    np.testing.assert_array_equal(actual, expected)
+
+    row = np.empty(IMAGE_SIZE + (3,), dtype=np.float32)
+    decode_ecg_image(data, out=row)
+    np.testing.assert_array_equal(row, expected)
+
+
+def test_decode_matches_keras_on_the_bundled_sample():
+    from tensorflow import keras
+
+    path = os.path.join(HERE, 'MI(1).jpg')
+    with open(path, 'rb') as f:
+        actual = decode_ecg_image(f.read())
+    expected = keras.utils.img_to_array(keras.utils.load_img(path, target_size=IMAGE_SIZE)) / 255.0
+    np.testing.assert_array_equal(actual, expected)
+
+
+def zip_archive(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def tar_archive(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('archive', [zip_archive, tar_archive])
+def test_archive_keeps_images_in_order_and_skips_the_rest(archive):
+    png = encoded('RGB', (32, 32), 'PNG')
+    members = [('b.png', png), ('notes.txt', b'x'), ('__MACOSX/._b.png', b'x'), ('dir/a.PNG', png)]
+    assert [name for name, _ in read_archive_images(archive(members))] == ['b.png', 'dir/a.PNG']
+
+
+@pytest.mark.parametrize('archive', [zip_archive, tar_archive])
+def test_archive_member_limit(archive, monkeypatch):
+    monkeypatch.setattr(preprocessing, 'MAX_ARCHIVE_MEMBERS', 3)
+    png = encoded('RGB', (8, 8), 'PNG')
+    assert len(read_archive_images(archive([(f'{i}.png', png) for i in range(3)]))) == 3
+    with pytest.raises(ValueError, match="more than 3 images"):
+        read_archive_images(archive([(f'{i}.png', png) for i in range(4)]))
+
+
+@pytest.mark.parametrize('archive', [zip_archive, tar_archive])
+def test_archive_uncompressed_size_limit(archive, monkeypatch):
+    monkeypatch.setattr(preprocessing, 'MAX_ARCHIVE_BYTES', 2 * 1024 * 1024)
+    # Compresses to a few KB, so only the uncompressed size can catch it
+    blob = b'\0' * (1024 * 1024 + 1)
+    assert len(archive([('a.png', blob)])) < 64 * 1024
+    with pytest.raises(ValueError, match="exceed 2 MB uncompressed"):
+        read_archive_images(archive([('a.png', blob), ('b.png', blob)]))
+
+
+def test_archive_endpoint_rejects_oversized_uploads(monkeypatch):
+    import app as service
+
+    monkeypatch.setattr(preprocessing, 'MAX_ARCHIVE_MEMBERS', 2)
+    png = encoded('RGB', (8, 8), 'PNG')
+    client = service.app.test_client()
+
+    response = client.post('/predict/archive', data={
+        'file': (io.BytesIO(zip_archive([(f'{i}.png', png) for i in range(3)])), 'ecgs.zip')})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Archive has more than 2 images"
+
+    response = client.post('/predict/archive', data={'file': (io.BytesIO(b'not an archive'), 'ecgs.bin')})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "ecgs.bin is not a ZIP or tar archive"
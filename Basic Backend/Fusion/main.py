@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.parse
+import httpx
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Basic Backend/ holds the helpers shared by the services (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from shared.metrics import CONTENT_TYPE, ASGIMetricsMiddleware, MetricsRegistry
+
+# --- Configuration ---
+# One request in, three model calls out: the vitals go to Multi_parameter, the
+# WFDB record to Arrythmia and the ECG image to ECG Image, all at once over
+# pooled keep-alive connections. Start the three services, then:
+#     uvicorn main:app --host 0.0.0.0 --port 8002
+MULTI_PARAMETER_URL = os.environ.get('MULTI_PARAMETER_URL', 'http://127.0.0.1:8001')
+ARRHYTHMIA_URL = os.environ.get('ARRHYTHMIA_URL', 'http://127.0.0.1:5000')
+ECG_IMAGE_URL = os.environ.get('ECG_IMAGE_URL', 'http://127.0.0.1:10000')
+UPSTREAM_TIMEOUT_SECONDS = float(os.environ.get('UPSTREAM_TIMEOUT_SECONDS', 30))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', 64)) # Keep-alive pool size per service
+
+UPSTREAMS = {
+    'multi_parameter': MULTI_PARAMETER_URL,
+    'arrhythmia': ARRHYTHMIA_URL,
+    'ecg_image': ECG_IMAGE_URL,
+}
+HEALTH_PATHS = {'multi_parameter': '/', 'arrhythmia': '/health', 'ecg_image': '/health'}
+
+# --- Pydantic Models (API Data Contracts) ---
+
+# What one model service answered
+class ModelResult(BaseModel):
+    status: str                        # "ok", "error", or "skipped" when its input was not sent
+    status_code: Optional[int] = None  # the service's HTTP status
+    latency_ms: float = 0.0
+    alert: bool = False                # the service flagged high risk
+    result: Optional[Any] = None       # the service's JSON response, unchanged
+    error: Optional[str] = None
+
+# The combined response
+class FusionResponse(BaseModel):
+    patient_id: str
+    alert: bool          # any model flagged high risk
+    alerts: List[str]    # which ones
+    multi_parameter: ModelResult
+    arrhythmia: ModelResult
+    ecg_image: ModelResult
+    latency_ms: float    # the slowest model plus fan-out overhead, not the sum
+
+# --- App Setup ---
+app = FastAPI(
+    title="Cardiac Risk Fusion API",
+    description="Scores a patient's vitals, ECG record and ECG image with all three models concurrently."
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:8080", "http://127.0.0.1:8080"],  # Frontend URLs
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
+)
+
+# --- Metrics ---
+# Each model call is a stage, so Server-Timing ("X-Trace: 1") shows all three
+# next to the total.
+metrics = MetricsRegistry('fusion')
+app.add_middleware(ASGIMetricsMiddleware, registry=metrics)
+upstream_requests = metrics.counter('upstream_requests_total', 'Calls to the model services, by outcome.',
+                                    ('model', 'status'))
+
+# --- Startup / Shutdown: Connection Pools ---
+@app.on_event("startup")
+async def open_clients():
+    """One keep-alive connection pool per model service, shared by every request."""
+    limits = httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS,
+                          max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS)
+    app.state.clients = {name: httpx.AsyncClient(base_url=url, limits=limits, timeout=UPSTREAM_TIMEOUT_SECONDS)
+                         for name, url in UPSTREAMS.items()}
+    for name, url in UPSTREAMS.items():
+        print(f"--- {name}: {url} ---")
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    await asyncio.gather(*(client.aclose() for client in app.state.clients.values()))
+
+# --- Model Calls ---
+def vitals_alert(body) -> bool:
+    # A list of readings is answered by /predict/batch; the newest reading decides
+    prediction = body['predictions'][-1] if 'predictions' in body else body
+    return prediction.get('predicted_class') == 1
+
+
+def arrhythmia_alert(body) -> bool:
+    return str(body.get('prediction', '')).startswith('High risk')
+
+
+def ecg_image_alert(body) -> bool:
+    return not str(body.get('predicted_class', 'Normal')).startswith('Normal')
+
+
+async def call_model(name: str, path: str, alert: Callable[[Any], bool], headers: Dict[str, str],
+                     **request) -> ModelResult:
+    """POSTs to one model service; failures become an "error" result instead of failing the request."""
+    started = time.perf_counter()
+    try:
+        with metrics.stage(name):
+            response = await app.state.clients[name].post(path, headers=headers, **request)
+    except httpx.HTTPError as e:
+        metrics.record_error(e)
+        upstream_requests.inc(1, name, 'unreachable')
+        return ModelResult(status="error", latency_ms=(time.perf_counter() - started) * 1000.0,
+                           error=f"{name} unreachable: {type(e).__name__}: {e}")
+    latency_ms = (time.perf_counter() - started) * 1000.0
+    upstream_requests.inc(1, name, str(response.status_code))
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if response.status_code != 200 or not isinstance(body, dict):
+        detail = (body.get('error') or body.get('detail')) if isinstance(body, dict) else response.text[:200]
+        return ModelResult(status="error", status_code=response.status_code, latency_ms=latency_ms,
+                           result=body, error=str(detail))
+    return ModelResult(status="ok", status_code=200, latency_ms=latency_ms, alert=alert(body), result=body)
+
+
+def skipped() -> Awaitable[ModelResult]:
+    async def result():
+        return ModelResult(status="skipped")
+    return result()
+
+# --- API Endpoint: /predict/{patient_id} ---
+@app.post("/predict/{patient_id}", response_model=FusionResponse)
+async def predict_fused(
+    patient_id: str,
+    vitals: str = Form(..., description="One reading as JSON (same fields as Multi_parameter's /predict) or a list of them"),
+    dat: Optional[UploadFile] = File(None, description="WFDB .dat file (optional, needs hea)"),
+    hea: Optional[UploadFile] = File(None, description="WFDB .hea file (optional, needs dat)"),
+    image: Optional[UploadFile] = File(None, description="ECG image (optional)"),
+    whole_record: bool = Form(False, description="Scan the whole WFDB record instead of its first second"),
+):
+    """
+    Scores one patient with every model it has input for, concurrently:
+    vitals with the time-series model, the WFDB record with the arrhythmia CNN
+    and the image with the ECG image classifier. Each model's answer is
+    returned unchanged under its own key. A model that fails is reported as
+    an "error" without failing the others.
+    """
+    started = time.perf_counter()
+
+    # 1. Validate the inputs
+    try:
+        readings = json.loads(vitals)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"'vitals' is not valid JSON: {str(e)}")
+    if not readings or not isinstance(readings, (dict, list)):
+        raise HTTPException(status_code=422, detail="'vitals' must be a reading object or a non-empty list of them")
+    if (dat is None) != (hea is None):
+        raise HTTPException(status_code=400, detail="Please upload both .dat and .hea files (or neither)")
+
+    # Same request ID on every upstream call, so their logs and traces line up
+    trace = metrics.current_trace()
+    headers = {'X-Request-ID': trace.request_id} if trace is not None and trace.request_id else {}
+
+    record = {'dat': (dat.filename, await dat.read()), 'hea': (hea.filename, await hea.read())} if dat is not None else None
+    image_file = (image.filename, await image.read(), image.content_type or 'application/octet-stream') if image is not None else None
+
+    # 2. Start every model call, then wait for the slowest
+    if isinstance(readings, list):
+        vitals_call = call_model('multi_parameter', '/predict/batch', vitals_alert, headers,
+                                 json={"patients": [{"patient_id": patient_id, "readings": readings}]})
+    else:
+        # Escaped, so an ID containing '/', '?' or '#' cannot reach another upstream route
+        vitals_call = call_model('multi_parameter', f'/predict/{urllib.parse.quote(patient_id, safe="")}',
+                                 vitals_alert, headers, json=readings)
+
+    if record is not None:
+        path = '/predict/arrythmia/record' if whole_record else '/predict/arrythmia'
+        arrhythmia_call = call_model('arrhythmia', path, arrhythmia_alert, headers, files=record)
+    else:
+        arrhythmia_call = skipped()
+
+    if image_file is not None:
+        image_call = call_model('ecg_image', '/predict', ecg_image_alert, headers, files={'file': image_file})
+    else:
+        image_call = skipped()
+
+    vitals_result, arrhythmia_result, image_result = await asyncio.gather(vitals_call, arrhythmia_call, image_call)
+    results = {'multi_parameter': vitals_result, 'arrhythmia': arrhythmia_result, 'ecg_image': image_result}
+
+    # 3. If nothing succeeded there is nothing to fuse
+    requested = [result for result in results.values() if result.status != "skipped"]
+    if all(result.status == "error" for result in requested):
+        errors = {name: result.error for name, result in results.items() if result.status == "error"}
+        codes = {result.status_code for result in requested}
+        if codes <= {429, 503}:
+            raise HTTPException(status_code=503, detail="Model services are overloaded; retry shortly.",
+                                headers={"Retry-After": "1"})
+        if all(code is not None and 400 <= code < 500 for code in codes):
+            raise HTTPException(status_code=422, detail=errors)  # every service rejected its input
+        raise HTTPException(status_code=502, detail=errors)
+
+    alerts = [name for name, result in results.items() if result.alert]
+    return FusionResponse(
+        patient_id=patient_id,
+        alert=bool(alerts),
+        alerts=alerts,
+        latency_ms=(time.perf_counter() - started) * 1000.0,
+        **results,
+    )
+
+# --- Health Check: are the model services up? ---
+@app.get("/health")
+async def health():
+    async def probe(name: str) -> Dict[str, Any]:
+        try:
+            response = await app.state.clients[name].get(HEALTH_PATHS[name], timeout=5.0)
+            return {"ready": response.status_code == 200, "status_code": response.status_code}
+        except httpx.HTTPError as e:
+            return {"ready": False, "error": f"{type(e).__name__}: {e}"}
+
+    services = dict(zip(HEALTH_PATHS, await asyncio.gather(*(probe(name) for name in HEALTH_PATHS))))
+    # Vitals are required on every request; the other two are optional inputs
+    ready = services['multi_parameter']['ready']
+    return JSONResponse({"ready": ready, "services": services}, status_code=200 if ready else 503)
+
+# --- Root Endpoint ---
+@app.get("/")
+def read_root():
+    return {"status": "Cardiac Risk Fusion API is running"}
+
+# --- Prometheus Metrics Endpoint ---
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
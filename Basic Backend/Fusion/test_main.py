@@ -0,0 +1,117 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+READING = {"Heart Rate": 80, "BP_Systolic": 120, "BP_Diastolic": 80, "SpO2": 98, "Respiratory_Rate": 16,
+           "Temperature": 37.0}
+
+
+class Upstreams:
+    """Stands in for the three model services; `handlers[name]` answers that service's requests."""
+
+    def __init__(self):
+        self.requests = {name: [] for name in main.UPSTREAMS}
+        self.handlers = {
+            'multi_parameter': lambda request: httpx.Response(200, json={"predicted_class": 0}),
+            'arrhythmia': lambda request: httpx.Response(200, json={"prediction": "High risk of arrhythmia"}),
+            'ecg_image': lambda request: httpx.Response(200, json={"predicted_class": "Normal"}),
+        }
+
+    def client(self, name):
+        def handle(request):
+            self.requests[name].append(request)
+            return self.handlers[name](request)
+        return httpx.AsyncClient(base_url=main.UPSTREAMS[name], transport=httpx.MockTransport(handle))
+
+
+@pytest.fixture
+def client():
+    upstreams = Upstreams()
+    with TestClient(main.app) as client:
+        real = main.app.state.clients
+        main.app.state.clients = {name: upstreams.client(name) for name in main.UPSTREAMS}
+        client.upstreams = upstreams
+        yield client
+        main.app.state.clients = real
+
+
+def fused(client, patient_id='p1', vitals=READING, record=True, image=True):
+    files = {}
+    if record:
+        files.update(dat=('r.dat', b'dat'), hea=('r.hea', b'hea'))
+    if image:
+        files['image'] = ('ecg.png', b'png', 'image/png')
+    return client.post(f'/predict/{patient_id}', data={'vitals': json.dumps(vitals)}, files=files or None)
+
+
+def test_fans_out_to_every_model(client):
+    response = fused(client)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [body[name]['status'] for name in main.UPSTREAMS] == ['ok', 'ok', 'ok']
+    assert body['alerts'] == ['arrhythmia'] and body['alert']
+    requests = client.upstreams.requests
+    assert requests['multi_parameter'][0].url.path == '/predict/p1'
+    assert json.loads(requests['multi_parameter'][0].content) == READING
+    assert requests['arrhythmia'][0].url.path == '/predict/arrythmia'
+    assert requests['ecg_image'][0].url.path == '/predict'
+
+
+def test_only_requested_models_are_called(client):
+    body = fused(client, vitals=[READING, READING], record=False, image=False).json()
+
+    assert body['arrhythmia']['status'] == body['ecg_image']['status'] == 'skipped'
+    requests = client.upstreams.requests
+    assert [len(requests[name]) for name in main.UPSTREAMS] == [1, 0, 0]
+    assert requests['multi_parameter'][0].url.path == '/predict/batch'
+
+
+def test_patient_id_is_escaped_in_the_upstream_path(client):
+    # The ID arrives percent-encoded as "batch?x#y"; unescaped it would hit /predict/batch
+    assert fused(client, patient_id='batch%3Fx%23y', record=False, image=False).status_code == 200
+    request = client.upstreams.requests['multi_parameter'][0]
+    assert request.url.raw_path == b'/predict/batch%3Fx%23y'
+    assert request.url.query == b''
+
+
+def test_partial_upstream_failure_keeps_the_other_results(client):
+    client.upstreams.handlers['ecg_image'] = lambda request: httpx.Response(500, json={"error": "boom"})
+    body = fused(client).json()
+
+    assert body['multi_parameter']['status'] == body['arrhythmia']['status'] == 'ok'
+    assert body['ecg_image'] == dict(body['ecg_image'], status='error', status_code=500, error='boom')
+    assert body['alerts'] == ['arrhythmia']
+
+
+def test_upstream_timeout_is_reported_as_an_error(client):
+    def timeout(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client.upstreams.handlers['arrhythmia'] = timeout
+    body = fused(client).json()
+
+    assert body['arrhythmia']['status'] == 'error'
+    assert body['arrhythmia']['error'].startswith('arrhythmia unreachable: ReadTimeout')
+    assert body['multi_parameter']['status'] == body['ecg_image']['status'] == 'ok'
+    assert not body['alert']
+
+
+def test_every_upstream_failing_fails_the_request(client):
+    def timeout(request):
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    for name in main.UPSTREAMS:
+        client.upstreams.handlers[name] = timeout
+    response = fused(client)
+    assert response.status_code == 502
+    assert set(response.json()['detail']) == set(main.UPSTREAMS)
+
+    for name in main.UPSTREAMS:
+        client.upstreams.handlers[name] = lambda request: httpx.Response(503, json={"detail": "busy"})
+    response = fused(client)
+    assert response.status_code == 503 and response.headers['Retry-After'] == '1'
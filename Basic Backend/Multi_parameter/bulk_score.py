@@ -0,0 +1,189 @@
+"""
+Offline bulk scoring for recorded cohorts.
+
+Reads a CSV shaped like patient_timeseries_dataset.csv in chunks, computes the
+time-series features for all patients at once (groupby-vectorized), scores
+every row with the compiled inference path and writes per-row risk to CSV or
+Parquet. Chunks are scored in a process pool, so multi-GB files use every core
+while memory stays bounded by the chunk size.
+
+Each patient's rows must be in chronological order across the file (as they
+are in the bundled dataset); rows may be interleaved between patients.
+
+Usage:
+    python bulk_score.py patient_timeseries_dataset.csv -o risk_scores.csv
+    python bulk_score.py big_cohort.csv -o risk_scores.parquet --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, ROLLING_WINDOW, create_grouped_timeseries_features
+from inference import CompiledPredictor
+
+# --- Configuration ---
+MODEL_FILE = 'ts_prediction_model.joblib'
+SCALER_FILE = 'ts_prediction_scaler.joblib'
+FEATURE_COLS_FILE = 'ts_feature_columns.joblib'
+MIN_HISTORY_SIZE = 5          # Same warm-up as main.py: rows before this get risk 0
+DEFAULT_CHUNKSIZE = 250_000   # CSV rows per chunk (one pool task)
+PREDICT_BATCH_SIZE = 65_536   # Rows per model call inside a chunk
+
+OUTPUT_KEEP_COLUMNS = ['Patient_ID', 'time', 'Target']
+
+# Set once per worker process by _init_worker.
+_predictor: Optional[CompiledPredictor] = None
+
+
+def load_predictor() -> CompiledPredictor:
+    """Loads the model assets and checks the compiled path against sklearn, as main.py does at startup."""
+    model = joblib.load(MODEL_FILE)
+    scaler = joblib.load(SCALER_FILE)
+    feature_cols = joblib.load(FEATURE_COLS_FILE)
+    predictor = CompiledPredictor(model, scaler, feature_cols)
+    if not predictor.check_parity(scaler):
+        raise RuntimeError(f"Compiled inference path does not match sklearn for {MODEL_FILE}; refusing to score.")
+    return predictor
+
+
+def _init_worker() -> None:
+    global _predictor
+    _predictor = load_predictor()
+
+
+def score_chunk(chunk: pd.DataFrame, carry: pd.DataFrame, prior_counts: Dict[str, int],
+                min_history: int = MIN_HISTORY_SIZE) -> pd.DataFrame:
+    """
+    Scores one chunk. `carry` holds each patient's last ROLLING_WINDOW - 1 rows
+    from earlier chunks so lag/rolling features continue across chunk borders;
+    `prior_counts` is how many rows each patient had before this chunk.
+    """
+    df = pd.concat([carry.assign(_carry=True), chunk.assign(_carry=False)], ignore_index=True)
+    df = create_grouped_timeseries_features(df)
+    df = df[~df['_carry'].astype(bool)].drop(columns='_carry').reset_index(drop=True)
+
+    # Position of each row in the patient's full history, as the API would count it
+    history_len = (
+        df.groupby('Patient_ID', sort=False).cumcount().to_numpy()
+        + df['Patient_ID'].map(prior_counts).fillna(0).to_numpy(dtype=np.int64)
+        + 1
+    )
+    scored = history_len >= min_history
+
+    features = df[FEATURE_COLUMNS].fillna(0).to_numpy(dtype=np.float64)
+    risk = np.zeros(len(df))
+    predicted = np.zeros(len(df), dtype=np.int64)
+    rows = np.flatnonzero(scored)
+    for start in range(0, len(rows), PREDICT_BATCH_SIZE):
+        batch = rows[start:start + PREDICT_BATCH_SIZE]
+        batch_class, batch_risk = _predictor.predict(features[batch])
+        predicted[batch] = batch_class
+        risk[batch] = batch_risk
+
+    out = df[[col for col in OUTPUT_KEEP_COLUMNS if col in df.columns]].copy()
+    out['history_rows'] = history_len
+    out['scored'] = scored
+    out['risk_probability'] = risk
+    out['predicted_class'] = predicted
+    return out
+
+
+def iter_chunks(csv_path: str, chunksize: int) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, Dict[str, int]]]:
+    """Yields (chunk, carry, prior_counts) with the cross-chunk state each chunk needs."""
+    carry: Optional[pd.DataFrame] = None
+    counts: Dict[str, int] = {}
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, parse_dates=['time']):
+        if carry is None:
+            carry = chunk.iloc[:0]
+        patients = chunk['Patient_ID'].unique()
+        prior_counts = {p: counts.get(p, 0) for p in patients}
+        yield chunk, carry[carry['Patient_ID'].isin(patients)], prior_counts
+
+        for patient, n in chunk['Patient_ID'].value_counts().items():
+            counts[patient] = counts.get(patient, 0) + int(n)
+        carry = (
+            pd.concat([carry, chunk], ignore_index=True)
+            .sort_values(by=['Patient_ID', 'time'], kind='stable')
+            .groupby('Patient_ID', sort=False)
+            .tail(ROLLING_WINDOW - 1)
+        )
+
+
+class ResultWriter:
+    """Appends scored chunks to a CSV or Parquet file (chosen by extension)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self._first = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def bulk_score(csv_path: str, output_path: str, chunksize: int = DEFAULT_CHUNKSIZE,
+               workers: int = 1, min_history: int = MIN_HISTORY_SIZE) -> int:
+    """Scores every row of `csv_path` into `output_path`. Returns the number of rows written."""
+    writer = ResultWriter(output_path)
+    total = 0
+    try:
+        if workers <= 1:
+            _init_worker()
+            for chunk, carry, prior_counts in iter_chunks(csv_path, chunksize):
+                result = score_chunk(chunk, carry, prior_counts, min_history)
+                writer.write(result)
+                total += len(result)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                # Keep at most 2 chunks per worker in flight so memory stays bounded,
+                # and write results back in file order.
+                in_flight = []
+                for chunk, carry, prior_counts in iter_chunks(csv_path, chunksize):
+                    in_flight.append(pool.submit(score_chunk, chunk, carry, prior_counts, min_history))
+                    if len(in_flight) >= 2 * workers:
+                        result = in_flight.pop(0).result()
+                        writer.write(result)
+                        total += len(result)
+                for future in in_flight:
+                    result = future.result()
+                    writer.write(result)
+                    total += len(result)
+    finally:
+        writer.close()
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score a recorded cohort CSV with the time-series model.")
+    parser.add_argument('csv', nargs='?', default='patient_timeseries_dataset.csv', help="Input CSV (patient_timeseries_dataset.csv layout)")
+    parser.add_argument('-o', '--output', default='risk_scores.csv', help="Output file (.csv or .parquet)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="CSV rows per chunk")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (1 = score in-process)")
+    parser.add_argument('--min-history', type=int, default=MIN_HISTORY_SIZE, help="Rows a patient needs before being scored")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = bulk_score(args.csv, args.output, args.chunksize, args.workers, args.min_history)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec) -> {args.output}")
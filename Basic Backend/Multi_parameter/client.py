@@ -1,93 +1,406 @@
-import requests
-import pandas as pd
-import time
+import argparse
+import asyncio
+import heapq
 import json
+import random
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
 
 # --- Configuration ---
-API_URL = "http://127.0.0.1:8001/predict"
-PATIENT_ID = "Patient_001"
+BASE_URL = "http://127.0.0.1:8001"
 CSV_FILE = "patient_timeseries_dataset.csv"
-SEND_INTERVAL_SECONDS = 1 # How long to wait between sending each row
+SPEED = 60.0 # Replay acceleration: 60 sends one minute of monitor data per second
+START_JITTER_SECONDS = 5.0 # Patients start at random offsets within this window
+MAX_CONNECTIONS = 100 # Keep-alive HTTP connections shared by every virtual patient
+BATCH_MAX_ROWS = 1000 # Readings per /predict/batch request
+BATCH_INTERVAL_SECONDS = 0.25 # How often the batch transport flushes due readings
 
-# --- Main Function ---
-def simulate_patient_monitor(patient_id, data_df):
+# --- Helpers ---
+def print_response(response_data):
+    """Pretty-prints one PredictionResponse from the server."""
+    risk = response_data['risk_probability'] * 100
+    status = response_data['status_message']
+
+    print(f"✅ Server Response: {status}")
+
+    if "Prediction" in status:
+        print(f"   📈 CURRENT RISK: {risk:.2f}%")
+        if response_data['predicted_class'] == 1:
+            print("   🚨 ALERT! HIGH RISK PREDICTED! 🚨")
+
+
+class VirtualPatient:
+    """One replayed bed: a dataset patient (or a clone of one) and what the server told us."""
+
+    def __init__(self, patient_id: str, source_id: str, rows: pd.DataFrame, vitals_columns: List[str],
+                 start_offset: float):
+        self.patient_id = patient_id
+        self.source_id = source_id
+        self.payloads = [dict(zip(vitals_columns, map(float, values)), time=t) for values, t in
+                         zip(rows[vitals_columns].itertuples(index=False, name=None), rows['time'])]
+        times = pd.to_datetime(rows['time'])
+        self.minutes = ((times - times.iloc[0]).dt.total_seconds() / 60.0).to_numpy()
+        self.targets = rows['Target'].to_numpy() if 'Target' in rows else np.zeros(len(rows), dtype=int)
+        self.start_offset = start_offset
+        self.predicted = np.full(len(rows), -1)  # -1 = no answer (error or rejected)
+
+    def due(self, start: float, i: int, speed: float) -> float:
+        """Wall-clock (loop time) at which reading `i` should be sent."""
+        return start + self.start_offset + (self.minutes[i] * 60.0 / speed if speed > 0 else 0.0)
+
+
+class ReplayStats:
+    """Per-reading outcomes of one replay run."""
+
+    def __init__(self):
+        self.status: Counter = Counter()
+        self.latencies: List[float] = []  # seconds, successful readings only
+        self.lags: List[float] = []       # how late each reading was sent vs its schedule
+        self.requests = 0
+
+    def record(self, status, latency: float, lag: float) -> None:
+        self.status[str(status)] += 1
+        self.lags.append(max(0.0, lag))
+        if status == 200:
+            self.latencies.append(latency)
+
+
+def percentiles_ms(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000.0
+    return {"p50": float(np.percentile(ms, 50)), "p95": float(np.percentile(ms, 95)),
+            "p99": float(np.percentile(ms, 99)), "max": float(ms.max())}
+
+
+def load_patients(data_df: pd.DataFrame, clones: int, run_tag: str, jitter: float, only: Optional[str],
+                  max_rows: Optional[int], seed: int) -> List[VirtualPatient]:
+    """Builds the virtual beds: every dataset patient (or just `only`), `clones` times each."""
+    if only:
+        data_df = data_df[data_df['Patient_ID'] == only]
+    vitals_columns = [col for col in data_df.columns if col not in ['Patient_ID', 'time', 'Target']]
+    rng = random.Random(seed)
+
+    patients = []
+    for source_id, rows in data_df.groupby('Patient_ID', sort=False):
+        rows = rows.sort_values('time').head(max_rows) if max_rows else rows.sort_values('time')
+        for clone in range(clones):
+            # Fresh IDs per run, so a rerun against the same server is not taken as duplicate readings
+            patients.append(VirtualPatient(f"{source_id}.{run_tag}.{clone}", source_id, rows, vitals_columns,
+                                           rng.uniform(0.0, jitter)))
+    return patients
+
+
+async def sleep_until(loop, when: float) -> None:
+    delay = when - loop.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+# --- Transports ---
+async def replay_http(client: httpx.AsyncClient, patient: VirtualPatient, start: float, speed: float,
+                      stats: ReplayStats, verbose: bool) -> None:
+    """One POST /predict/{patient_id} per reading, on the shared connection pool."""
+    loop = asyncio.get_running_loop()
+    for i, payload in enumerate(patient.payloads):
+        due = patient.due(start, i, speed)
+        await sleep_until(loop, due)
+        sent = loop.time()
+        try:
+            response = await client.post(f"/predict/{patient.patient_id}", json=payload)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        stats.requests += 1
+        stats.record(status, loop.time() - sent, sent - due)
+        if status == 200:
+            body = response.json()
+            patient.predicted[i] = body['predicted_class']
+            if verbose:
+                print(f"\n--- {payload['time']} ---")
+                print_response(body)
+        elif verbose:
+            print(f"❌ {payload['time']}: {status}")
+
+
+async def replay_ws(ws_url: str, patient: VirtualPatient, start: float, speed: float,
+                    stats: ReplayStats, verbose: bool) -> None:
+    """One WebSocket per bed; the server answers every reading in order on it."""
+    # pip install websockets
+    import websockets
+
+    loop = asyncio.get_running_loop()
+    await sleep_until(loop, patient.due(start, 0, speed))
+    try:
+        async with websockets.connect(f"{ws_url}/{patient.patient_id}") as websocket:
+            for i, payload in enumerate(patient.payloads):
+                due = patient.due(start, i, speed)
+                await sleep_until(loop, due)
+                sent = loop.time()
+                await websocket.send(json.dumps(payload))
+                body = json.loads(await websocket.recv())
+                stats.requests += 1
+                if 'error' in body:
+                    # Admission control answers with retry_after when the server is overloaded
+                    stats.record('overloaded' if 'retry_after' in body else 'ws_error', loop.time() - sent, sent - due)
+                    if verbose:
+                        print(f"❌ Server error: {body['error']}")
+                    continue
+                stats.record(200, loop.time() - sent, sent - due)
+                patient.predicted[i] = body['predicted_class']
+                if verbose:
+                    print(f"\n--- {payload['time']} ---")
+                    print_response(body)
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        stats.record(type(e).__name__, 0.0, 0.0)
+
+
+async def replay_batch(client: httpx.AsyncClient, patients: List[VirtualPatient], start: float, speed: float,
+                       stats: ReplayStats, interval: float, max_rows: int) -> None:
     """
-    Loops through a patient's data and sends it to the API, one row at a time.
+    Every `interval` seconds, sends every reading that has come due, for all
+    beds at once, through /predict/batch (at most `max_rows` per request).
     """
-    print(f"--- 🚀 Starting Simulation for {patient_id} ---")
-    print(f"   Sending data to {API_URL}/{patient_id}")
-    print(f"   (Press Ctrl+C to stop)")
-    
-    # Get just this patient's data
-    patient_df = data_df[data_df['Patient_ID'] == patient_id].copy()
-    
-    if patient_df.empty:
-        print(f"❌ Error: Could not find data for {patient_id} in {CSV_FILE}")
-        return
+    loop = asyncio.get_running_loop()
+    queue = [(patient.due(start, 0, speed), n, 0) for n, patient in enumerate(patients) if patient.payloads]
+    heapq.heapify(queue)
+    in_flight = set()
+
+    async def send(due_rows):
+        # Group by bed, keeping each bed's readings oldest first
+        grouped: Dict[int, List[int]] = {}
+        for _, n, i in due_rows:
+            grouped.setdefault(n, []).append(i)
+        body = {"patients": [{"patient_id": patients[n].patient_id,
+                              "readings": [patients[n].payloads[i] for i in rows]}
+                             for n, rows in grouped.items()]}
+        sent = loop.time()
+        try:
+            response = await client.post("/predict/batch", json=body)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latency = loop.time() - sent
+        stats.requests += 1
+        predictions = iter(response.json()['predictions']) if status == 200 else None
+        for n, rows in grouped.items():
+            for i in rows:
+                stats.record(status, latency, sent - patients[n].due(start, i, speed))
+                if predictions is not None:
+                    patients[n].predicted[i] = next(predictions)['predicted_class']
 
-    # These are the 17 features the API expects
-    # We drop 'Patient_ID', 'time', and 'Target'
-    vitals_columns = [col for col in patient_df.columns if col not in ['Patient_ID', 'time', 'Target']]
+    while queue:
+        await sleep_until(loop, queue[0][0])
+        await asyncio.sleep(interval)  # let more readings come due
+        now = loop.time()
+        due_rows = []
+        while queue and queue[0][0] <= now:
+            due, n, i = heapq.heappop(queue)
+            due_rows.append((due, n, i))
+            if i + 1 < len(patients[n].payloads):
+                heapq.heappush(queue, (patients[n].due(start, i + 1, speed), n, i + 1))
+        due_rows.sort(key=lambda item: (item[1], item[2]))
+        for chunk in range(0, len(due_rows), max_rows):
+            task = asyncio.create_task(send(due_rows[chunk:chunk + max_rows]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    await asyncio.gather(*in_flight)
 
+
+async def pick_transport(client: httpx.AsyncClient, ws_url: str, probe_id: str) -> str:
+    """Streaming if the server accepts a WebSocket, else batch if it lists /predict/batch, else HTTP."""
+    try:
+        import websockets
+        async with websockets.connect(f"{ws_url}/{probe_id}", open_timeout=5):
+            return "ws"
+    except Exception:
+        pass
     try:
-        # Loop through each row in the patient's dataframe
-        for index, row in patient_df.iterrows():
-            
-            # 1. Convert the row to the correct JSON format
-            # We use the original 'HR [bpm]' style names, 
-            # since the Pydantic model is set up to alias them.
-            vitals_payload = row[vitals_columns].to_dict()
-            
-            current_time_str = row['time'] # Get the time from the CSV
-            
-            print(f"\n--- {current_time_str} ---")
-            print(f"Sending data: HR={vitals_payload.get('HR [bpm]')}, SpO2={vitals_payload.get('SpO2 [%]')}%")
-
-            try:
-                # 2. Send the POST request to the running server
-                response = requests.post(
-                    f"{API_URL}/{patient_id}",
-                    json=vitals_payload
-                )
-                
-                response.raise_for_status() # Raise an error for bad responses (4xx, 5xx)
-                
-                # 3. Print the server's response
-                response_data = response.json()
-                
-                risk = response_data['risk_probability'] * 100
-                status = response_data['status_message']
-                
-                print(f"✅ Server Response: {status}")
-                
-                if "Prediction" in status:
-                    print(f"   📈 CURRENT RISK: {risk:.2f}%")
-                    if response_data['predicted_class'] == 1:
-                        print("   🚨 ALERT! HIGH RISK PREDICTED! 🚨")
-                
-            except requests.exceptions.ConnectionError:
-                print("❌ Error: Could not connect to the API server.")
-                print("   Is the `main.py` (uvicorn) server running?")
-                break
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Error during request: {e}")
-                print(f"   Server details: {response.text}")
-
-            # 4. Wait before sending the next row
-            time.sleep(SEND_INTERVAL_SECONDS)
+        response = await client.get("/openapi.json")
+        if response.status_code == 200 and "/predict/batch" in response.json().get("paths", {}):
+            return "batch"
+    except (httpx.HTTPError, ValueError):
+        pass
+    return "http"
 
-    except KeyboardInterrupt:
-        print("\n--- 🛑 Simulation stopped by user. ---")
+# --- Alert Timing ---
+def alert_timing(patients: List[VirtualPatient]) -> Dict[str, Any]:
+    """
+    Compares each bed's first predicted alert with the first row its Target
+    marks positive. Lead time is in event-time minutes: positive means the
+    alert came before the Target window began.
+    """
+    leads, per_patient = [], []
+    positives = detected = negatives = false_alarms = 0
+    row_counts: Counter = Counter()
+    for patient in patients:
+        answered = patient.predicted >= 0
+        alerts = np.flatnonzero(patient.predicted == 1)
+        onsets = np.flatnonzero(patient.targets == 1)
+        first_alert = float(patient.minutes[alerts[0]]) if len(alerts) else None
+        onset = float(patient.minutes[onsets[0]]) if len(onsets) else None
+
+        if onset is not None:
+            positives += 1
+            if first_alert is not None:
+                detected += 1
+                leads.append(onset - first_alert)
+        else:
+            negatives += 1
+            false_alarms += first_alert is not None
+
+        for predicted, target in zip(patient.predicted[answered], patient.targets[answered]):
+            row_counts[('tp' if target else 'fp') if predicted == 1 else ('fn' if target else 'tn')] += 1
+        per_patient.append({"patient_id": patient.patient_id, "source": patient.source_id,
+                            "target_onset_min": onset, "first_alert_min": first_alert,
+                            "lead_min": None if onset is None or first_alert is None else onset - first_alert})
+
+    tp, fp, fn = row_counts['tp'], row_counts['fp'], row_counts['fn']
+    return {
+        "patients_with_target": positives,
+        "patients_alerted": detected,
+        "patient_sensitivity": detected / positives if positives else None,
+        "lead_minutes": {"median": float(np.median(leads)), "min": float(min(leads)), "max": float(max(leads))}
+                        if leads else {},
+        "patients_without_target": negatives,
+        "false_alarm_patients": false_alarms,
+        "rows": dict(row_counts),
+        "row_precision": tp / (tp + fp) if tp + fp else None,
+        "row_recall": tp / (tp + fn) if tp + fn else None,
+        "per_patient": per_patient,
+    }
+
+# --- Main Function ---
+async def run_replay(args, data_df: pd.DataFrame, clones: int) -> Dict[str, Any]:
+    """Replays every bed once with `clones` copies of each dataset patient and reports the run."""
+    run_tag = uuid.uuid4().hex[:6]
+    patients = load_patients(data_df, clones, run_tag, args.jitter, args.patient, args.max_rows, args.seed)
+    if not patients:
+        raise SystemExit(f"❌ Error: no patients to replay from {args.csv}")
+    verbose = args.verbose or len(patients) == 1
+    ws_url = args.url.replace("http", "ws", 1) + "/ws/predict"
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        await client.get("/")  # fail fast (ConnectError) if the server is not up
+        transport = args.transport
+        if transport == "auto":
+            transport = await pick_transport(client, ws_url, f"probe.{run_tag}")
+
+        rows = sum(len(patient.payloads) for patient in patients)
+        print(f"--- 🚀 Replaying {len(patients)} beds ({rows} readings) over {transport} "
+              f"at {args.speed:g}x, run {run_tag} ---")
+
+        stats = ReplayStats()
+        loop = asyncio.get_running_loop()
+        start = loop.time() + 0.5
+        if transport == "batch":
+            await replay_batch(client, patients, start, args.speed, stats, args.batch_interval, args.batch_rows)
+        elif transport == "ws":
+            await asyncio.gather(*(replay_ws(ws_url, p, start, args.speed, stats, verbose) for p in patients))
+        else:
+            await asyncio.gather(*(replay_http(client, p, start, args.speed, stats, verbose) for p in patients))
+        wall = loop.time() - start
+
+    answered = sum(stats.status.values())
+    report = {
+        "run": run_tag,
+        "transport": transport,
+        "beds": len(patients),
+        "clones": clones,
+        "speed": args.speed,
+        "readings": answered,
+        "requests": stats.requests,
+        "status": dict(stats.status),
+        "wall_seconds": wall,
+        "readings_per_sec": answered / wall if wall > 0 else 0.0,
+        "latency_ms": percentiles_ms(stats.latencies),
+        "send_lag_ms": percentiles_ms(stats.lags),  # > 0 when the client or server could not keep up
+        "alerts": alert_timing(patients),
+    }
+    if not args.per_patient:
+        del report["alerts"]["per_patient"]
+    return report
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    latency, lag, alerts = report["latency_ms"], report["send_lag_ms"], report["alerts"]
+    print(f"✅ {report['beds']} beds, {report['readings']} readings in {report['wall_seconds']:.1f}s "
+          f"({report['readings_per_sec']:.0f}/s), status {report['status']}")
+    if latency:
+        print(f"   ⏱️  latency p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+              f"p99 {latency['p99']:.1f} ms; send lag p99 {lag.get('p99', 0.0):.1f} ms")
+    if alerts["patients_with_target"]:
+        lead = alerts["lead_minutes"]
+        print(f"   🚨 alerted {alerts['patients_alerted']}/{alerts['patients_with_target']} Target patients"
+              + (f", median lead {lead['median']:.0f} min" if lead else "")
+              + f"; false alarms on {alerts['false_alarm_patients']}/{alerts['patients_without_target']} others")
+
+
+async def main(args) -> None:
+    try:
+        data_df = pd.read_csv(args.csv)
+    except FileNotFoundError:
+        print(f"❌ Error: Cannot find dataset '{args.csv}'")
+        return
+
+    reports = []
+    for clones in args.clones:
+        try:
+            report = await run_replay(args, data_df, clones)
+        except httpx.ConnectError:
+            print("❌ Error: Could not connect to the API server.")
+            print("   Is the `main.py` (uvicorn) server running?")
+            return
+        print_summary(report)
+        reports.append(report)
+
+    # Capacity: the most beds whose p99 stayed within budget
+    if args.p99_budget_ms and len(reports) > 1:
+        within = [r["beds"] for r in reports if r["latency_ms"].get("p99", float("inf")) <= args.p99_budget_ms
+                  and not set(r["status"]) - {"200"}]
+        print(f"--- 🛏️  Max beds within p99 {args.p99_budget_ms:g} ms: {max(within) if within else 'none'} ---")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "runs": reports}, f, indent=2)
+        print(f"✅ Wrote {args.output}")
 
 # --- Run the Script ---
 if __name__ == "__main__":
-    # 1. Install 'requests' library first:
-    # pip install requests
-    
+    # pip install httpx websockets
+    parser = argparse.ArgumentParser(description="Replay the dataset as many concurrent bedside monitors.")
+    parser.add_argument('--url', default=BASE_URL, help="API base URL")
+    parser.add_argument('--csv', default=CSV_FILE, help="dataset to replay")
+    parser.add_argument('--patient', help="replay only this Patient_ID (prints every response)")
+    parser.add_argument('--clones', type=int, nargs='+', default=[1],
+                        help="copies of every patient; several values run one replay each (e.g. 1 2 4 8)")
+    parser.add_argument('--speed', type=float, default=SPEED,
+                        help="time acceleration (60 = one minute of data per second, 0 = as fast as possible)")
+    parser.add_argument('--jitter', type=float, default=START_JITTER_SECONDS,
+                        help="spread bed start times over this many seconds")
+    parser.add_argument('--max-rows', type=int, help="replay at most this many readings per patient")
+    parser.add_argument('--transport', choices=['auto', 'http', 'ws', 'batch'], default='auto',
+                        help="auto uses the WebSocket stream, else /predict/batch, else one POST per reading")
+    parser.add_argument('--stream', dest='transport', action='store_const', const='ws',
+                        help="same as --transport ws")
+    parser.add_argument('--connections', type=int, default=MAX_CONNECTIONS, help="HTTP keep-alive pool size")
+    parser.add_argument('--timeout', type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_MAX_ROWS, help="max readings per batch request")
+    parser.add_argument('--batch-interval', type=float, default=BATCH_INTERVAL_SECONDS,
+                        help="batch transport flush interval in seconds")
+    parser.add_argument('--p99-budget-ms', type=float, help="report the most beds whose p99 latency stayed within this")
+    parser.add_argument('--per-patient', action='store_true', help="include per-bed alert timing in the report")
+    parser.add_argument('--verbose', action='store_true', help="print every response")
+    parser.add_argument('--seed', type=int, default=0, help="seed for start jitter")
+    parser.add_argument('-o', '--output', help="write the JSON report here")
+    args = parser.parse_args()
+
     try:
-        df = pd.read_csv(CSV_FILE)
-    except FileNotFoundError:
-        print(f"❌ Error: Cannot find dataset '{CSV_FILE}'")
-        exit()
-        
-    simulate_patient_monitor(PATIENT_ID, df)
\ No newline at end of file
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("\n--- 🛑 Simulation stopped by user. ---")
@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class Overloaded(Exception):
+    """Work refused by admission control: `status_code` is 429 (one key) or 503 (the server)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Job:
+    """One admitted unit of work; use as a context manager so its place is released."""
+
+    __slots__ = ('executor', 'key', 'queued_seconds')
+
+    def __init__(self, executor: "InferenceExecutor", key: Optional[Hashable]):
+        self.executor = executor
+        self.key = key
+        self.queued_seconds = 0.0  # time the last `run` waited for a worker
+
+    async def run(self, fn: Callable, *args) -> Any:
+        return await self.executor._run(self, fn, args)
+
+    def __enter__(self) -> "Job":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.executor._release(self)
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound calls off the asyncio event loop, with admission control.
+
+    `admit(key)` reserves a place before any work starts, or raises Overloaded:
+    503 once `max_pending` jobs are in the server, 429 once `max_pending_per_key`
+    of them share `key` (one patient). `Job.run(fn, *args)` then waits for a
+    free worker and calls `fn` in the pool. Jobs with the same key run one at
+    a time in admission order, so a patient's results come back in the order
+    its readings arrived. A job that waits longer than `queue_timeout` seconds
+    for a worker is shed with a 503 rather than queueing without bound.
+
+    `kind` is "thread" or "process"; `workers=0` runs calls inline on the loop.
+    Process workers only have what `initializer(*initargs)` sets up, so `fn`
+    must be a module-level function there.
+    """
+
+    def __init__(self, kind: str = 'thread', workers: int = 1, max_pending: int = 64,
+                 max_pending_per_key: int = 8, queue_timeout: float = 1.0,
+                 initializer: Optional[Callable] = None, initargs: tuple = ()):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind!r} (expected 'thread' or 'process')")
+        self.workers = max(0, int(workers))
+        self.kind = kind if self.workers else 'inline'
+        self.max_pending = max(1, int(max_pending))
+        self.max_pending_per_key = max(1, int(max_pending_per_key))
+        self.queue_timeout = float(queue_timeout)
+
+        if self.kind == 'process':
+            self._pool = ProcessPoolExecutor(self.workers, initializer=initializer, initargs=initargs)
+        elif self.kind == 'thread':
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='inference')
+        else:
+            self._pool = None
+        self._slots = asyncio.Semaphore(max(1, self.workers))
+
+        self._pending = 0
+        self._pending_by_key: Dict[Hashable, int] = {}
+        self._tails: Dict[Hashable, asyncio.Future] = {}  # last job started or queued per key
+        self._running = 0
+        self._completed = 0
+        self._rejected: Counter = Counter()
+        self._queue_wait_seconds = 0.0
+
+    def admit(self, key: Optional[Hashable] = None) -> Job:
+        if self._pending >= self.max_pending:
+            self._rejected['capacity'] += 1
+            raise Overloaded(503, "Server is at capacity; retry shortly.")
+        if key is not None and self._pending_by_key.get(key, 0) >= self.max_pending_per_key:
+            self._rejected['key_limit'] += 1
+            raise Overloaded(429, f"Too many requests in flight for '{key}'; retry shortly.")
+        self._pending += 1
+        if key is not None:
+            self._pending_by_key[key] = self._pending_by_key.get(key, 0) + 1
+        return Job(self, key)
+
+    def _release(self, job: Job) -> None:
+        self._pending -= 1
+        if job.key is not None:
+            left = self._pending_by_key[job.key] - 1
+            if left:
+                self._pending_by_key[job.key] = left
+            else:
+                del self._pending_by_key[job.key]
+
+    async def _acquire(self, previous: Optional[asyncio.Future]) -> None:
+        if previous is not None:
+            await asyncio.shield(previous)  # shielded: a timeout here must not cancel the other job's turn
+        await self._slots.acquire()
+
+    async def _run(self, job: Job, fn: Callable, args: tuple) -> Any:
+        loop = asyncio.get_running_loop()
+        queued = time.perf_counter()
+        previous = self._tails.get(job.key) if job.key is not None else None
+        turn = loop.create_future()
+        if job.key is not None:
+            self._tails[job.key] = turn
+        try:
+            try:
+                await asyncio.wait_for(self._acquire(previous), self.queue_timeout if self.queue_timeout > 0 else None)
+            except asyncio.TimeoutError:
+                self._rejected['queue_timeout'] += 1
+                raise Overloaded(503, "Timed out waiting for an inference worker; retry shortly.")
+            job.queued_seconds = time.perf_counter() - queued
+            self._queue_wait_seconds += job.queued_seconds
+            self._running += 1
+            try:
+                if self._pool is None:
+                    return fn(*args)
+                if self.kind == 'thread':
+                    # Copy the context so per-request tracing sees stages timed in the worker thread
+                    return await loop.run_in_executor(self._pool, contextvars.copy_context().run, fn, *args)
+                return await loop.run_in_executor(self._pool, fn, *args)
+            finally:
+                self._running -= 1
+                self._completed += 1
+                self._slots.release()
+        finally:
+            if previous is not None and not previous.done():
+                # Shed or cancelled while the job ahead was still running: pass our
+                # turn on only once it finishes, so the next job cannot overlap it
+                previous.add_done_callback(lambda _: self._end_turn(job.key, turn))
+            else:
+                self._end_turn(job.key, turn)
+
+    def _end_turn(self, key: Optional[Hashable], turn: asyncio.Future) -> None:
+        if not turn.done():
+            turn.set_result(None)
+        if self._tails.get(key) is turn:
+            del self._tails[key]
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self._completed
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "max_pending_per_key": self.max_pending_per_key,
+            "queue_timeout_ms": self.queue_timeout * 1000.0,
+            "pending": self._pending,
+            "running": self._running,
+            "completed": completed,
+            "rejected": dict(self._rejected),
+            "mean_queue_wait_ms": 1000.0 * self._queue_wait_seconds / completed if completed else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
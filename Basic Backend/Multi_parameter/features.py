@@ -0,0 +1,163 @@
+import math
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# --- Feature Definitions ---
+# The 17 raw vital signs, in the order the model was trained on.
+VITAL_COLUMNS = [
+    'DeltaQTc [msec]', 'HR [bpm]', 'NBPd [mmHg]', 'NBPm [mmHg]', 'NBPs [mmHg]',
+    'PVC [/min]', 'Perf [NU]', 'Pulse (NBP) [bpm]', 'Pulse (SpO2) [bpm]',
+    'QT [msec]', 'QT-HR [bpm]', 'QTc [msec]', 'RR [rpm]', 'ST-III [mm]',
+    'ST-V [mm]', 'SpO2 [%]', 'btbHR [bpm]',
+]
+
+# Vitals that get lag and rolling-window features.
+ROLLING_VITALS = ['HR [bpm]', 'SpO2 [%]', 'NBPs [mmHg]', 'RR [rpm]']
+ROLLING_WINDOW = 5
+
+# Full engineered feature vector, in the same order as ts_feature_columns.joblib.
+FEATURE_COLUMNS = (
+    VITAL_COLUMNS
+    + [f'{col}_lag_1' for col in ROLLING_VITALS]
+    + [f'{col}_roll_avg_{ROLLING_WINDOW}' for col in ROLLING_VITALS]
+    + [f'{col}_roll_std_{ROLLING_WINDOW}' for col in ROLLING_VITALS]
+)
+
+# Positions of the rolling vitals inside a VITAL_COLUMNS-ordered row.
+_ROLLING_INDEX = [VITAL_COLUMNS.index(col) for col in ROLLING_VITALS]
+
+# Running sums are rebuilt from the ring buffer this often to stop rounding drift.
+RESYNC_INTERVAL = 1024
+
+
+# --- Feature Engineering Function ---
+# This MUST be identical to the function used in training.
+def create_timeseries_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Engineers time-series features for a single patient's DataFrame."""
+    # Ensure dataframe is sorted by time
+    df = df.sort_values(by='time')
+
+    for col in ROLLING_VITALS:
+        df[f'{col}_lag_1'] = df[col].shift(1)
+        df[f'{col}_roll_avg_{ROLLING_WINDOW}'] = df[col].rolling(window=ROLLING_WINDOW, min_periods=1).mean()
+        df[f'{col}_roll_std_{ROLLING_WINDOW}'] = df[col].rolling(window=ROLLING_WINDOW, min_periods=1).std()
+
+    return df
+
+
+def create_grouped_timeseries_features(df: pd.DataFrame, patient_col: str = 'Patient_ID') -> pd.DataFrame:
+    """
+    Same features as `create_timeseries_features`, computed for every patient
+    in one pass with groupby-shift/rolling instead of one call per patient.
+    Rows come back sorted by patient, then time.
+    """
+    df = df.sort_values(by=[patient_col, 'time'], kind='stable').reset_index(drop=True)
+    grouped = df.groupby(patient_col, sort=False)
+
+    for col in ROLLING_VITALS:
+        rolling = grouped[col].rolling(window=ROLLING_WINDOW, min_periods=1)
+        df[f'{col}_lag_1'] = grouped[col].shift(1)
+        # groupby-rolling is indexed by (patient, row); drop the patient level to align with df
+        df[f'{col}_roll_avg_{ROLLING_WINDOW}'] = rolling.mean().reset_index(level=0, drop=True)
+        df[f'{col}_roll_std_{ROLLING_WINDOW}'] = rolling.std().reset_index(level=0, drop=True)
+
+    return df
+
+
+# --- Incremental Feature State ---
+class IncrementalFeatureState:
+    """
+    Constant-time version of `create_timeseries_features` for one patient.
+
+    Keeps the last ROLLING_WINDOW values of each rolling vital in a ring buffer
+    with running sums and sums of squares, so every new row costs O(1) no matter
+    how long the patient has been monitored. `update` returns the feature vector
+    for the newest row in FEATURE_COLUMNS order, matching
+    `create_timeseries_features(history).fillna(0).iloc[-1]`.
+    """
+
+    __slots__ = ('window', 'count', 'head', 'ring', 'shift', 'sums', 'sumsqs', 'same_run', 'last')
+
+    def __init__(self, window: int = ROLLING_WINDOW):
+        n = len(ROLLING_VITALS)
+        self.window = window
+        self.count = 0                                   # rows seen so far
+        self.head = 0                                    # next ring slot to overwrite
+        self.ring = [[0.0] * window for _ in range(n)]   # raw values, per vital
+        self.shift = [0.0] * n                           # reference value for the sums (limits cancellation)
+        self.sums = [0.0] * n                            # sum of (x - shift) over the window
+        self.sumsqs = [0.0] * n                          # sum of (x - shift)^2 over the window
+        self.same_run = [0] * n                          # identical values ending at the newest row
+        self.last = [0.0] * n                            # previous row's value (lag 1)
+
+    def update(self, vitals: Sequence[float]) -> np.ndarray:
+        """Adds one row of VITAL_COLUMNS-ordered vitals and returns its features."""
+        row = [float(v) for v in vitals]
+        window = self.window
+        head = self.head
+        full = self.count >= window
+
+        if self.count == 0:
+            self.shift = [row[i] for i in _ROLLING_INDEX]
+
+        lags: List[float] = []
+        avgs: List[float] = []
+        stds: List[float] = []
+        n_obs = window if full else self.count + 1
+
+        for k, i in enumerate(_ROLLING_INDEX):
+            x = row[i]
+            ring = self.ring[k]
+            shift = self.shift[k]
+
+            if full:
+                old = ring[head] - shift
+                self.sums[k] -= old
+                self.sumsqs[k] -= old * old
+            d = x - shift
+            self.sums[k] += d
+            self.sumsqs[k] += d * d
+            ring[head] = x
+
+            # Lag 1 is NaN on the first row; the API fills it with 0.
+            if self.count == 0:
+                lags.append(0.0)
+                self.same_run[k] = 1
+            else:
+                prev = self.last[k]
+                lags.append(prev)
+                self.same_run[k] = self.same_run[k] + 1 if x == prev else 1
+            self.last[k] = x
+
+            s = self.sums[k]
+            avgs.append(shift + s / n_obs)
+
+            # Std of a single value is NaN (-> 0); a constant window is exactly 0,
+            # the same special case pandas applies.
+            if n_obs < 2 or self.same_run[k] >= n_obs:
+                stds.append(0.0)
+            else:
+                var = (self.sumsqs[k] - s * s / n_obs) / (n_obs - 1)
+                stds.append(math.sqrt(var) if var > 0.0 else 0.0)
+
+        self.head = (head + 1) % window
+        self.count += 1
+        if self.count % RESYNC_INTERVAL == 0:
+            self._resync()
+
+        return np.array(row + lags + avgs + stds, dtype=np.float64)
+
+    def _resync(self) -> None:
+        """Recomputes the running sums from the ring, re-centred on the newest value."""
+        n_obs = min(self.count, self.window)
+        # The newest n_obs values sit just behind head.
+        slots = [(self.head - j - 1) % self.window for j in range(n_obs)]
+        for k in range(len(ROLLING_VITALS)):
+            ring = self.ring[k]
+            shift = self.last[k]
+            deltas = [ring[j] - shift for j in slots]
+            self.shift[k] = shift
+            self.sums[k] = math.fsum(deltas)
+            self.sumsqs[k] = math.fsum(d * d for d in deltas)
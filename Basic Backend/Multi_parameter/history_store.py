@@ -0,0 +1,609 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import VITAL_COLUMNS
+
+# --- Record Layout ---
+# One float64 row per reading: the 17 vitals followed by the timestamp. Late,
+# duplicate and stale readings rebuild features from the stored rows, so they are
+# kept at the precision they were sent with.
+HISTORY_COLUMNS = VITAL_COLUMNS + ['time']
+TIME_INDEX = len(VITAL_COLUMNS)
+HISTORY_DTYPE = np.float64
+
+# Readings whose event times are this close are the same reading sent twice
+# (e.g. a gateway re-flushing its buffer).
+DUPLICATE_TOLERANCE_SECONDS = 0.001
+
+# Readings sent without a device time are stamped with their arrival time, moved
+# at least this far past the patient's newest reading, so they always append and
+# are never taken for duplicates of each other.
+UNTIMED_STEP_SECONDS = 0.001
+
+
+class InsertResult(NamedTuple):
+    """Where a reading landed in the patient's event-time ordered history."""
+    length: int                    # readings retained for the patient
+    version: int                   # readings ever stored (unchanged for duplicates and rejects)
+    position: Optional[int]        # retained readings newer than this one (0 = newest);
+                                   # None if it is older than everything a full history keeps
+    duplicate: bool = False        # an equal-time reading was already stored; nothing was written
+    gap_seconds: Optional[float] = None  # event time since the previous reading (None for the first)
+    time: Optional[float] = None   # POSIX seconds the reading was stored at (None if nothing was stored)
+
+
+def to_epoch_seconds(timestamp: datetime) -> float:
+    """Converts a (naive UTC or aware) datetime to POSIX seconds."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class PatientHistory:
+    """Fixed-size ring of readings for a single patient."""
+
+    __slots__ = ('data', 'head', 'size', 'time_base', 'last_seen', 'appended', 'last_write')
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros((capacity, len(HISTORY_COLUMNS)), dtype=HISTORY_DTYPE)
+        self.head = 0          # next slot to overwrite
+        self.size = 0          # number of valid rows
+        self.time_base = 0.0   # POSIX seconds that the stored offsets are relative to
+        self.last_seen = 0.0   # POSIX seconds of the newest reading
+        self.appended = 0      # readings ever appended (the history version)
+        self.last_write = 0.0  # time.monotonic() of the last insert, for idle eviction
+
+    @property
+    def capacity(self) -> int:
+        return self.data.shape[0]
+
+    def order(self) -> np.ndarray:
+        """Ring slots from oldest to newest."""
+        start = (self.head - self.size) % self.capacity
+        return (start + np.arange(self.size)) % self.capacity
+
+    def insert(self, vitals: Sequence[float], timestamp: float,
+               timed: bool = True) -> Tuple[Optional[int], bool, Optional[float], Optional[float]]:
+        """
+        Stores a reading in event-time order. Returns (position, duplicate, gap, time)
+        as described on InsertResult. In-order readings are written at the head;
+        a late one shifts only the `position` newer rows up by one slot. An
+        untimed reading (`timed=False`) is always written at the head.
+        """
+        if self.size and not timed:
+            timestamp = max(timestamp, self.last_seen + UNTIMED_STEP_SECONDS)
+        if self.size == 0 or not timed or timestamp > self.last_seen + DUPLICATE_TOLERANCE_SECONDS:
+            gap = timestamp - self.last_seen if self.size else None
+            if self.size == 0:
+                self.time_base = timestamp
+            self._write(self.head, vitals, timestamp)
+            self.last_seen = timestamp
+            return 0, False, gap, timestamp
+
+        # Late or repeated reading: binary-search its slot among the retained times
+        slots = self.order()
+        times = self.time_base + self.data[slots, TIME_INDEX]
+        k = int(np.searchsorted(times, timestamp))
+        for j in (k - 1, k):
+            if 0 <= j < self.size and abs(times[j] - timestamp) <= DUPLICATE_TOLERANCE_SECONDS:
+                return self.size - 1 - j, True, None, None
+        if k == 0 and self.size == self.capacity:
+            return None, False, None, None  # older than the whole retained window
+
+        # Move the newer rows one slot towards the head (a full ring drops its oldest row)
+        position = self.size - k
+        gap = timestamp - times[k - 1] if k > 0 else None
+        self.data[(slots[0] + np.arange(k + 1, self.size + 1)) % self.capacity] = self.data[slots[k:]]
+        self._write((slots[0] + k) % self.capacity, vitals, timestamp)
+        return position, False, gap, timestamp
+
+    def _write(self, slot: int, vitals: Sequence[float], timestamp: float) -> None:
+        row = self.data[slot]
+        row[:TIME_INDEX] = vitals
+        row[TIME_INDEX] = timestamp - self.time_base
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.appended += 1
+
+    def rows(self) -> np.ndarray:
+        """Returns a copy of the readings, oldest first (vitals only)."""
+        return self.data[self.order(), :TIME_INDEX]
+
+    def timestamps(self) -> np.ndarray:
+        """Returns POSIX seconds for each reading, oldest first."""
+        return self.time_base + self.data[self.order(), TIME_INDEX]
+
+    def window(self, position: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to `n` readings ending at the one `position` rows from the newest: (vitals, POSIX seconds)."""
+        end = self.size - position
+        slots = self.order()[max(0, end - n):end]
+        return self.data[slots, :TIME_INDEX], self.time_base + self.data[slots, TIME_INDEX]
+
+    def nbytes(self) -> int:
+        """Memory held by this record, including the preallocated array."""
+        return sys.getsizeof(self) + sys.getsizeof(self.data)
+
+
+class HistoryBackend(ABC):
+    """
+    Where patient histories live.
+
+    Readings are kept in event-time order (the monitor's timestamp), so a late
+    reading lands in its proper slot; only the readings newer than it move.
+    Every stored reading bumps the patient's version. The API keeps its
+    rolling-feature state in process memory and compares versions to notice
+    when another worker has written to the same patient; it then rebuilds the
+    state from `window`.
+    """
+
+    capacity: int
+    # Called with each patient ID the backend evicts, so callers can drop their own per-patient state
+    on_evict: Optional[Callable[[str], None]] = None
+    # True if calls can block on disk or locks, so async callers should make them off the event loop
+    blocking_io: bool = False
+
+    @abstractmethod
+    def insert(self, patient_id: str, vitals: Sequence[float], timestamp: datetime,
+               timed: bool = True) -> InsertResult:
+        """
+        Stores one VITAL_COLUMNS-ordered reading taken at `timestamp`. A reading
+        with the same time as a stored one is a duplicate and is not stored again.
+        With `timed=False` (no device time; `timestamp` is the arrival time) the
+        reading is appended as the newest, at least UNTIMED_STEP_SECONDS after
+        the previous one, and is never a duplicate.
+        """
+
+    @abstractmethod
+    def length(self, patient_id: str) -> int:
+        """Readings currently retained for the patient (at most `capacity`)."""
+
+    @abstractmethod
+    def version(self, patient_id: str) -> int:
+        """Readings ever appended for the patient (0 if unknown)."""
+
+    @abstractmethod
+    def tail(self, patient_id: str, n: int) -> np.ndarray:
+        """The newest `n` readings as a float64 (rows, VITAL_COLUMNS) array, oldest first."""
+
+    @abstractmethod
+    def window(self, patient_id: str, position: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Up to `n` readings ending at the one `position` rows from the newest
+        (0 = newest), oldest first: float64 vitals and POSIX-second timestamps.
+        """
+
+    @abstractmethod
+    def remove(self, patient_id: str) -> bool:
+        """Drops the patient's history. Returns False if there was none."""
+
+    @abstractmethod
+    def to_frame(self, patient_id: str) -> pd.DataFrame:
+        """Returns the patient's history as a DataFrame shaped like the training data."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counts and memory/disk usage, for /history/stats."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of patients with a history."""
+
+    @abstractmethod
+    def __contains__(self, patient_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def evict_idle(self, max_idle_seconds: float, limit: Optional[int] = None) -> List[str]:
+        """Evicts patients with no reading for `max_idle_seconds` (at most `limit`). Returns their IDs."""
+
+    def batch(self) -> ContextManager:
+        """Groups the appends made inside the block into one write, where supported."""
+        return nullcontext()
+
+    def close(self) -> None:
+        pass
+
+
+class PatientHistoryStore(HistoryBackend):
+    """
+    Bounded per-patient history backed by preallocated float64 ring arrays.
+
+    Each patient costs exactly `bytes_per_patient` bytes from their first reading
+    onward, no matter how many readings arrive: appends write into the ring in
+    place and never reallocate. Readings are stored exactly as sent, so features
+    rebuilt from `window` match the ones computed when the readings arrived.
+
+    Records are kept in least-recently-written order. `evict_idle` drops
+    patients with no reading for a while, and `max_bytes` caps the total by
+    evicting the least recently written patient whenever a new one would go
+    over it. With `spill_dir` set, evicted histories are written there as .npz
+    files and read back transparently on the patient's next reading.
+    """
+
+    def __init__(self, capacity: int, max_bytes: int = 0, spill_dir: Optional[str] = None):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._records: "OrderedDict[str, PatientHistory]" = OrderedDict()
+        self._bytes_per_patient = PatientHistory(capacity).nbytes()
+        self._evictions: Counter = Counter()
+        self._spilled = 0
+        self._restored = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, patient_id: str) -> bool:
+        return patient_id in self._records or (self.spill_dir is not None and os.path.exists(self._spill_path(patient_id)))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def get(self, patient_id: str) -> Optional[PatientHistory]:
+        record = self._records.get(patient_id)
+        return record if record is not None else self._restore(patient_id)
+
+    def insert(self, patient_id: str, vitals: Sequence[float], timestamp: datetime,
+               timed: bool = True) -> InsertResult:
+        record = self._records.get(patient_id)
+        if record is None:
+            record = self._restore(patient_id) or PatientHistory(self.capacity)
+            self._records[patient_id] = record
+            self._enforce_max_bytes()
+        else:
+            self._records.move_to_end(patient_id)
+        record.last_write = time.monotonic()
+        position, duplicate, gap, ts = record.insert(vitals, to_epoch_seconds(timestamp), timed)
+        return InsertResult(record.size, record.appended, position, duplicate, gap, ts)
+
+    def length(self, patient_id: str) -> int:
+        record = self.get(patient_id)
+        return record.size if record is not None else 0
+
+    def version(self, patient_id: str) -> int:
+        record = self.get(patient_id)
+        return record.appended if record is not None else 0
+
+    def tail(self, patient_id: str, n: int) -> np.ndarray:
+        record = self.get(patient_id)
+        if record is None:
+            return np.empty((0, len(VITAL_COLUMNS)))
+        return record.rows()[-n:]
+
+    def window(self, patient_id: str, position: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        record = self.get(patient_id)
+        if record is None:
+            return np.empty((0, len(VITAL_COLUMNS))), np.empty(0)
+        return record.window(position, n)
+
+    def remove(self, patient_id: str) -> bool:
+        spilled = self.spill_dir is not None and os.path.exists(self._spill_path(patient_id))
+        if spilled:
+            os.remove(self._spill_path(patient_id))
+        return self._records.pop(patient_id, None) is not None or spilled
+
+    def to_frame(self, patient_id: str) -> pd.DataFrame:
+        record = self.get(patient_id)
+        if record is None:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        df = pd.DataFrame(record.rows(), columns=VITAL_COLUMNS)
+        df['time'] = pd.to_datetime(record.timestamps(), unit='s')
+        return df
+
+    # --- Eviction ---
+    def evict_idle(self, max_idle_seconds: float, limit: Optional[int] = None) -> List[str]:
+        cutoff = time.monotonic() - max_idle_seconds
+        evicted: List[str] = []
+        # Least recently written first, so stop at the first patient still active
+        while self._records and (limit is None or len(evicted) < limit):
+            patient_id, record = next(iter(self._records.items()))
+            if record.last_write > cutoff:
+                break
+            self._evict(patient_id, 'idle')
+            evicted.append(patient_id)
+        return evicted
+
+    def _enforce_max_bytes(self) -> None:
+        if not self.max_bytes:
+            return
+        # Never evicts the newest record (the patient being written)
+        while len(self._records) > 1 and len(self._records) * self._bytes_per_patient > self.max_bytes:
+            self._evict(next(iter(self._records)), 'memory_cap')
+
+    def _evict(self, patient_id: str, reason: str) -> None:
+        record = self._records.pop(patient_id)
+        if self.spill_dir:
+            self._spill(patient_id, record)
+        self._evictions[reason] += 1
+        if self.on_evict is not None:
+            self.on_evict(patient_id)
+
+    def _spill_path(self, patient_id: str) -> str:
+        name = hashlib.sha1(patient_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, f'{name}.npz')
+
+    def _spill(self, patient_id: str, record: PatientHistory) -> None:
+        path = self._spill_path(patient_id)
+        meta = np.array([record.head, record.size, record.time_base, record.last_seen, record.appended],
+                        dtype=np.float64)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, patient_id=np.array(patient_id), data=record.data, meta=meta)
+        os.replace(tmp, path)
+        self._spilled += 1
+
+    def _restore(self, patient_id: str) -> Optional[PatientHistory]:
+        """Reads a spilled history back into memory (and deletes the file)."""
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(patient_id)
+        try:
+            with np.load(path) as spilled:
+                data, meta, stored_id = spilled['data'], spilled['meta'], str(spilled['patient_id'])
+        except (OSError, KeyError, ValueError):
+            return None
+        os.remove(path)
+        if stored_id != patient_id or data.shape != (self.capacity, len(HISTORY_COLUMNS)):
+            return None  # hash collision or MAX_HISTORY_SIZE changed: start over
+        record = PatientHistory(self.capacity)
+        record.data[:] = data
+        record.head, record.size, record.appended = int(meta[0]), int(meta[1]), int(meta[4])
+        record.time_base, record.last_seen = float(meta[2]), float(meta[3])
+        record.last_write = time.monotonic()
+        self._records[patient_id] = record
+        self._restored += 1
+        self._enforce_max_bytes()
+        return record
+
+    @property
+    def bytes_per_patient(self) -> int:
+        """Upper bound on the memory one patient's history occupies."""
+        return self._bytes_per_patient
+
+    def nbytes(self) -> int:
+        """Memory currently held by all patient records."""
+        return sum(record.nbytes() for record in self._records.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "patients": len(self._records),
+            "capacity_rows": self.capacity,
+            "bytes_per_patient": self.bytes_per_patient,
+            "total_bytes": self.nbytes(),
+            "max_bytes": self.max_bytes,
+            "evictions": dict(self._evictions),
+            "spill_dir": self.spill_dir,
+            "spilled": self._spilled,
+            "restored": self._restored,
+        }
+
+
+# --- SQLite Backend ---
+_VITAL_SQL_COLUMNS = [f'v{i}' for i in range(len(VITAL_COLUMNS))]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS readings (
+    patient_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    time REAL NOT NULL,
+    {', '.join(f'{col} REAL NOT NULL' for col in _VITAL_SQL_COLUMNS)},
+    PRIMARY KEY (patient_id, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS readings_by_time ON readings (patient_id, time);
+CREATE INDEX IF NOT EXISTS patients_by_last_seen ON patients (last_seen);
+"""
+
+
+class SQLiteHistoryStore(HistoryBackend):
+    """
+    Patient histories in an embedded SQLite file, shared by every worker on the host.
+
+    The database runs in WAL mode, so several uvicorn workers can read while one
+    writes, and histories survive restarts and deploys. Appends made inside
+    `batch()` go out as a single transaction (one fsync for a whole batch request
+    or a burst of stream messages). Readings are stored as float64, so a worker
+    that rebuilds its feature state from `window` gets exactly what was sent.
+    Calls can wait up to `busy_timeout_ms` for another worker's write lock, so
+    the store sets `blocking_io`.
+
+    Reads order by event time through the (patient_id, time) index. Readings
+    older than the newest `capacity` are trimmed every `capacity` inserts per
+    patient, so at most 2 * capacity rows per patient sit on disk while
+    `length` never exceeds capacity.
+    """
+
+    blocking_io = True
+
+    def __init__(self, path: str, capacity: int, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._in_batch = False
+        self._evictions = 0
+
+        placeholders = ', '.join('?' * (len(_VITAL_SQL_COLUMNS) + 3))
+        self._insert_sql = (
+            f'INSERT INTO readings (patient_id, version, time, {", ".join(_VITAL_SQL_COLUMNS)}) '
+            f'VALUES ({placeholders})'
+        )
+        self._window_sql = (
+            f'SELECT {", ".join(_VITAL_SQL_COLUMNS)}, time FROM readings '
+            'WHERE patient_id = ? ORDER BY time DESC LIMIT ? OFFSET ?'
+        )
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        with self._lock:
+            if self._in_batch:
+                yield
+                return
+            # IMMEDIATE takes the write lock up front, so two workers never
+            # deadlock trying to upgrade read transactions.
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._in_batch = True
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            else:
+                self._conn.execute('COMMIT')
+            finally:
+                self._in_batch = False
+
+    def _count_newer(self, patient_id: str, ts: float) -> int:
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM readings WHERE patient_id = ? AND time > ?', (patient_id, ts)).fetchone()[0]
+
+    def insert(self, patient_id: str, vitals: Sequence[float], timestamp: datetime,
+               timed: bool = True) -> InsertResult:
+        ts = to_epoch_seconds(timestamp)
+        tolerance = DUPLICATE_TOLERANCE_SECONDS
+        with self.batch():
+            (newest,) = self._conn.execute(
+                'SELECT MAX(time) FROM readings WHERE patient_id = ?', (patient_id,)).fetchone()
+            position, gap = 0, None
+            if newest is not None and not timed:
+                ts = max(ts, newest + UNTIMED_STEP_SECONDS)
+                gap = ts - newest
+            elif newest is not None and ts > newest + tolerance:
+                gap = ts - newest
+            elif newest is not None:
+                # Late or repeated reading
+                same = self._conn.execute(
+                    'SELECT time FROM readings WHERE patient_id = ? AND time BETWEEN ? AND ? LIMIT 1',
+                    (patient_id, ts - tolerance, ts + tolerance),
+                ).fetchone()
+                position = self._count_newer(patient_id, same[0] if same else ts)
+                if position >= self.capacity:
+                    return InsertResult(self.length(patient_id), self.version(patient_id), None)
+                if same is not None:
+                    return InsertResult(self.length(patient_id), self.version(patient_id), position, True)
+                (previous,) = self._conn.execute(
+                    'SELECT MAX(time) FROM readings WHERE patient_id = ? AND time < ?', (patient_id, ts)).fetchone()
+                gap = ts - previous if previous is not None else None
+
+            (version,) = self._conn.execute(
+                'INSERT INTO patients (patient_id, version, last_seen) VALUES (?, 1, ?) '
+                'ON CONFLICT (patient_id) DO UPDATE SET version = version + 1, last_seen = excluded.last_seen '
+                'RETURNING version',
+                (patient_id, time.time()),
+            ).fetchone()
+            self._conn.execute(self._insert_sql, (patient_id, version, ts, *map(float, vitals)))
+            if version % self.capacity == 0:
+                self._conn.execute(
+                    'DELETE FROM readings WHERE patient_id = ? AND time < ('
+                    'SELECT time FROM readings WHERE patient_id = ? ORDER BY time DESC LIMIT 1 OFFSET ?)',
+                    (patient_id, patient_id, self.capacity - 1),
+                )
+            return InsertResult(self.length(patient_id), version, position, False, gap, ts)
+
+    def version(self, patient_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute('SELECT version FROM patients WHERE patient_id = ?', (patient_id,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def length(self, patient_id: str) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                'SELECT COUNT(*) FROM readings WHERE patient_id = ?', (patient_id,)).fetchone()
+        return min(count, self.capacity)
+
+    def tail(self, patient_id: str, n: int) -> np.ndarray:
+        return self.window(patient_id, 0, n)[0]
+
+    def window(self, patient_id: str, position: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        n = max(0, min(n, self.capacity - position))
+        with self._lock:
+            rows = self._conn.execute(self._window_sql, (patient_id, n, position)).fetchall()
+        data = np.array(rows[::-1], dtype=np.float64).reshape(-1, len(VITAL_COLUMNS) + 1)
+        return data[:, :-1], data[:, -1]
+
+    def remove(self, patient_id: str) -> bool:
+        with self.batch():
+            self._conn.execute('DELETE FROM readings WHERE patient_id = ?', (patient_id,))
+            removed = self._conn.execute('DELETE FROM patients WHERE patient_id = ?', (patient_id,)).rowcount
+        return removed > 0
+
+    def evict_idle(self, max_idle_seconds: float, limit: Optional[int] = None) -> List[str]:
+        # last_seen is the wall-clock time of the patient's last write from any worker
+        with self.batch():
+            evicted = [row[0] for row in self._conn.execute(
+                'SELECT patient_id FROM patients WHERE last_seen < ? ORDER BY last_seen LIMIT ?',
+                (time.time() - max_idle_seconds, -1 if limit is None else limit),
+            ).fetchall()]
+            for patient_id in evicted:
+                self.remove(patient_id)
+        self._evictions += len(evicted)
+        if self.on_evict is not None:
+            for patient_id in evicted:
+                self.on_evict(patient_id)
+        return evicted
+
+    def to_frame(self, patient_id: str) -> pd.DataFrame:
+        vitals, times = self.window(patient_id, 0, self.capacity)
+        df = pd.DataFrame(vitals, columns=VITAL_COLUMNS)
+        df['time'] = pd.to_datetime(times, unit='s')
+        return df
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM patients').fetchone()[0]
+
+    def __contains__(self, patient_id: str) -> bool:
+        return self.version(patient_id) > 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute('SELECT COUNT(*) FROM readings').fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "patients": len(self),
+            "capacity_rows": self.capacity,
+            "stored_rows": rows,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "evictions": {"idle": self._evictions},
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_history_backend(kind: str, capacity: int, path: Optional[str] = None,
+                           max_bytes: int = 0, spill_dir: Optional[str] = None) -> HistoryBackend:
+    """
+    Builds the backend named by HISTORY_BACKEND ("memory" or "sqlite").
+    `max_bytes` and `spill_dir` apply to the memory backend; SQLite keeps histories on disk.
+    """
+    if kind == 'memory':
+        return PatientHistoryStore(capacity=capacity, max_bytes=max_bytes, spill_dir=spill_dir)
+    if kind == 'sqlite':
+        return SQLiteHistoryStore(path or 'patient_history.db', capacity=capacity)
+    raise ValueError(f"Unknown history backend '{kind}' (expected 'memory' or 'sqlite')")
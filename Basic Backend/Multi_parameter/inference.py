@@ -0,0 +1,132 @@
+import copy
+import warnings
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS
+
+
+class CompiledPredictor:
+    """
+    Inference path built once at startup from the loaded model, scaler and feature list.
+
+    Replaces the per-request DataFrame column selection, `scaler.transform`,
+    `model.predict` and `model.predict_proba` with:
+      * a fixed index array mapping FEATURE_COLUMNS onto the model's column order,
+      * the scaler's mean/scale as precomputed arrays,
+      * a single probability computation, from which the class is derived the
+        same way sklearn's `predict` does (argmax over `classes_`).
+
+    For a RandomForest the trees are evaluated directly in estimator order,
+    skipping input validation and the joblib dispatch that dominates
+    small-batch latency. Results are bit-for-bit identical to the model run
+    with n_jobs=1; with more jobs sklearn sums the trees in thread-completion
+    order, so it can only differ from that in the last bit.
+    """
+
+    def __init__(self, model, scaler, feature_cols: Sequence[str]):
+        unknown = [col for col in feature_cols if col not in FEATURE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Model expects features the API does not compute: {unknown}")
+
+        self.model = model
+        # The sklearn path the parity check compares against: a shallow copy
+        # (sharing the fitted trees) that sums them in estimator order
+        self.reference_model = model
+        if getattr(model, 'n_jobs', None) not in (None, 1):
+            self.reference_model = copy.copy(model)
+            self.reference_model.n_jobs = 1
+        self.feature_cols: List[str] = list(feature_cols)
+        self.column_index = np.array([FEATURE_COLUMNS.index(col) for col in feature_cols], dtype=np.intp)
+        self.reorder = not np.array_equal(self.column_index, np.arange(len(FEATURE_COLUMNS)))
+
+        # StandardScaler computes (X - mean_) / scale_. We keep the same two
+        # operations rather than folding them into one multiply-add so the
+        # rounding (and therefore every tree split) is unchanged.
+        n = len(self.feature_cols)
+        mean = getattr(scaler, 'mean_', None) if getattr(scaler, 'with_mean', True) else None
+        scale = getattr(scaler, 'scale_', None) if getattr(scaler, 'with_std', True) else None
+        self.mean = np.zeros(n) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(n) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        self.classes = np.asarray(model.classes_)
+        self.trees = self._direct_trees(model)
+
+    @staticmethod
+    def _direct_trees(model):
+        """Returns the forest's trees if they can be evaluated directly, else None."""
+        trees = getattr(model, 'estimators_', None)
+        if not trees or getattr(model, 'n_outputs_', 1) != 1:
+            return None
+        if not all(hasattr(tree, 'tree_') for tree in trees):
+            return None
+        return list(trees)
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        """Reorders an (n_rows, len(FEATURE_COLUMNS)) matrix to model order and scales it."""
+        if self.reorder:
+            features = features[:, self.column_index]
+        return (features - self.mean) / self.scale
+
+    def predict_proba(self, scaled: np.ndarray) -> np.ndarray:
+        if self.trees is None:
+            return self.model.predict_proba(scaled)
+
+        # Mirrors RandomForestClassifier.predict_proba: float32 input, per-tree
+        # probabilities summed in estimator order, then divided by the tree count.
+        X = np.ascontiguousarray(scaled, dtype=np.float32)
+        proba = np.zeros((X.shape[0], len(self.classes)), dtype=np.float64)
+        for tree in self.trees:
+            proba += tree.predict_proba(X, check_input=False)
+        proba /= len(self.trees)
+        return proba
+
+    def predict(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (predicted classes, probability of class 1) for each row."""
+        return self.predict_scaled(self.transform(features))
+
+    def predict_scaled(self, scaled: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """`predict` for rows already passed through `transform`."""
+        proba = self.predict_proba(scaled)
+        prediction_class = self.classes.take(np.argmax(proba, axis=1), axis=0)
+        return prediction_class, proba[:, 1]
+
+    def reference_predict(self, features: np.ndarray, scaler) -> Tuple[np.ndarray, np.ndarray]:
+        """The original sklearn path (with n_jobs=1), kept for parity checks."""
+        with warnings.catch_warnings():
+            # The scaler was fitted on a DataFrame; plain arrays only trigger a feature-name warning.
+            warnings.simplefilter('ignore', UserWarning)
+            scaled = scaler.transform(features[:, self.column_index])
+        return self.reference_model.predict(scaled), self.reference_model.predict_proba(scaled)[:, 1]
+
+    def check_parity(self, scaler, n_rows: int = 256, seed: int = 0) -> bool:
+        """Compares the compiled path against the sklearn path on synthetic rows."""
+        rng = np.random.default_rng(seed)
+        rows = np.zeros((n_rows, len(FEATURE_COLUMNS)))
+        rows[:, self.column_index] = rng.normal(self.mean, self.scale, size=(n_rows, len(self.feature_cols)))
+
+        classes, probs = self.predict(rows)
+        ref_classes, ref_probs = self.reference_predict(rows, scaler)
+        return np.array_equal(classes, ref_classes) and np.array_equal(probs, ref_probs)
+
+
+# --- Process-pool workers (INFERENCE_EXECUTOR=process) ---
+# Each worker process gets its own copy of the model assets once, at pool start.
+_worker_assets = None
+
+
+def init_worker(model, scaler, feature_cols: Sequence[str], compiled: bool) -> None:
+    global _worker_assets
+    predictor = CompiledPredictor(model, scaler, feature_cols) if compiled else None
+    _worker_assets = (predictor, model, scaler, list(feature_cols))
+
+
+def predict_in_worker(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (predicted classes, probability of class 1), like the API's in-process path."""
+    predictor, model, scaler, feature_cols = _worker_assets
+    if predictor is not None:
+        return predictor.predict(features)
+    scaled = scaler.transform(pd.DataFrame(features, columns=FEATURE_COLUMNS)[feature_cols])
+    return model.predict(scaled), model.predict_proba(scaled)[:, 1]
@@ -1,15 +1,72 @@
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 import joblib
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Tuple
+
+# Basic Backend/ holds the helpers shared by the services (shared/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from features import FEATURE_COLUMNS, ROLLING_WINDOW, VITAL_COLUMNS, IncrementalFeatureState
+from execution import InferenceExecutor, Job, Overloaded
+from history_store import HistoryBackend, InsertResult, create_history_backend
+from inference import CompiledPredictor, init_worker, predict_in_worker
+from shared.metrics import CONTENT_TYPE, ASGIMetricsMiddleware, MetricsRegistry
 
 # --- Constants ---
 MIN_HISTORY_SIZE = 5  # Min rows needed to start predicting (from our 5-min window)
 MAX_HISTORY_SIZE = 100 # Max rows to keep in memory per patient
+MAX_BATCH_ROWS = 10000 # Max readings accepted by /predict/batch in one request
+STREAM_QUEUE_SIZE = 256 # Unprocessed messages buffered per WebSocket before we stop reading it
+STREAM_MAX_COALESCE = 64 # Max queued messages scored together in one predict pass
+INGEST_CHUNK_ROWS = 512 # Batch readings ingested between yields to the event loop
+
+# A reading more than MAX_GAP_SECONDS (event time) after the previous one starts a
+# new segment: rolling features restart and MIN_HISTORY_SIZE rows are gathered again.
+MAX_GAP_SECONDS = float(os.environ.get('MAX_GAP_SECONDS', 300))
+# Readings a feature vector (and the gathering check) can depend on
+FEATURE_LOOKBACK = max(ROLLING_WINDOW, MIN_HISTORY_SIZE)
+
+# Where patient histories are kept: "memory" (per process) or "sqlite" (shared
+# by every worker on the host and kept across restarts).
+HISTORY_BACKEND = os.environ.get('HISTORY_BACKEND', 'memory')
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', 'patient_history.db')
+
+# Idle-patient eviction: a background task drops (or, with HISTORY_SPILL_DIR, spills
+# to disk) histories with no reading for PATIENT_IDLE_TTL_SECONDS (0 disables).
+# HISTORY_MAX_BYTES caps the memory backend's total; the least recently written
+# patient is evicted first (0 = no cap).
+PATIENT_IDLE_TTL_SECONDS = float(os.environ.get('PATIENT_IDLE_TTL_SECONDS', 3600))
+EVICTION_INTERVAL_SECONDS = float(os.environ.get('EVICTION_INTERVAL_SECONDS', 60))
+EVICTION_BATCH_SIZE = 1000 # Max patients evicted per step before yielding to requests
+HISTORY_MAX_BYTES = int(os.environ.get('HISTORY_MAX_BYTES', 256 * 1024 * 1024))
+HISTORY_SPILL_DIR = os.environ.get('HISTORY_SPILL_DIR')
+
+# Scaling + model run in a pool so the event loop keeps serving other requests:
+# INFERENCE_EXECUTOR is "thread" or "process" (INFERENCE_WORKERS=0 runs inline).
+# Requests beyond INFERENCE_MAX_PENDING get a 503, a patient with more than
+# PATIENT_MAX_PENDING in flight gets a 429, and a request that waits longer
+# than INFERENCE_QUEUE_TIMEOUT_MS for a worker is shed with a 503.
+INFERENCE_EXECUTOR = os.environ.get('INFERENCE_EXECUTOR', 'thread')
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', min(4, os.cpu_count() or 1)))
+INFERENCE_MAX_PENDING = int(os.environ.get('INFERENCE_MAX_PENDING', 16 * max(1, INFERENCE_WORKERS)))
+PATIENT_MAX_PENDING = int(os.environ.get('PATIENT_MAX_PENDING', 8))
+INFERENCE_QUEUE_TIMEOUT_MS = float(os.environ.get('INFERENCE_QUEUE_TIMEOUT_MS', 1000))
 
 # --- Pydantic Models (API Data Contracts) ---
 
@@ -33,6 +90,10 @@ class VitalsInput(BaseModel):
     st_v_mm: float = Field(..., alias='ST-V [mm]')
     spo2_percent: float = Field(..., alias='SpO2 [%]')
     btbhr_bpm: float = Field(..., alias='btbHR [bpm]')
+    # When the monitor took the reading. Late readings are slotted into the history
+    # by this time and repeats of it are dropped as duplicates. Readings without it
+    # are appended as the newest, stamped with their arrival time.
+    timestamp: Optional[datetime] = Field(None, alias='time')
 
     class Config:
         # This allows you to send JSON with the 'dirty' names too
@@ -46,26 +107,94 @@ class PredictionResponse(BaseModel):
     predicted_class: int
     status_message: str
 
-# --- In-Memory Patient History ---
-# In a production system, you would replace this with a database (like Redis or InfluxDB).
-# This dict will store: {'patient_001': DataFrame, 'patient_002': DataFrame}
-patient_histories: Dict[str, pd.DataFrame] = {}
-
-# --- Feature Engineering Function ---
-# This MUST be identical to the function used in training.
-def create_timeseries_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Engineers time-series features for a single patient's DataFrame."""
-    # Ensure dataframe is sorted by time
-    df = df.sort_values(by='time')
-    
-    vitals = ['HR [bpm]', 'SpO2 [%]', 'NBPs [mmHg]', 'RR [rpm]']
-    
-    for col in vitals:
-        df[f'{col}_lag_1'] = df[col].shift(1)
-        df[f'{col}_roll_avg_5'] = df[col].rolling(window=5, min_periods=1).mean()
-        df[f'{col}_roll_std_5'] = df[col].rolling(window=5, min_periods=1).std()
-        
-    return df
+# Readings for one patient inside a batch request, oldest first.
+class PatientReadings(BaseModel):
+    patient_id: str
+    readings: List[VitalsInput] = Field(..., min_length=1)
+
+class BatchPredictionRequest(BaseModel):
+    patients: List[PatientReadings] = Field(..., min_length=1)
+
+# One response per submitted reading, in request order.
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+
+# --- Patient History ---
+# The default in-memory backend gives each patient a preallocated float64 ring of
+# MAX_HISTORY_SIZE readings. Set HISTORY_BACKEND=sqlite to share histories across
+# uvicorn workers and keep them over restarts (see history_store.py).
+patient_histories: HistoryBackend = create_history_backend(
+    HISTORY_BACKEND, MAX_HISTORY_SIZE, HISTORY_DB_PATH, max_bytes=HISTORY_MAX_BYTES, spill_dir=HISTORY_SPILL_DIR)
+
+
+class PatientFeatures:
+    """
+    This process's rolling-feature state for one patient, updated in O(1) per
+    row (see features.py). `version` is the history version the state has seen:
+    a gap means another worker wrote to this patient, so the state is rebuilt
+    from the history.
+    """
+
+    __slots__ = ('state', 'version', 'segment_rows', 'last_used')
+
+    def __init__(self):
+        self.state = IncrementalFeatureState()
+        self.version = 0
+        self.segment_rows = 0   # readings since the patient's last gap, capped at FEATURE_LOOKBACK
+        self.last_used = 0.0    # time.monotonic() of the last reading this process handled
+
+
+# Least recently used first; idle entries are dropped by the eviction task
+feature_states: "OrderedDict[str, PatientFeatures]" = OrderedDict()
+patient_histories.on_evict = lambda patient_id: feature_states.pop(patient_id, None)
+
+eviction_stats: Dict[str, Any] = {"sweeps": 0, "feature_states_evicted": 0, "last_sweep_ms": 0.0}
+
+# SQLite calls block (fsync, and up to busy_timeout waiting on another worker's
+# write lock), so with that backend every history read/write, together with the
+# feature-state updates that go with it, runs on one dedicated thread instead of
+# the event loop. The memory backend stays inline: its calls take microseconds.
+history_io = ThreadPoolExecutor(1, thread_name_prefix='history-io') if patient_histories.blocking_io else None
+
+
+async def run_history_io(fn, *args):
+    """Calls `fn(*args)` on the history thread (or inline for a non-blocking backend)."""
+    if history_io is None:
+        return fn(*args)
+    # Copy the context so per-request tracing sees the stages timed on the history thread
+    return await asyncio.get_running_loop().run_in_executor(history_io, contextvars.copy_context().run, fn, *args)
+
+# --- Metrics ---
+# Request/stage latency histograms and in-memory gauges, served at GET /metrics.
+# Send "X-Trace: 1" (or set METRICS_TRACE_HEADERS=1) to get per-stage
+# Server-Timing and X-Request-ID headers back on a response.
+metrics = MetricsRegistry('multi_parameter')
+
+
+def history_bytes() -> int:
+    stats = patient_histories.stats()
+    return stats.get('total_bytes', stats.get('file_bytes'))
+
+
+metrics.callback('patients_tracked', 'Patients with a history.', lambda: len(patient_histories))
+metrics.callback('history_bytes', 'Bytes held in patient_histories (memory backend) or its database file (sqlite).',
+                 history_bytes)
+metrics.callback('feature_states', 'Rolling-feature states held in this process.', lambda: len(feature_states))
+metrics.callback('model_loaded', '1 once the model assets are loaded.', lambda: int(hasattr(app.state, 'model')))
+metrics.callback('compiled_inference', '1 when the compiled inference path is in use.',
+                 lambda: int(getattr(app.state, 'predictor', None) is not None))
+metrics.callback('inference_pending', 'Admitted requests not yet finished.',
+                 lambda: executor_stat('pending'))
+metrics.callback('inference_running', 'Calls running in the inference pool.',
+                 lambda: executor_stat('running'))
+metrics.callback('inference_rejected_total', 'Requests refused by admission control, by reason.',
+                 lambda: [((reason,), count) for reason, count in executor_stat('rejected', {}).items()],
+                 kind='counter', labelnames=('reason',))
+metrics.callback('history_evictions_total', 'Patient histories evicted, by reason.',
+                 lambda: [((reason,), count) for reason, count in patient_histories.stats()['evictions'].items()],
+                 kind='counter', labelnames=('reason',))
+metrics.callback('eviction_sweep_seconds', 'Duration of the last idle-eviction sweep.',
+                 lambda: eviction_stats['last_sweep_ms'] / 1000.0)
 
 # --- FastAPI Application ---
 app = FastAPI(
@@ -81,7 +210,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
+app.add_middleware(ASGIMetricsMiddleware, registry=metrics)  # outermost, so CORS time is included
 
 # --- Startup Event: Load Models ---
 @app.on_event("startup")
@@ -93,6 +224,14 @@ def load_model_assets():
         app.state.scaler = joblib.load('ts_prediction_scaler.joblib')
         app.state.feature_cols = joblib.load('ts_feature_columns.joblib')
         print("✅ Model, scaler, and feature list loaded successfully.")
+
+        # Build the compiled inference path once; fall back to sklearn if it disagrees.
+        predictor = CompiledPredictor(app.state.model, app.state.scaler, app.state.feature_cols)
+        if predictor.check_parity(app.state.scaler):
+            app.state.predictor = predictor
+            print("✅ Compiled inference path ready.")
+        else:
+            print("⚠️ Compiled inference path does not match sklearn; using the sklearn path.")
     except FileNotFoundError:
         print("❌ CRITICAL ERROR: Could not find one or more .joblib files.")
         print("   Make sure 'ts_prediction_model.joblib', 'ts_prediction_scaler.joblib',")
@@ -103,90 +242,490 @@ def load_model_assets():
         print(f"❌ CRITICAL ERROR: An error occurred during model loading: {e}")
         # exit(1)
 
+    print(f"--- History backend: {patient_histories.stats()['backend']} ---")
+
+
+# --- Startup Event: Inference Pool ---
+@app.on_event("startup")
+def start_inference_pool():
+    """Starts the pool that runs scaling + model calls (after the assets are loaded)."""
+    if not hasattr(app.state, 'model'):
+        return
+    initargs = (app.state.model, app.state.scaler, app.state.feature_cols,
+                getattr(app.state, 'predictor', None) is not None)
+    app.state.executor = InferenceExecutor(
+        INFERENCE_EXECUTOR, INFERENCE_WORKERS,
+        max_pending=INFERENCE_MAX_PENDING, max_pending_per_key=PATIENT_MAX_PENDING,
+        queue_timeout=INFERENCE_QUEUE_TIMEOUT_MS / 1000.0,
+        initializer=init_worker, initargs=initargs)
+    print(f"--- Inference pool: {app.state.executor.kind} x{app.state.executor.workers} ---")
+
+
+def executor_stat(name: str, default=0):
+    executor = getattr(app.state, 'executor', None)
+    return executor.stats()[name] if executor is not None else default
+
+
+# --- Background Eviction ---
+def evict_feature_states(max_idle_seconds: float, limit: int) -> int:
+    """Drops this process's feature states unused for `max_idle_seconds` (they rebuild from the history)."""
+    cutoff = time.monotonic() - max_idle_seconds
+    evicted = 0
+    while feature_states and evicted < limit:
+        patient_id, track = next(iter(feature_states.items()))
+        if track.last_used > cutoff:
+            break
+        del feature_states[patient_id]
+        evicted += 1
+    return evicted
+
+
+async def eviction_loop():
+    """
+    Every EVICTION_INTERVAL_SECONDS, evicts idle patients in steps of
+    EVICTION_BATCH_SIZE, yielding to the event loop between steps.
+    """
+    while True:
+        await asyncio.sleep(EVICTION_INTERVAL_SECONDS)
+        started = time.perf_counter()
+        try:
+            while len(await run_history_io(patient_histories.evict_idle, PATIENT_IDLE_TTL_SECONDS,
+                                           EVICTION_BATCH_SIZE)) == EVICTION_BATCH_SIZE:
+                await asyncio.sleep(0)
+            while True:
+                evicted = await run_history_io(evict_feature_states, PATIENT_IDLE_TTL_SECONDS, EVICTION_BATCH_SIZE)
+                eviction_stats["feature_states_evicted"] += evicted
+                if evicted < EVICTION_BATCH_SIZE:
+                    break
+                await asyncio.sleep(0)
+        except Exception as e:
+            print(f"⚠️ Idle-patient eviction failed: {e}")
+        eviction_stats["sweeps"] += 1
+        eviction_stats["last_sweep_ms"] = (time.perf_counter() - started) * 1000.0
+
+
+@app.on_event("startup")
+async def start_eviction_task():
+    if PATIENT_IDLE_TTL_SECONDS > 0:
+        app.state.eviction_task = asyncio.create_task(eviction_loop())
+
+
+# --- Shutdown Event: Flush History ---
+@app.on_event("shutdown")
+async def close_history_backend():
+    task = getattr(app.state, 'eviction_task', None)
+    if task is not None:
+        task.cancel()
+    executor = getattr(app.state, 'executor', None)
+    if executor is not None:
+        executor.close()
+    if history_io is not None:
+        history_io.shutdown(wait=True)  # let in-flight writes commit before closing the store
+    patient_histories.close()
+
+
+# --- Shared Ingest / Inference Helpers ---
+class Ingested(NamedTuple):
+    """What `ingest_reading` did with one reading."""
+    timestamp: datetime              # event time of the reading
+    ready_rows: int                  # readings since the last gap, this one included (capped)
+    features: Optional[np.ndarray]   # None if the reading was rejected
+    note: str = ''                   # '', 'late', 'duplicate' or 'rejected'
+
+
+def replay_segment(rows: np.ndarray, times: np.ndarray) -> Tuple[int, IncrementalFeatureState, Optional[np.ndarray]]:
+    """
+    Replays the readings after the last gap longer than MAX_GAP_SECONDS.
+    Returns (readings replayed, the state after the last one, its features).
+    """
+    gaps = np.flatnonzero(np.diff(times) > MAX_GAP_SECONDS)
+    start = int(gaps[-1]) + 1 if len(gaps) else 0
+    state = IncrementalFeatureState()
+    features = None
+    for row in rows[start:]:
+        features = state.update(row)
+    return len(rows) - start, state, features
+
+
+def ingest_reading(patient_id: str, vitals: VitalsInput, arrival_time: datetime) -> Ingested:
+    """
+    Stores one reading at its event time and returns its feature vector.
+
+    In-order readings update the patient's rolling-feature state in O(1). A late
+    or repeated reading only recomputes the affected suffix: its own features
+    from the FEATURE_LOOKBACK readings before it, and the patient's state when
+    it lands within FEATURE_LOOKBACK of the newest reading.
+    """
+    # Convert Pydantic model to a dict with original column names
+    # .dict(by_alias=True) uses the 'alias' fields we defined
+    with metrics.stage('history'):
+        new_data_dict = vitals.dict(by_alias=True)
+        vitals_row = [new_data_dict[col] for col in VITAL_COLUMNS]
+        timed = vitals.timestamp is not None
+        timestamp = vitals.timestamp if timed else arrival_time
+
+        # Slot into the patient's history (rows past MAX_HISTORY_SIZE are dropped)
+        result: InsertResult = patient_histories.insert(patient_id, vitals_row, timestamp, timed)
+        if not timed:
+            # Untimed readings in one request share an arrival time; report where each was stored
+            timestamp = datetime.utcfromtimestamp(result.time)
+    if result.position is None:
+        return Ingested(timestamp, 0, None, 'rejected')
+
+    with metrics.stage('features'):
+        track = feature_states.get(patient_id)
+        inserted = not result.duplicate
+        # A version gap means another worker wrote to this patient in between
+        stale = track is None or track.version != result.version - int(inserted)
+        if track is None:
+            track = feature_states[patient_id] = PatientFeatures()
+        else:
+            feature_states.move_to_end(patient_id)
+        track.last_used = time.monotonic()
+
+        if inserted and result.position == 0 and not stale:
+            # In order: the common case
+            if result.gap_seconds is not None and result.gap_seconds > MAX_GAP_SECONDS:
+                track.state = IncrementalFeatureState()
+                track.segment_rows = 0
+            track.segment_rows = min(track.segment_rows + 1, FEATURE_LOOKBACK)
+            track.version = result.version
+            return Ingested(timestamp, track.segment_rows, track.state.update(vitals_row))
+
+        # Late, duplicate or stale: features of this reading from the readings before it
+        rows, times = patient_histories.window(patient_id, result.position, FEATURE_LOOKBACK)
+        ready_rows, reading_state, features = replay_segment(rows, times)
+
+        # The patient's state only changes if the reading lands in the newest FEATURE_LOOKBACK
+        if result.position == 0:
+            track.segment_rows, track.state = ready_rows, reading_state
+        elif stale or (inserted and result.position < FEATURE_LOOKBACK):
+            track.segment_rows, track.state, _ = replay_segment(
+                *patient_histories.window(patient_id, 0, FEATURE_LOOKBACK))
+        track.version = result.version
+
+    note = 'duplicate' if result.duplicate else ('late' if result.position > 0 else '')
+    return Ingested(timestamp, ready_rows, features, note)
+
+
+STATUS_NOTES = {
+    '': "",
+    'late': " (late reading placed by its timestamp)",
+    'duplicate': " (duplicate of an already recorded reading; dropped)",
+}
+
+
+def gathering_response(patient_id: str, ingested: Ingested) -> PredictionResponse:
+    if ingested.note == 'rejected':
+        message = "Reading is older than the retained history; dropped"
+    else:
+        message = f"Gathering initial data ({ingested.ready_rows}/{MIN_HISTORY_SIZE} rows)" + STATUS_NOTES[ingested.note]
+    return PredictionResponse(
+        patient_id=patient_id,
+        timestamp=ingested.timestamp,
+        risk_probability=0.0,
+        predicted_class=0,
+        status_message=message
+    )
+
+
+def prediction_response(patient_id: str, ingested: Ingested, prediction_class, risk_prob) -> PredictionResponse:
+    return PredictionResponse(
+        patient_id=patient_id,
+        timestamp=ingested.timestamp,
+        risk_probability=float(risk_prob),
+        predicted_class=int(prediction_class),
+        status_message="Prediction complete" + STATUS_NOTES[ingested.note]
+    )
+
+
+def predict_features(features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scales an (n_rows, len(FEATURE_COLUMNS)) matrix and runs the model on all rows at once.
+    Returns (predicted classes, probability of class 1).
+    """
+    predictor = getattr(app.state, 'predictor', None)
+    if predictor is not None:
+        with metrics.stage('scaling'):
+            scaled = predictor.transform(features)
+        with metrics.stage('model'):
+            return predictor.predict_scaled(scaled)
+
+    # Fallback: the plain sklearn path
+    with metrics.stage('scaling'):
+        # Ensure columns are in the *exact* order
+        final_data = pd.DataFrame(features, columns=FEATURE_COLUMNS)[app.state.feature_cols]
+
+        # Scale the data
+        final_data_scaled = app.state.scaler.transform(final_data)
+
+    # Make predictions
+    with metrics.stage('model'):
+        prediction_class = app.state.model.predict(final_data_scaled)
+        prediction_proba = app.state.model.predict_proba(final_data_scaled)
+
+    return prediction_class, prediction_proba[:, 1]  # Probability of Class 1 (Positive)
+
+
+async def run_predict(job: Job, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """`predict_features` in the inference pool, recording the time spent waiting for a worker."""
+    if job.executor.kind == 'process':
+        started = time.perf_counter()
+        result = await job.run(predict_in_worker, features)
+        metrics.record('model', time.perf_counter() - started - job.queued_seconds)  # scaling + model in the worker
+    else:
+        result = await job.run(predict_features, features)
+    metrics.record('queue', job.queued_seconds)
+    return result
+
+
+def ingest_chunk(readings: Sequence[Tuple[str, VitalsInput]], arrival_time: datetime) -> List[Ingested]:
+    """`ingest_reading` for each (patient_id, vitals), in one history write batch."""
+    with patient_histories.batch():
+        return [ingest_reading(patient_id, vitals, arrival_time) for patient_id, vitals in readings]
+
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+async def score_readings(job: Job, readings: Sequence[Tuple[str, VitalsInput]],
+                         arrival_time: datetime) -> List[PredictionResponse]:
+    """
+    Applies (patient_id, vitals) readings to their histories in order, then scores
+    every reading that has enough history in one vectorized pass in the inference pool.
+    Readings without a timestamp are appended as the newest, stamped from `arrival_time`.
+    Returns one response per reading, in the same order.
+    """
+    # 1. Update every history; remember which responses still need a prediction.
+    # Large batches yield to the event loop every INGEST_CHUNK_ROWS readings.
+    predictions: List[Optional[PredictionResponse]] = []
+    pending: List[Tuple[int, str, Ingested]] = []
+    feature_rows: List[np.ndarray] = []
+
+    for chunk_start in range(0, len(readings), INGEST_CHUNK_ROWS):
+        if chunk_start:
+            await asyncio.sleep(0)
+        chunk = readings[chunk_start:chunk_start + INGEST_CHUNK_ROWS]
+        for (patient_id, _), ingested in zip(chunk, await run_history_io(ingest_chunk, chunk, arrival_time)):
+            if ingested.features is None or ingested.ready_rows < MIN_HISTORY_SIZE:
+                predictions.append(gathering_response(patient_id, ingested))
+            else:
+                pending.append((len(predictions), patient_id, ingested))
+                feature_rows.append(ingested.features)
+                predictions.append(None)
+
+    # 2. One scale + predict pass over every ready row
+    if feature_rows:
+        classes, risk_probs = await run_predict(job, np.vstack(feature_rows))
+        for (slot, patient_id, ingested), prediction_class, risk_prob in zip(pending, classes, risk_probs):
+            predictions[slot] = prediction_response(patient_id, ingested, prediction_class, risk_prob)
+
+    return predictions
+
+
+# --- API Endpoint: /predict/batch ---
+# Registered before /predict/{patient_id} so "batch" is not taken as a patient ID.
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(batch: BatchPredictionRequest):
+    """
+    Accepts readings for many patients (several rows each) in one request.
+    Every history is updated in order, then all rows that have enough history
+    are scaled and scored in a single vectorized pass.
+    """
+    metrics.record_elapsed('validation')  # body parsing + pydantic validation ran before the handler
+    if not hasattr(app.state, 'model'):
+        raise HTTPException(status_code=500, detail="Model assets not loaded. Check server logs.")
+
+    total_rows = sum(len(patient.readings) for patient in batch.patients)
+    if total_rows > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large ({total_rows} rows, max {MAX_BATCH_ROWS}).")
+
+    current_time = datetime.utcnow()
+    readings = [(patient.patient_id, vitals) for patient in batch.patients for vitals in patient.readings]
+
+    # Admit before touching any history, so a refused batch can simply be retried
+    try:
+        job = app.state.executor.admit()
+    except Overloaded as e:
+        metrics.record_error(e)
+        raise overloaded_error(e)
+
+    with job:
+        try:
+            predictions = await score_readings(job, readings, current_time)
+        except Overloaded as e:
+            metrics.record_error(e)
+            raise overloaded_error(e)
+        except Exception as e:
+            metrics.record_error(e)
+            raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+
+    return BatchPredictionResponse(predictions=predictions)
+
 
 # --- API Endpoint: /predict/{patient_id} ---
 @app.post("/predict/{patient_id}", response_model=PredictionResponse)
 async def predict_risk(patient_id: str, vitals: VitalsInput):
     """
     Accepts new vital signs for a patient, updates their history,
-    and returns the latest risk prediction.
+    and returns the risk prediction for that reading. Send the monitor's
+    'time' with the reading so late deliveries are placed correctly.
+
+    Returns 503 when the server is at capacity and 429 when this patient
+    already has PATIENT_MAX_PENDING readings in flight (with Retry-After).
     """
+    metrics.record_elapsed('validation')  # body parsing + pydantic validation ran before the handler
     if not hasattr(app.state, 'model'):
         raise HTTPException(status_code=500, detail="Model assets not loaded. Check server logs.")
 
-    current_time = datetime.utcnow()
-    
-    # 1. Convert Pydantic model to a dict with original column names
-    # .dict(by_alias=True) uses the 'alias' fields we defined
-    new_data_dict = vitals.dict(by_alias=True)
-    new_data_dict['time'] = current_time
-    new_row_df = pd.DataFrame([new_data_dict])
-
-    # 2. Get or create patient history
-    if patient_id not in patient_histories:
-        patient_histories[patient_id] = pd.DataFrame()
-    
-    history_df = patient_histories[patient_id]
-    
-    # 3. Append new data and prune history
-    history_df = pd.concat([history_df, new_row_df], ignore_index=True)
-    # Keep only the last MAX_HISTORY_SIZE rows
-    if len(history_df) > MAX_HISTORY_SIZE:
-        history_df = history_df.iloc[-MAX_HISTORY_SIZE:]
-    
-    # Update the history in our "database"
-    patient_histories[patient_id] = history_df
-    
-    # 4. Check if we have enough data to predict
-    if len(history_df) < MIN_HISTORY_SIZE:
-        return PredictionResponse(
-            patient_id=patient_id,
-            timestamp=current_time,
-            risk_probability=0.0,
-            predicted_class=0,
-            status_message=f"Gathering initial data ({len(history_df)}/{MIN_HISTORY_SIZE} rows)"
-        )
-
-    # 5. Perform Prediction
+    # Admit before touching the history, so a refused reading can simply be retried
     try:
-        # Create features on a copy of the history
-        engineered_df = create_timeseries_features(history_df.copy())
-        
-        # Get the *last row* (which has all features)
-        prediction_row = engineered_df.iloc[[-1]]
-        
-        # Fill any NaNs (from std dev on first few rows)
-        prediction_row = prediction_row.fillna(0)
-        
-        # Ensure columns are in the *exact* order
-        final_data = prediction_row[app.state.feature_cols]
-        
-        # Scale the data
-        final_data_scaled = app.state.scaler.transform(final_data)
-        
-        # Make predictions
-        prediction_class = app.state.model.predict(final_data_scaled)[0]
-        prediction_proba = app.state.model.predict_proba(final_data_scaled)[0]
-        
-        risk_prob = prediction_proba[1] # Probability of Class 1 (Positive)
-        
-        return PredictionResponse(
-            patient_id=patient_id,
-            timestamp=current_time,
-            risk_probability=float(risk_prob),
-            predicted_class=int(prediction_class),
-            status_message="Prediction complete"
-        )
-        
-    except Exception as e:
-        # This catches errors during feature engineering or prediction
-        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+        job = app.state.executor.admit(patient_id)
+    except Overloaded as e:
+        metrics.record_error(e)
+        raise overloaded_error(e)
+
+    with job:
+        # 1. Update the patient's history and rolling features
+        ingested = await run_history_io(ingest_reading, patient_id, vitals, datetime.utcnow())
+
+        # 2. Check if we have enough data to predict
+        if ingested.features is None or ingested.ready_rows < MIN_HISTORY_SIZE:
+            return gathering_response(patient_id, ingested)
+
+        # 3. Perform Prediction in the inference pool
+        try:
+            # The incremental state already holds the reading's features
+            # (NaNs from lag/std on the first rows are filled with 0)
+            prediction_class, risk_prob = await run_predict(job, ingested.features[np.newaxis, :])
+
+            return prediction_response(patient_id, ingested, prediction_class[0], risk_prob[0])
+
+        except Overloaded as e:
+            # Timed out waiting for a worker; the reading is stored, so a retry is a duplicate
+            metrics.record_error(e)
+            raise overloaded_error(e)
+        except Exception as e:
+            # This catches errors during feature engineering or prediction
+            metrics.record_error(e)
+            raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+
+# --- Streaming Endpoint: /ws/predict/{patient_id} ---
+def parse_stream_message(text: str) -> List[VitalsInput]:
+    """A stream message is one vitals object (same fields as /predict) or a list of them."""
+    payload = json.loads(text)
+    items = payload if isinstance(payload, list) else [payload]
+    return [VitalsInput(**item) for item in items]
+
+
+@app.websocket("/ws/predict/{patient_id}")
+async def stream_predictions(websocket: WebSocket, patient_id: str):
+    """
+    Persistent ingest channel for a bedside monitor.
+
+    The monitor keeps one connection open and sends readings as JSON text
+    messages; every reading gets a PredictionResponse JSON back on the same
+    socket, in order. Messages wait in a bounded queue: once it is full the
+    server stops reading the socket, so TCP flow control pushes back on the
+    monitor instead of memory growing. Messages that queue up while a batch is
+    being scored are coalesced into the next predict pass. If the server is
+    overloaded the batch gets {"error", "retry_after"} back instead.
+    """
+    await websocket.accept()
+    if not hasattr(app.state, 'model'):
+        await websocket.close(code=1011, reason="Model assets not loaded. Check server logs.")
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    async def receive_loop():
+        try:
+            while True:
+                await queue.put(await websocket.receive_text())
+        except Exception:
+            # WebSocketDisconnect, or the socket was already closed
+            pass
+        await queue.put(None)  # tells the scoring loop the monitor hung up
+
+    receiver = asyncio.create_task(receive_loop())
+    try:
+        closed = False
+        while not closed:
+            # 1. Wait for one message, then take whatever else is already queued
+            messages = [await queue.get()]
+            while len(messages) < STREAM_MAX_COALESCE and not queue.empty():
+                messages.append(queue.get_nowait())
+            if None in messages:
+                closed = True
+                messages = messages[:messages.index(None)]
+            if not messages:
+                continue
+
+            # Each coalesced batch is traced like one request
+            trace = metrics.start_trace('/ws/predict/{patient_id}')
+            status = 200
+            try:
+                # 2. Validate; bad messages get an error reply but keep the channel open
+                readings: List[Tuple[str, VitalsInput]] = []
+                for text in messages:
+                    try:
+                        with metrics.stage('validation'):
+                            readings.extend((patient_id, vitals) for vitals in parse_stream_message(text))
+                    except (ValueError, TypeError) as e:
+                        metrics.record_error(e)
+                        await websocket.send_json({"error": f"Invalid reading: {str(e)}"})
+                if not readings:
+                    status = 422
+                    continue
+
+                # 3. Update the history and score everything in one pass
+                try:
+                    with app.state.executor.admit(patient_id) as job:
+                        predictions = await score_readings(job, readings, datetime.utcnow())
+                except Overloaded as e:
+                    metrics.record_error(e)
+                    status = e.status_code
+                    await websocket.send_json({"error": e.detail, "retry_after": e.retry_after})
+                    continue
+                except Exception as e:
+                    metrics.record_error(e)
+                    status = 500
+                    await websocket.send_json({"error": f"Error during prediction: {str(e)}"})
+                    continue
+            finally:
+                metrics.finish_trace(trace, 'WS', status)
+
+            for prediction in predictions:
+                await websocket.send_json(jsonable_encoder(prediction))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
 
 # --- Root Endpoint (for health check) ---
 @app.get("/")
 def read_root():
     return {"status": "Cardiac Arrest Prediction API is running"}
 
+# --- Prometheus Metrics Endpoint ---
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+# --- Inference Pool Stats Endpoint ---
+@app.get("/inference/stats")
+def inference_stats():
+    """Reports the inference pool's load, queue wait and admission-control rejections."""
+    executor = getattr(app.state, 'executor', None)
+    return executor.stats() if executor is not None else {"kind": None}
+
+# --- History Stats Endpoint ---
+@app.get("/history/stats")
+def history_stats():
+    """Reports how many patients are tracked, the memory their histories hold and eviction counts."""
+    return dict(patient_histories.stats(), feature_states=len(feature_states), eviction=eviction_stats)
+
 # --- OPTIONS endpoint for CORS preflight ---
 @app.options("/predict/{patient_id}")
 async def options_predict(patient_id: str):
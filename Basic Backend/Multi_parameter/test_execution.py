@@ -0,0 +1,36 @@
+import asyncio
+import time
+
+import pytest
+
+from execution import InferenceExecutor, Overloaded
+
+
+def test_shed_job_keeps_same_key_jobs_in_order():
+    """A job that times out behind a slow one must not let the next job overlap the slow one."""
+    spans = {}
+
+    def work(name, seconds):
+        started = time.perf_counter()
+        time.sleep(seconds)
+        spans[name] = (started, time.perf_counter())
+        return name
+
+    async def scenario():
+        executor = InferenceExecutor('thread', workers=3, queue_timeout=0.05)
+        first = asyncio.ensure_future(executor.admit('p').run(work, 'first', 0.3))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as shed:
+            await executor.admit('p').run(work, 'second', 0.0)
+        assert shed.value.status_code == 503
+
+        # Admitted while the first job is still running; it waits its turn instead of being shed
+        executor.queue_timeout = 1.0
+        third = await executor.admit('p').run(work, 'third', 0.0)
+        assert await first == 'first' and third == 'third'
+        assert executor.stats()['rejected'] == {'queue_timeout': 1}
+        executor.close()
+
+    asyncio.run(scenario())
+    assert 'second' not in spans
+    assert spans['third'][0] >= spans['first'][1]
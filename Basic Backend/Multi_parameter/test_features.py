@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, VITAL_COLUMNS, IncrementalFeatureState, create_timeseries_features
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'patient_timeseries_dataset.csv')
+
+
+def test_incremental_features_match_pandas():
+    """Every row of every patient must match the pandas reference implementation."""
+    df = pd.read_csv(CSV_FILE, parse_dates=['time'])
+
+    for patient_id, patient_df in df.groupby('Patient_ID', sort=False):
+        expected = create_timeseries_features(patient_df.copy()).fillna(0)
+
+        state = IncrementalFeatureState()
+        actual = np.vstack([state.update(row) for row in expected[VITAL_COLUMNS].to_numpy(dtype=np.float64)])
+
+        np.testing.assert_allclose(
+            actual,
+            expected[FEATURE_COLUMNS].to_numpy(dtype=np.float64),
+            rtol=1e-9,
+            atol=1e-9,
+            err_msg=f"Feature mismatch for {patient_id}",
+        )
+
+
+def test_incremental_features_survive_resync():
+    """Long streams (past the running-sum resync point) must not drift."""
+    rng = np.random.default_rng(42)
+    rows = rng.normal(loc=80.0, scale=15.0, size=(3000, len(VITAL_COLUMNS)))
+    df = pd.DataFrame(rows, columns=VITAL_COLUMNS)
+    df['time'] = pd.date_range('2025-01-01', periods=len(df), freq='s')
+
+    expected = create_timeseries_features(df.copy()).fillna(0)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    state = IncrementalFeatureState()
+    actual = np.vstack([state.update(row) for row in rows])
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+if __name__ == '__main__':
+    test_incremental_features_match_pandas()
+    test_incremental_features_survive_resync()
+    print("✅ Incremental features match create_timeseries_features.")
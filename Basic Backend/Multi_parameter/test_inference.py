@@ -0,0 +1,40 @@
+import os
+
+import joblib
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from inference import CompiledPredictor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_assets():
+    return tuple(joblib.load(os.path.join(HERE, name)) for name in
+                 ('ts_prediction_model.joblib', 'ts_prediction_scaler.joblib', 'ts_feature_columns.joblib'))
+
+
+def test_shipped_model_takes_the_direct_path():
+    """The shipped forest (n_jobs=-1) must be evaluated tree by tree, not handed back to sklearn."""
+    model, scaler, feature_cols = load_assets()
+    n_jobs = model.n_jobs
+    predictor = CompiledPredictor(model, scaler, feature_cols)
+
+    assert predictor.trees is not None
+    assert predictor.check_parity(scaler)
+    assert model.n_jobs == n_jobs  # only the reference copy runs with n_jobs=1
+
+
+def test_direct_path_matches_the_shipped_model():
+    """Bit-identical to n_jobs=1, and within summation-order rounding of the model as configured."""
+    model, scaler, feature_cols = load_assets()
+    predictor = CompiledPredictor(model, scaler, feature_cols)
+    rows = np.random.default_rng(1).normal(size=(64, len(FEATURE_COLUMNS)))
+
+    classes, probs = predictor.predict(rows)
+    ref_classes, ref_probs = predictor.reference_predict(rows, scaler)
+    np.testing.assert_array_equal(classes, ref_classes)
+    np.testing.assert_array_equal(probs, ref_probs)
+
+    scaled = predictor.transform(rows)
+    np.testing.assert_allclose(probs, model.predict_proba(scaled)[:, 1], rtol=0, atol=1e-12)
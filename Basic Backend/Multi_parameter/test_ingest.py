@@ -0,0 +1,131 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from features import FEATURE_COLUMNS, VITAL_COLUMNS, create_timeseries_features
+from history_store import SQLiteHistoryStore, create_history_backend
+import main
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'patient_timeseries_dataset.csv')
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(scope='module')
+def readings():
+    """The first 10 readings of one patient, keyed by their API names (no 'time')."""
+    df = pd.read_csv(CSV_FILE, nrows=10)
+    return [{col: float(row[col]) for col in VITAL_COLUMNS} for _, row in df.iterrows()]
+
+
+def timed(reading, minute):
+    return dict(reading, time=(START + timedelta(minutes=minute)).isoformat())
+
+
+def test_untimed_batch_rows_are_all_stored(client, readings):
+    """Untimed rows in one batch share an arrival time but are distinct readings."""
+    response = client.post('/predict/batch', json={"patients": [{"patient_id": "untimed-batch", "readings": readings[:8]}]})
+    assert response.status_code == 200
+    predictions = response.json()['predictions']
+
+    assert main.patient_histories.length('untimed-batch') == 8
+    assert [p['status_message'] for p in predictions[:4]] == [
+        f"Gathering initial data ({n}/5 rows)" for n in range(1, 5)]
+    assert all(p['status_message'] == "Prediction complete" for p in predictions[4:])
+    timestamps = [p['timestamp'] for p in predictions]
+    assert timestamps == sorted(set(timestamps))
+
+
+def test_untimed_single_readings_are_all_stored(client, readings):
+    for reading in readings[:6]:
+        assert client.post('/predict/untimed-single', json=reading).status_code == 200
+    assert main.patient_histories.length('untimed-single') == 6
+
+
+def test_late_row_is_placed_by_time(client, readings):
+    for minute in (0, 1, 2, 3, 4, 6):
+        client.post('/predict/late', json=timed(readings[minute], minute))
+    response = client.post('/predict/late', json=timed(readings[5], 5)).json()
+
+    assert response['status_message'] == "Prediction complete (late reading placed by its timestamp)"
+    frame = main.patient_histories.to_frame('late')
+    assert list(frame['time']) == [pd.Timestamp(START + timedelta(minutes=m)) for m in range(7)]
+
+
+def test_duplicate_row_is_dropped(client, readings):
+    first = client.post('/predict/duplicate', json=timed(readings[0], 0)).json()
+    repeat = client.post('/predict/duplicate', json=timed(readings[0], 0)).json()
+
+    assert first['status_message'] == "Gathering initial data (1/5 rows)"
+    assert repeat['status_message'].endswith("(duplicate of an already recorded reading; dropped)")
+    assert main.patient_histories.length('duplicate') == 1
+
+
+def test_late_insert_replay_matches_recompute(readings):
+    """Features rebuilt from the stored history must match computing the sorted stream from scratch."""
+    # Fractional vitals, so any precision lost in storage shows up
+    rng = np.random.default_rng(7)
+    rows = np.array([[reading[col] for col in VITAL_COLUMNS] for reading in readings]) + rng.uniform(0, 1, (10, len(VITAL_COLUMNS)))
+    df = pd.DataFrame(rows, columns=VITAL_COLUMNS)
+    df['time'] = [START + timedelta(minutes=m) for m in range(10)]
+    expected = create_timeseries_features(df.copy()).fillna(0)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    actual = np.empty_like(expected)
+    for minute in (0, 1, 2, 3, 4, 5, 7, 8, 6, 9):  # 6 arrives late, 9 follows the rebuilt state
+        vitals = main.VitalsInput(**dict(zip(VITAL_COLUMNS, rows[minute])), time=df['time'][minute])
+        actual[minute] = main.ingest_reading('replay', vitals, datetime.utcnow()).features
+
+    # 7 and 8 were scored before 6 arrived; every other reading had its full history
+    scored = [0, 1, 2, 3, 4, 5, 6, 9]
+    np.testing.assert_allclose(actual[scored], expected[scored], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_untimed_readings_append_in_both_backends(kind, tmp_path):
+    store = create_history_backend(kind, 100, str(tmp_path / 'history.db'))
+    vitals = [0.0] * len(VITAL_COLUMNS)
+    results = [store.insert('p', vitals, START, timed=False) for _ in range(5)]
+
+    assert [r.position for r in results] == [0] * 5
+    assert not any(r.duplicate for r in results)
+    assert store.length('p') == 5
+    assert all(b.time > a.time for a, b in zip(results, results[1:]))
+    # A timed reading at the shared arrival time is still a duplicate of the first
+    assert store.insert('p', vitals, START).duplicate
+    store.close()
+
+
+def test_sqlite_history_io_runs_off_the_event_loop(client, readings, tmp_path, monkeypatch):
+    """With the SQLite backend every store call runs on the history thread."""
+    store = SQLiteHistoryStore(str(tmp_path / 'history.db'), 100)
+    threads = set()
+    insert = store.insert
+
+    def recording_insert(*args):
+        threads.add(threading.current_thread().name)
+        return insert(*args)
+
+    monkeypatch.setattr(store, 'insert', recording_insert)
+    monkeypatch.setattr(main, 'patient_histories', store)
+    monkeypatch.setattr(main, 'history_io', ThreadPoolExecutor(1, thread_name_prefix='history-io'))
+
+    batch = client.post('/predict/batch', json={"patients": [{"patient_id": "sqlite", "readings": readings[:4]}]})
+    single = client.post('/predict/sqlite', json=readings[4])
+
+    assert batch.status_code == single.status_code == 200
+    assert single.json()['status_message'] == "Prediction complete"
+    assert store.length('sqlite') == 5
+    assert threads and all(name.startswith('history-io') for name in threads)
+    main.history_io.shutdown()
+    store.close()
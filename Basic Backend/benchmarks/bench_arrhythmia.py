@@ -0,0 +1,104 @@
+"""
+Benchmarks for Arrythmia: WFDB decoding, R-peak detection, window batching
+and the /predict/arrythmia endpoints driven through Flask's test client.
+
+The repo ships no MIT-BIH records, so a synthetic 30-minute, 2-channel,
+format-212 record at 360 Hz is written with wfdb (the MIT-BIH layout).
+Pass --record path/to/100 to benchmark a real record instead.
+
+    python bench_arrhythmia.py --requests 500 --concurrency 16
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+
+from common import add_common_args, enter_service, load_test, micro, model_missing
+
+
+def synthetic_record(directory, name="bench", seconds=1800, fs=360):
+    import numpy as np
+    import wfdb
+
+    rng = np.random.default_rng(0)
+    t = np.arange(seconds * fs) / fs
+    beats = (np.sin(2 * np.pi * 1.2 * t) ** 63)  # narrow peaks at ~72 bpm
+    signal = np.column_stack([beats + 0.05 * rng.standard_normal(t.size),
+                              0.5 * beats + 0.05 * rng.standard_normal(t.size)])
+    wfdb.wrsamp(name, fs=fs, units=["mV", "mV"], sig_name=["MLII", "V5"], p_signal=signal,
+                fmt=["212", "212"], write_dir=directory)
+    return os.path.join(directory, name)
+
+
+def run(args):
+    if not args.cache:
+        os.environ["PREDICTION_CACHE_SIZE"] = "0"
+    tmpdir = tempfile.mkdtemp(prefix="bench-arrhythmia-")
+    record_path = args.record or synthetic_record(tmpdir)
+    enter_service("Arrythmia")
+
+    import numpy as np
+    import wfdb
+
+    from wfdb_memory import read_signal
+    from windowing import detect_rpeaks, iter_window_batches, stride_starts
+
+    with open(record_path + ".dat", "rb") as f:
+        dat = f.read()
+    with open(record_path + ".hea", "rb") as f:
+        hea = f.read()
+    dat_name = os.path.basename(record_path) + ".dat"
+    signal, fs = read_signal(hea, dat, dat_name)
+
+    results = {}
+
+    # --- Micro-benchmarks ---
+    repeats = max(5, args.repeats // 20)
+    results["wfdb_rdrecord_from_disk"] = micro(lambda: wfdb.rdrecord(record_path, channels=[0]), repeats, warmup=2)
+    results["wfdb_memory_read_signal"] = micro(lambda: read_signal(hea, dat, dat_name), repeats, warmup=2)
+    results["detect_rpeaks"] = micro(lambda: detect_rpeaks(signal, fs), repeats, warmup=2)
+    starts = stride_starts(len(signal))
+    results["iter_window_batches_stride_180"] = micro(
+        lambda: sum(len(batch) for batch in iter_window_batches(signal, starts)), repeats, warmup=2)
+
+    # --- Load tests through the app (needs the trained model next to app.py) ---
+    missing = model_missing("arrhythmia_cnn")
+    if missing:
+        results["load_tests"] = {"skipped": missing}
+        return results
+
+    import app as service
+
+    model = service.loader.get(timeout=300)
+    one = np.zeros((1, 360, 1), dtype=np.float32)
+    results["model_predict_on_batch_1"] = micro(lambda: model.predict_on_batch(one), args.repeats)
+
+    # First-second endpoint: a short record keeps the upload realistic for this route
+    short = synthetic_record(tmpdir, "short", seconds=10)
+    with open(short + ".dat", "rb") as f:
+        short_dat = f.read()
+    with open(short + ".hea", "rb") as f:
+        short_hea = f.read()
+
+    def send_first_second(client, i):
+        return client.post("/predict/arrythmia", data={
+            "dat": (io.BytesIO(short_dat), "short.dat"), "hea": (io.BytesIO(short_hea), "short.hea")}).status_code
+
+    results["load_predict_first_second"] = load_test(
+        service.app.test_client, send_first_second, args.requests, args.concurrency)
+
+    def send_record(client, i):
+        return client.post("/predict/arrythmia/record", data={
+            "dat": (io.BytesIO(dat), dat_name), "hea": (io.BytesIO(hea), dat_name[:-4] + ".hea")}).status_code
+
+    results["load_predict_whole_record"] = load_test(
+        service.app.test_client, send_record, max(5, args.requests // 20), max(1, args.concurrency // 4), warmup=1)
+    results["micro_batcher"] = service.batcher.metrics()
+    return results
+
+
+if __name__ == "__main__":
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__.strip().splitlines()[0]))
+    parser.add_argument("--record", help="path to a WFDB record (without extension) to benchmark instead")
+    print(json.dumps(run(parser.parse_args())))
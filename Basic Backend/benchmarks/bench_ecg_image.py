@@ -0,0 +1,66 @@
+"""
+Benchmarks for ECG Image: image decoding/preprocessing and the /predict and
+/predict/batch endpoints driven through Flask's test client, using the
+bundled MI(1).jpg.
+
+    python bench_ecg_image.py --requests 200 --concurrency 4
+"""
+import argparse
+import io
+import json
+import os
+
+from common import add_common_args, enter_service, load_test, micro, model_missing
+
+SERIES_SIZE = 12  # one 12-lead upload
+
+
+def run(args):
+    if not args.cache:
+        os.environ["PREDICTION_CACHE_SIZE"] = "0"
+    enter_service("ECG Image")
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    from preprocessing import decode_batch, decode_ecg_image
+
+    with open("MI(1).jpg", "rb") as f:
+        image = f.read()
+
+    results = {}
+
+    # --- Micro-benchmarks ---
+    repeats = max(10, args.repeats // 4)
+    results["decode_ecg_image"] = micro(lambda: decode_ecg_image(image), repeats)
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        results[f"decode_batch_{SERIES_SIZE}_images"] = micro(
+            lambda: decode_batch([image] * SERIES_SIZE, pool), max(5, repeats // 4))
+
+    # --- Load tests through the app (needs the trained model next to app.py) ---
+    missing = model_missing("ecg_image")
+    if missing:
+        results["load_tests"] = {"skipped": missing}
+        return results
+
+    import app as service
+
+    service.loader.get(timeout=300)
+
+    def send_single(client, i):
+        return client.post("/predict", data={"file": (io.BytesIO(image), "MI(1).jpg")}).status_code
+
+    results["load_predict_single"] = load_test(
+        service.app.test_client, send_single, args.requests, args.concurrency)
+
+    def send_series(client, i):
+        files = [(io.BytesIO(image), f"lead_{lead}.jpg") for lead in range(SERIES_SIZE)]
+        return client.post("/predict/batch", data={"files": files}).status_code
+
+    results[f"load_predict_batch_{SERIES_SIZE}_images"] = load_test(
+        service.app.test_client, send_series, max(5, args.requests // SERIES_SIZE), args.concurrency, warmup=1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__.strip().splitlines()[0]))
+    print(json.dumps(run(parser.parse_args())))
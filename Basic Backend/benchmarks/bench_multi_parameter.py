@@ -0,0 +1,96 @@
+"""
+Benchmarks for Multi_parameter: feature engineering, scaler + model inference
+and the /predict endpoints driven through FastAPI's TestClient.
+
+    python bench_multi_parameter.py --requests 500 --concurrency 8
+"""
+import argparse
+import json
+import uuid
+
+from common import add_common_args, enter_service, load_test, micro
+
+
+def run(args):
+    enter_service("Multi_parameter")
+
+    import joblib
+    import numpy as np
+    import pandas as pd
+
+    from features import (
+        FEATURE_COLUMNS,
+        VITAL_COLUMNS,
+        IncrementalFeatureState,
+        create_grouped_timeseries_features,
+        create_timeseries_features,
+    )
+    from inference import CompiledPredictor
+
+    data = pd.read_csv("patient_timeseries_dataset.csv")
+    model = joblib.load("ts_prediction_model.joblib")
+    scaler = joblib.load("ts_prediction_scaler.joblib")
+    feature_cols = joblib.load("ts_feature_columns.joblib")
+    predictor = CompiledPredictor(model, scaler, feature_cols)
+
+    results = {}
+
+    # --- Micro-benchmarks ---
+    # The per-request work the API did before incremental features: a full 100-row recompute
+    history = data[['time'] + VITAL_COLUMNS].iloc[:100].reset_index(drop=True)
+    results["create_timeseries_features_100_rows"] = micro(
+        lambda: create_timeseries_features(history).iloc[[-1]], args.repeats)
+
+    vitals = data[VITAL_COLUMNS].to_numpy(dtype=np.float64)
+    state = IncrementalFeatureState()
+    row = iter(range(10 ** 9))
+    results["incremental_features_update"] = micro(
+        lambda: state.update(vitals[next(row) % len(vitals)]), args.repeats * 10)
+
+    features = create_grouped_timeseries_features(data).fillna(0)[FEATURE_COLUMNS].to_numpy()
+    one = features[-1:]
+    results["sklearn_scaler_model_1_row"] = micro(
+        lambda: model.predict_proba(scaler.transform(pd.DataFrame(one, columns=FEATURE_COLUMNS)[feature_cols])),
+        args.repeats)
+    results["compiled_predictor_1_row"] = micro(lambda: predictor.predict(one), args.repeats)
+    block = features[:1000]
+    results["compiled_predictor_1000_rows"] = micro(lambda: predictor.predict(block), max(10, args.repeats // 10))
+
+    # --- Load tests through the app ---
+    from fastapi.testclient import TestClient
+
+    import main
+
+    # Send the monitor time with every reading, and give every run (and every pass
+    # over the CSV) its own patient IDs, so no reading is dropped as a duplicate
+    payloads = data[['time'] + VITAL_COLUMNS].to_dict(orient="records")
+    patients = data["Patient_ID"].tolist()
+    run_tag = uuid.uuid4().hex[:8]
+
+    def patient_id(test, j, lap):
+        return f"{test}.{run_tag}.{lap}.{patients[j]}"
+
+    with TestClient(main.app) as client:
+        def send_single(c, i):
+            j = i % len(payloads)
+            return c.post(f"/predict/{patient_id('single', j, i // len(payloads))}", json=payloads[j]).status_code
+
+        results["load_predict_single"] = load_test(lambda: client, send_single, args.requests, args.concurrency)
+
+        batch_rows = 100
+
+        def send_batch(c, i):
+            lap, start = divmod(i * batch_rows, max(1, len(payloads) - batch_rows))
+            body = {"patients": [{"patient_id": patient_id('batch', j, lap), "readings": [payloads[j]]}
+                                 for j in range(start, start + batch_rows)]}
+            return c.post("/predict/batch", json=body).status_code
+
+        results["load_predict_batch_100_rows"] = load_test(
+            lambda: client, send_batch, max(10, args.requests // 10), args.concurrency)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = add_common_args(argparse.ArgumentParser(description=__doc__.strip().splitlines()[0]))
+    print(json.dumps(run(parser.parse_args())))
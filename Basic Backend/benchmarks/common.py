@@ -0,0 +1,113 @@
+"""
+Timing helpers shared by the per-service benchmark scripts.
+
+All results are plain dicts of floats (milliseconds, requests/sec) so they
+serialise straight to JSON and can be diffed across commits by run_all.py.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def enter_service(name: str) -> str:
+    """Makes a service directory importable and current (the apps load models by relative path)."""
+    service_dir = os.path.join(BACKEND_DIR, name)
+    sys.path.insert(0, service_dir)
+    os.chdir(service_dir)
+    return service_dir
+
+
+def model_missing(stem: str):
+    """
+    Reason to skip a service's load tests when the model it would serve (the .h5,
+    or the .tflite with MODEL_BACKEND=tflite) is not in the current directory.
+    """
+    path = stem + (".tflite" if os.environ.get("MODEL_BACKEND") == "tflite" else ".h5")
+    return None if os.path.exists(path) else f"{path} not found; train or export the model first"
+
+
+def summarize(latencies: Sequence[float], wall_seconds: float = None, errors: int = 0) -> Dict[str, Any]:
+    """Latency percentiles in ms (from seconds), plus throughput when wall time is given."""
+    ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    if ms.size == 0:
+        return {"count": 0, "errors": errors}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    summary = {
+        "count": int(ms.size),
+        "errors": int(errors),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+    if wall_seconds:
+        summary["wall_seconds"] = float(wall_seconds)
+        summary["requests_per_sec"] = float(ms.size / wall_seconds)
+    return summary
+
+
+def micro(fn: Callable[[], Any], repeats: int = 200, warmup: int = 10) -> Dict[str, Any]:
+    """Times `fn()` `repeats` times after `warmup` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    summary = summarize(latencies)
+    summary["calls_per_sec"] = 1000.0 / summary["mean_ms"] if summary["mean_ms"] else 0.0
+    return summary
+
+
+def load_test(make_client: Callable[[], Any], send: Callable[[Any, int], int], requests: int,
+              concurrency: int, warmup: int = 5) -> Dict[str, Any]:
+    """
+    Closed-loop load generator: `concurrency` threads, each with its own client
+    from `make_client()`, issue `send(client, i)` for i in 0..requests-1 as fast
+    as responses come back. `send` returns the HTTP status; >= 400 counts as an error.
+    """
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = make_client()
+        return local.client
+
+    for i in range(warmup):
+        send(client(), i)
+
+    latencies: List[float] = [0.0] * requests
+    statuses: List[int] = [0] * requests
+
+    def one(i: int) -> None:
+        c = client()
+        started = time.perf_counter()
+        statuses[i] = send(c, i)
+        latencies[i] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    summary = summarize(latencies, wall, errors=sum(1 for status in statuses if status >= 400))
+    summary["concurrency"] = concurrency
+    return summary
+
+
+def add_common_args(parser):
+    parser.add_argument("--requests", type=int, default=200, help="requests per load test")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per load test")
+    parser.add_argument("--repeats", type=int, default=200, help="timed calls per micro-benchmark")
+    parser.add_argument("--cache", action="store_true",
+                        help="leave the prediction cache on (by default it is disabled so every request runs the model)")
+    return parser
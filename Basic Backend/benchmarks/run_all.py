@@ -0,0 +1,110 @@
+"""
+Runs the benchmark script of every inference service and writes one JSON report.
+
+Each service runs in its own Python process: the Flask apps share the module
+name app and each loads its own framework stack.
+
+    python run_all.py -o results.json
+    python run_all.py --only multi_parameter --requests 1000 --concurrency 16
+    python run_all.py -o new.json --compare results.json   # flag regressions vs an earlier run
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from common import BACKEND_DIR
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES = {
+    "multi_parameter": "bench_multi_parameter.py",
+    "arrhythmia": "bench_arrhythmia.py",
+    "ecg_image": "bench_ecg_image.py",
+}
+
+# Metrics compared by --compare, and whether a higher value is better
+COMPARED = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "requests_per_sec": True, "calls_per_sec": True}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_service(name, passthrough):
+    """Runs one benchmark script; its JSON result is the last line it prints."""
+    script = os.path.join(BENCH_DIR, SERVICES[name])
+    print(f"⏱️  {name} ...", file=sys.stderr)
+    proc = subprocess.run([sys.executable, script, *passthrough], capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(lines[-1])
+
+
+def compare(current, baseline, threshold):
+    """Lists metrics that got worse than `baseline` by more than `threshold` (relative)."""
+    regressions = []
+    for service, benches in current.items():
+        for bench, metrics in benches.items():
+            before = baseline.get(service, {}).get(bench, {})
+            if not isinstance(metrics, dict) or not isinstance(before, dict):
+                continue
+            for metric, higher_is_better in COMPARED.items():
+                if metric not in metrics or not before.get(metric):
+                    continue
+                change = (metrics[metric] - before[metric]) / before[metric]
+                if (-change if higher_is_better else change) > threshold:
+                    regressions.append({"benchmark": f"{service}.{bench}", "metric": metric,
+                                        "before": before[metric], "after": metrics[metric],
+                                        "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all inference services")
+    parser.add_argument("-o", "--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--only", nargs="+", choices=sorted(SERVICES), help="services to run")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args, passthrough = parser.parse_known_args()  # --requests/--concurrency/... go to every service
+
+    results = {name: run_service(name, passthrough) for name in (args.only or SERVICES)}
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": passthrough,
+        "results": results,
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["baseline_commit"] = baseline.get("commit")
+        report["regressions"] = compare(results, baseline.get("results", {}), args.threshold)
+        for r in report["regressions"]:
+            print(f"⚠️  {r['benchmark']} {r['metric']}: {r['before']:.3f} -> {r['after']:.3f} ({r['change']:+.1%})",
+                  file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"✅ Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    if args.compare and report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Helpers used by more than one model service: Prometheus metrics and request
+tracing (metrics), the background model loader and TFLite wrapper
+(model_loader) and the model-keyed prediction cache (prediction_cache).
+
+The services run from their own directories, so each entry point appends
+Basic Backend/ to sys.path before importing from here.
+"""
@@ -0,0 +1,378 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: 0.5 ms (a cached hit) up to 10 s (a whole-record scan)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Send Server-Timing / X-Request-ID on every response, not only when the client asks with "X-Trace: 1"
+TRACE_ALL = os.environ.get('METRICS_TRACE_HEADERS', '0').lower() in ('1', 'true', 'yes')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('metrics_trace', default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: Any) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}' for labels, v in values]
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. requests in flight)."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, *labels: Any) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """Bucketed distribution per label set, rendered as cumulative `le` buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}   # labels -> [bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        lines = []
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class CallbackMetric:
+    """
+    Value read when /metrics is scraped, e.g. a cache's hit count or the number
+    of tracked patients. `fn` returns a number, or a list of (label values, number).
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], kind: str = 'gauge',
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        value = self.fn()
+        if value is None:
+            return []
+        series = value if isinstance(value, list) else [((), value)]
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}'
+                for labels, v in series if v is not None]
+
+
+class Trace:
+    """Stage timings for one request; summed per stage and observed when the request ends."""
+
+    __slots__ = ('endpoint', 'request_id', 'emit', 'started', 'stages', 'errors', 'token')
+
+    def __init__(self, endpoint: str = '', request_id: Optional[str] = None, emit: bool = False):
+        self.endpoint = endpoint
+        self.request_id = request_id
+        self.emit = emit          # add Server-Timing / X-Request-ID to the response
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.errors: List[str] = []   # exception types handled while serving the request
+        self.token = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def headers(self) -> List[Tuple[str, str]]:
+        """Server-Timing entries (ms) for each stage plus the total so far."""
+        timing = [f'{stage};dur={seconds * 1000.0:.3f}' for stage, seconds in self.stages.items()]
+        timing.append(f'total;dur={self.elapsed() * 1000.0:.3f}')
+        return [('Server-Timing', ', '.join(timing)), ('X-Request-ID', self.request_id or '')]
+
+
+class _Stage:
+    __slots__ = ('registry', 'name', 'started')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class MetricsRegistry:
+    """
+    In-process metrics for one service, rendered in the Prometheus text format.
+
+    Every request gets request-count and latency series; hot-path steps are
+    timed with `with metrics.stage('decode'):`. Inside a request, stage times
+    are summed on the request's Trace and observed once when it finishes, so a
+    stage entered once per row of a batch costs two clock reads per row.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.started = time.time()
+        self._metrics: List[Any] = []
+        self.requests = self.counter('requests_total', 'Requests handled, by endpoint and status code.',
+                                     ('endpoint', 'method', 'status'))
+        self.latency = self.histogram('request_duration_seconds', 'End-to-end request latency.', ('endpoint',))
+        self.stages = self.histogram('stage_duration_seconds', 'Time spent in each request stage.',
+                                     ('endpoint', 'stage'))
+        self.in_flight = self.gauge('requests_in_flight', 'Requests currently being handled.')
+        self.errors = self.counter('errors_total', 'Exceptions caught by request handlers, by type.',
+                                   ('endpoint', 'exception'))
+        self.callback('process_resident_memory_bytes', 'Resident set size of this process.',
+                      _resident_memory_bytes, prefix=False)
+        self.callback('process_start_time_seconds', 'Start time of this process (POSIX seconds).',
+                      lambda: self.started, prefix=False)
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def _name(self, name: str, prefix: bool = True) -> str:
+        return f'{self.namespace}_{name}' if prefix else name
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(self._name(name), help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(self._name(name), help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self._name(name), help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, fn: Callable[[], Any], kind: str = 'gauge',
+                 labelnames: Sequence[str] = (), prefix: bool = True) -> CallbackMetric:
+        return self._add(CallbackMetric(self._name(name, prefix), help, fn, kind, labelnames))
+
+    # --- Request tracing ---
+    def start_trace(self, endpoint: str = '', request_id: Optional[str] = None, emit: bool = False) -> Trace:
+        """Starts timing a request and makes it the current trace for `stage`."""
+        if emit and not request_id:
+            request_id = uuid.uuid4().hex
+        trace = Trace(endpoint, request_id, emit)
+        trace.token = _current_trace.set(trace)
+        self.in_flight.inc(1)
+        return trace
+
+    def finish_trace(self, trace: Trace, method: str = '', status: int = 200) -> None:
+        if trace.token is not None:
+            try:
+                _current_trace.reset(trace.token)
+            except ValueError:  # finished from a different context than it started in
+                _current_trace.set(None)
+            trace.token = None
+        self.in_flight.inc(-1)
+        endpoint = trace.endpoint
+        self.requests.inc(1, endpoint, method, str(status))
+        self.latency.observe(trace.elapsed(), endpoint)
+        for stage, seconds in trace.stages.items():
+            self.stages.observe(seconds, endpoint, stage)
+        for error in trace.errors:
+            self.errors.inc(1, endpoint, error)
+
+    def current_trace(self) -> Optional[Trace]:
+        return _current_trace.get()
+
+    def stage(self, name: str) -> _Stage:
+        """Context manager timing one step of the current request."""
+        return _Stage(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Adds a stage duration measured by the caller."""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, seconds)
+        else:
+            self.stages.observe(seconds, '', name)
+
+    def record_elapsed(self, name: str) -> None:
+        """
+        Records the time since the current request started as stage `name`; for
+        work the framework does before the handler runs (body parsing, validation).
+        """
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, trace.elapsed())
+
+    def record_error(self, error: BaseException) -> None:
+        """Counts an exception a handler turned into an error response."""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.errors.append(type(error).__name__)
+        else:
+            self.errors.inc(1, '', type(error).__name__)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:  # a broken callback must not take down the scrape
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def _resident_memory_bytes() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def wants_trace(header_value: Optional[str]) -> bool:
+    """Whether a request's X-Trace header (or METRICS_TRACE_HEADERS) asks for trace headers."""
+    return TRACE_ALL or (header_value or '').lower() in ('1', 'true', 'yes')
+
+
+# --- Framework Adapters ---
+class ASGIMetricsMiddleware:
+    """
+    Pure-ASGI middleware (no per-request task or body buffering) that traces
+    every HTTP request. The endpoint label is the matched route template
+    (e.g. /predict/{patient_id}), so patient IDs do not create new series.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or ())
+        request_id = headers.get(b'x-request-id')
+        trace = self.registry.start_trace(
+            request_id=request_id.decode('latin-1') if request_id else None,
+            emit=wants_trace(headers.get(b'x-trace', b'').decode('latin-1')),
+        )
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if trace.emit:
+                    message['headers'] = list(message.get('headers', [])) + [
+                        (k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in trace.headers()]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            route = scope.get('route')
+            trace.endpoint = getattr(route, 'path', None) or 'unmatched'
+            self.registry.finish_trace(trace, scope.get('method', ''), status)
+
+
+def instrument_flask(app, registry: MetricsRegistry) -> None:
+    """Traces every Flask request; the endpoint label is the URL rule (e.g. /predict/batch)."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_trace():
+        g.metrics_trace = registry.start_trace(
+            endpoint=request.url_rule.rule if request.url_rule is not None else 'unmatched',
+            request_id=request.headers.get('X-Request-ID'),
+            emit=wants_trace(request.headers.get('X-Trace')),
+        )
+
+    @app.after_request
+    def _add_trace_headers(response):
+        trace = g.get('metrics_trace')
+        if trace is not None and trace.emit:
+            for name, value in trace.headers():
+                response.headers[name] = value
+        if trace is not None:
+            g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_trace(error=None):
+        trace = g.pop('metrics_trace', None)
+        if trace is not None:
+            registry.finish_trace(trace, request.method, g.pop('metrics_status', 500))
@@ -0,0 +1,170 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from .prediction_cache import file_sha256
+
+
+class ModelNotReady(RuntimeError):
+    """The model is still loading, or failed to load."""
+
+
+def _import_interpreter():
+    """The lightest TFLite interpreter available: LiteRT, tflite-runtime, then full TensorFlow."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    Serves a .tflite export (see export_tflite.py) behind the two Keras calls
+    the app uses, predict_on_batch and predict. Quantized int8 inputs/outputs
+    are (de)quantized here, so callers always pass and get float32. The
+    interpreter is resized when the batch size changes and is guarded by a lock,
+    since one interpreter must not be invoked from two threads at once.
+    """
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        self.interpreter = _import_interpreter()(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, x) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            if x.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], list(x.shape))
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = x.shape[0]
+
+            scale, zero_point = self._input['quantization']
+            if self._input['dtype'] != np.float32 and scale:
+                info = np.iinfo(self._input['dtype'])
+                x = np.clip(np.round(x / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self._input['index'], x.astype(self._input['dtype']))
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._output['index'])
+
+            scale, zero_point = self._output['quantization']
+            if self._output['dtype'] != np.float32 and scale:
+                return (out.astype(np.float32) - zero_point) * scale
+            return out.astype(np.float32, copy=True)
+
+    def predict(self, x, verbose=0, **kwargs) -> np.ndarray:
+        return self.predict_on_batch(x)
+
+
+class ModelLoader:
+    """
+    Imports TensorFlow and loads a Keras model on a background thread, so the
+    web server binds and answers health checks straight away instead of after
+    several seconds of imports. Once loaded, `warmup(model)` runs forward passes
+    at the shapes the service will use, so graph tracing happens before the
+    first real request. Import, load and warm-up times are kept for /health.
+
+    A path ending in .tflite is served with TFLiteModel instead, which does not
+    import TensorFlow at all when LiteRT or tflite-runtime is installed.
+
+    The model file's SHA-256 is also computed on the loader thread and passed
+    to `on_ready` (e.g. PredictionCache.bind) before the model is published.
+    """
+
+    def __init__(self, path: str, warmup: Optional[Callable[[Any], None]] = None, name: str = "model-loader",
+                 on_ready: Optional[Callable[[str], None]] = None):
+        self.path = path
+        self.backend = "tflite" if path.endswith(".tflite") else "keras"
+        self.warmup = warmup
+        self.on_ready = on_ready
+        self.name = name
+        self.model = None
+        self.model_hash: Optional[str] = None
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ModelLoader":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._load, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        try:
+            self.state = "importing"
+            if self.backend == "tflite":
+                _import_interpreter()
+            else:
+                from tensorflow.keras.models import load_model  # deferred: the slowest import by far
+            imported = time.perf_counter()
+            self.timings["runtime_import_seconds"] = imported - started
+
+            self.state = "loading"
+            model = TFLiteModel(self.path) if self.backend == "tflite" else load_model(self.path)
+            loaded = time.perf_counter()
+            self.timings["model_load_seconds"] = loaded - imported
+
+            self.state = "warming"
+            if self.warmup is not None:
+                self.warmup(model)
+            warmed = time.perf_counter()
+            self.timings["warmup_seconds"] = warmed - loaded
+
+            self.state = "hashing"
+            self.model_hash = file_sha256(self.path)
+            if self.on_ready is not None:
+                self.on_ready(self.model_hash)
+            self.timings["model_hash_seconds"] = time.perf_counter() - warmed
+
+            self.model = model
+            self.state = "ready"
+            print(f"✅ {self.path} ready in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "failed"
+            print(f"❌ Failed to load {self.path}: {self.error}")
+        finally:
+            self.timings["total_seconds"] = time.perf_counter() - started
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Returns the warmed model, waiting up to `timeout` seconds for it."""
+        if self.model is not None:
+            return self.model
+        self.start()
+        if not self._done.wait(timeout):
+            raise ModelNotReady(f"Model is still {self.state}, retry shortly")
+        if self.model is None:
+            raise ModelNotReady(f"Model failed to load: {self.error}")
+        return self.model
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "model": self.path,
+            "backend": self.backend,
+            "model_hash": self.model_hash,
+            "error": self.error,
+            "timings": {key: round(value, 4) for key, value in self.timings.items()},
+        }
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of JSON-serialisable prediction results, keyed by a
+    hash of the uploaded bytes and the SHA-256 of the model file.
+
+    Because the model hash is part of every key, results computed by a previous
+    version of the model are never returned. The hash is supplied by `bind`,
+    which ModelLoader calls from its thread once the model has loaded; until
+    then `key` returns None and the cache is bypassed. With `persist_dir` set,
+    entries are also written as JSON files under
+    `persist_dir/<namespace>/<model hash>/`, so they survive restarts and are
+    shared by workers on the same host. Each service passes its model file name
+    as `namespace`, so several services can share one `persist_dir`; when the
+    cache is bound, only other model versions inside its own namespace are
+    removed. `max_entries=0` disables caching entirely.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0, persist_dir: Optional[str] = None,
+                 namespace: str = 'default'):
+        self.model_hash: Optional[str] = None
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl_seconds) if ttl_seconds and ttl_seconds > 0 else None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+        self.namespace = namespace
+        self.persist_root = os.path.join(persist_dir, namespace) if persist_dir else None
+        self.persist_dir = None
+
+    def bind(self, model_hash: str) -> None:
+        """Keys the cache to the loaded model's SHA-256 (see file_sha256), dropping this namespace's entries for any other."""
+        persist_dir = None
+        if self.persist_root and self.max_entries:
+            persist_dir = os.path.join(self.persist_root, model_hash[:16])
+            os.makedirs(persist_dir, exist_ok=True)
+            for name in os.listdir(self.persist_root):
+                stale = os.path.join(self.persist_root, name)
+                if name != model_hash[:16] and os.path.isdir(stale):
+                    shutil.rmtree(stale, ignore_errors=True)
+        with self._lock:
+            if model_hash != self.model_hash:
+                self._entries.clear()
+            self.persist_dir = persist_dir
+            self.model_hash = model_hash
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, *parts: bytes, params: str = '') -> Optional[str]:
+        """Cache key for the given uploaded byte strings plus any request parameters (None until bound)."""
+        if self.model_hash is None:
+            return None
+        digest = hashlib.sha256(self.model_hash.encode())
+        for part in parts:
+            digest.update(len(part).to_bytes(8, 'little'))
+            digest.update(part)
+        digest.update(params.encode())
+        return digest.hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Any]:
+        if not self.enabled or key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._insert(key, entry)
+            return entry[1]
+
+    def put(self, key: Optional[str], value: Any) -> None:
+        if not self.enabled or key is None:
+            return
+        entry = (time.time(), value)
+        with self._lock:
+            self._insert(key, entry)
+        self._write_disk(key, entry)
+
+    def _insert(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, key + '.json')
+
+    def _read_disk(self, key: str, now: float) -> Optional[tuple]:
+        if self.persist_dir is None:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and now - record['stored_at'] >= self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self._expirations += 1
+            return None
+        return record['stored_at'], record['value']
+
+    def _write_disk(self, key: str, entry: tuple) -> None:
+        if self.persist_dir is None:
+            return
+        path = self._entry_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'stored_at': entry[0], 'value': entry[1]}, f)
+            os.replace(tmp, path)  # atomic, so other workers never read a partial file
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.persist_dir is not None:
+            shutil.rmtree(self.persist_dir, ignore_errors=True)
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "namespace": self.namespace,
+                "model_hash": self.model_hash,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "persist_dir": self.persist_dir,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+            }
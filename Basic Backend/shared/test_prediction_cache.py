@@ -0,0 +1,41 @@
+import os
+
+from shared.prediction_cache import PredictionCache
+
+OLD_HASH = 'a' * 64
+NEW_HASH = 'b' * 64
+OTHER_HASH = 'c' * 64
+
+
+def test_caches_sharing_a_root_keep_each_others_entries(tmp_path):
+    """Two services pointed at one PREDICTION_CACHE_DIR must not prune each other."""
+    root = str(tmp_path)
+    arrhythmia = PredictionCache(persist_dir=root, namespace='arrhythmia_cnn.h5')
+    ecg = PredictionCache(persist_dir=root, namespace='ecg_image.h5')
+
+    arrhythmia.bind(OLD_HASH)
+    key = arrhythmia.key(b'record')
+    arrhythmia.put(key, {'prediction': 'Normal'})
+    ecg.bind(OTHER_HASH)
+    ecg.put(ecg.key(b'image'), {'predicted_class': 'Normal'})
+
+    # A restarted arrhythmia worker finds its entry on disk
+    restarted = PredictionCache(persist_dir=root, namespace='arrhythmia_cnn.h5')
+    restarted.bind(OLD_HASH)
+    assert restarted.get(key) == {'prediction': 'Normal'}
+    assert restarted.stats()['disk_hits'] == 1
+    assert os.listdir(os.path.join(root, 'ecg_image.h5')) == [OTHER_HASH[:16]]
+
+
+def test_bind_prunes_stale_hashes_only_in_its_namespace(tmp_path):
+    root = str(tmp_path)
+    arrhythmia = PredictionCache(persist_dir=root, namespace='arrhythmia_cnn.h5')
+    ecg = PredictionCache(persist_dir=root, namespace='ecg_image.h5')
+    arrhythmia.bind(OLD_HASH)
+    ecg.bind(OTHER_HASH)
+
+    arrhythmia.bind(NEW_HASH)  # a new model version was deployed
+
+    assert os.listdir(os.path.join(root, 'arrhythmia_cnn.h5')) == [NEW_HASH[:16]]
+    assert os.listdir(os.path.join(root, 'ecg_image.h5')) == [OTHER_HASH[:16]]
+    assert sorted(os.listdir(root)) == ['arrhythmia_cnn.h5', 'ecg_image.h5']